@@ -1,5 +1,5 @@
 from typing import Dict, Tuple, List, Optional, Set
-from game.colored_trails import ColoredTrails, GameState, COLORS
+from game.colored_trails import ColoredTrails, COLORS, chips_to_matrix
 from utils.text_logger import TextLogger
 
 
@@ -20,18 +20,8 @@ class GreedyPlayer:
             print(f"[{self.player_id}] {msg}")
 
     def calculate_utility(self, new_chips: Dict[str, int]) -> int:
-        temp_state = GameState(
-            goal_pos=self.game.states[self.player_id].goal_pos,
-            chips=new_chips
-        )
-
-        temp_states = {
-            self.player_id: temp_state,
-            self.opponent_id: self.game.states[self.opponent_id]
-        }
-        temp_game = ColoredTrails(self.game.board, temp_states)
-
-        max_score, _, _ = temp_game.get_max_score_and_path(self.player_id)
+        goal_pos = self.game.states[self.player_id].goal_pos
+        max_score, _, _ = self.game.score_chips(goal_pos, new_chips)
         return max_score
 
     def propose_trade(self) -> Tuple[str, str]:
@@ -42,18 +32,19 @@ class GreedyPlayer:
             self._log(f"  [{self.player_id}] No chips available to trade")
             return "Pass", "Pass"
 
-        current_utility = self.calculate_utility(dict(current_chips))
+        current_utility = self.game.current_score(self.player_id)[0]
 
         best_gain = 0  
         best_proposal: Tuple[str, str] = ("Pass", "Pass")
 
-        evaluated_trades = []
+        candidates = []
+        hypo_hands = []
 
         for give_color in current_chips.keys():
             if current_chips[give_color] == 0:
                 continue
 
-            for receive_color in self.COLORS:  
+            for receive_color in self.game.colors:
 
                 if give_color == receive_color:
                     continue
@@ -70,7 +61,15 @@ class GreedyPlayer:
 
                 hypo_chips[receive_color] = hypo_chips.get(receive_color, 0) + 1
 
-                new_utility = self.calculate_utility(dict(hypo_chips))
+                candidates.append(trade_tuple)
+                hypo_hands.append(dict(hypo_chips))
+
+        # Score every candidate hand in one batched call
+        evaluated_trades = []
+        if candidates:
+            new_utilities, _, _ = self.game.score_many(self.player_id,
+                                                       chips_to_matrix(hypo_hands, self.game.colors))
+            for (give_color, receive_color), new_utility in zip(candidates, new_utilities.tolist()):
                 gain = new_utility - current_utility
 
                 evaluated_trades.append((give_color, receive_color, gain))
@@ -106,18 +105,9 @@ class GreedyPlayer:
             self._log(f"  [{self.player_id}] Cannot accept - missing {opp_receive_color}")
             return False
 
-        hypo_chips = current_chips.copy()
-
-        hypo_chips[opp_give_color] = hypo_chips.get(opp_give_color, 0) + 1
-
-        hypo_chips[opp_receive_color] -= 1
-        if hypo_chips[opp_receive_color] == 0:
-            del hypo_chips[opp_receive_color]
-
-        new_utility = self.calculate_utility(dict(hypo_chips))
-        current_utility = self.calculate_utility(dict(current_chips))
-
-        gain = new_utility - current_utility
+        current_utility = self.game.current_score(self.player_id)[0]
+        gain = self.game.evaluate_trade(self.player_id, [opp_receive_color], [opp_give_color])
+        new_utility = current_utility + gain
         self._log(f"  [{self.player_id}] Evaluating: receive {opp_give_color}, give {opp_receive_color}")
         self._log(f"    Current utility: {current_utility}, New utility: {new_utility}, Gain: {gain}")
 
@@ -7,7 +7,7 @@ from collections import Counter
 import anthropic
 from utils.text_logger import TextLogger
 
-from game.colored_trails import ColoredTrails, GameState, COLORS
+from game.colored_trails import ColoredTrails, COLORS
 
 def read_api_key(filepath="API_token_claude.txt"):
     with open(filepath, "r") as f:
@@ -38,14 +38,8 @@ class ClaudePlayer:
             print(f"[{self.player_id}] {msg}")
 
     def calculate_utility(self, new_chips: Dict[str, int]) -> int:
-        temp_state = GameState(goal_pos=self.game.states[self.player_id].goal_pos,
-                               chips=Counter(new_chips))
-        temp_states = {
-            self.player_id: temp_state,
-            self.opponent_id: self.game.states[self.opponent_id]
-        }
-        temp_game = ColoredTrails(self.game.board, temp_states)
-        max_score, _, _ = temp_game.get_max_score_and_path(self.player_id)
+        goal_pos = self.game.states[self.player_id].goal_pos
+        max_score, _, _ = self.game.score_chips(goal_pos, new_chips)
         return max_score
 
     def query_llm(self, prompt: str, stop: List[str] | None = None) -> str:
@@ -180,18 +174,9 @@ WHAT TO DO:
                     f"{self.opponent_id} proposed {opp_give} for {opp_receive}. {self.player_id} REJECT")
                 return False
 
-        current_util = self.calculate_utility(dict(my_state.chips))
-        hypo = dict(my_state.chips)
-
-        for chip in opp_give:
-            hypo[chip] = hypo.get(chip, 0) + 1
-
-        for chip in opp_receive:
-            hypo[chip] -= 1
-            if hypo[chip] == 0:
-                del hypo[chip]
-
-        new_util = self.calculate_utility(dict(hypo))
+        current_util = self.game.current_score(self.player_id)[0]
+        # We receive opp_give and hand over opp_receive
+        new_util = current_util + self.game.evaluate_trade(self.player_id, opp_receive, opp_give)
         gain = new_util - current_util
 
         goal_pos = self.game.states[self.player_id].goal_pos
@@ -7,7 +7,10 @@ import random
 import math
 from typing import List, Dict, Tuple, Optional
 from collections import Counter, deque
-from game.colored_trails import ColoredTrails, GameState, COLORS, BOARD_SIZE
+
+import numpy as np
+
+from game.colored_trails import ColoredTrails, GameState, COLORS, chip_vector
 
 # Constants from JS implementation
 DEFAULT_LEARNING_SPEED = 0.8
@@ -15,6 +18,28 @@ PRECISION = 0.00001
 MODE_ONE_LOCATION = 0
 MODE_ALL_LOCATION = 1
 
+# Offer id of a pass in an OfferIndex
+PASS_ID = 0
+
+# Whether order-0 agents memoize get_value / get_best_value (see ToMAgent._value_memo)
+MEMOIZE_VALUES = True
+
+# Offers whose acceptance rates ToM0Model records in its belief history
+SAMPLE_OFFERS = [
+    (["RE"], ["BL"]),
+    (["BL"], ["RE"]),
+    (["YE"], ["GR"]),
+    (["Pass"], ["Pass"])
+]
+
+
+def _running_sum(values: np.ndarray) -> float:
+    """
+    Sum of an array accumulated left to right, like a `+=` loop (np.sum adds pairwise,
+    which can round differently).
+    """
+    return float(np.add.accumulate(values)[-1]) if len(values) else 0
+
 
 class ToM0Model:
     """
@@ -30,23 +55,48 @@ class ToM0Model:
         self.logger = logger
         self.learning_speed = DEFAULT_LEARNING_SPEED
 
-        # Initialize belief matrices (9x9 for pos/neg chip differences up to 8)
-        self.cnt_beliefs = [[5]*9 for _ in range(9)]
-        self.ttl_beliefs = [[5]*9 for _ in range(9)]
+        # Initialize belief matrices (9x9 integer arrays for pos/neg chip differences up to 8)
+        # and the acceptance rate of each cell
+        self.cnt_beliefs = np.full((9, 9), 5, dtype=np.int64)
+        self.ttl_beliefs = np.full((9, 9), 5, dtype=np.int64)
 
         # Pre-populate with priors from JS implementation
         self._init_belief_priors()
 
-        # Belief about acceptance probability for each possible offer
-        self.belief_offer = {}
-
-        # For saving/restoring beliefs (used by higher order agents)
+        # Offers the beliefs are about (set by init), as integer codes: offer i is offers[i],
+        # offer_codes maps it back to i. Per offer: number of chips given and received, and
+        # its (pos, neg) cell of the belief matrices
+        self.offers = []
+        self.offer_codes = {}
+        self.give_sizes = np.zeros(0, dtype=np.int64)
+        self.receive_sizes = np.zeros(0, dtype=np.int64)
+        self.offer_cells = (np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp))
+
+        # Belief about acceptance probability for each possible offer (indexed by offer code)
+        self.belief_offer = np.zeros(0)
+
+        # (pos, neg) cells of SAMPLE_OFFERS for the belief history
+        self.sample_keys = []
+        sample_cells = []
+        for give_chips, receive_chips in SAMPLE_OFFERS:
+            if all(c in COLORS or c == "Pass" for c in give_chips + receive_chips):
+                self.sample_keys.append(str((give_chips, receive_chips)))
+                sample_cells.append(self._get_chip_difference(give_chips, receive_chips))
+        self.sample_cells = tuple(np.array(sample_cells, dtype=np.intp).reshape(-1, 2).T)
+
+        # For saving/restoring beliefs (used by higher order agents): undo log of
+        # (offer codes, old beliefs) changes and the log length at each open save_beliefs
+        self.belief_log = []
         self.saved_beliefs = []
         self.save_count = 0
 
         # Track belief history for visualization
         self.belief_history = []
 
+        # Bumped by every change of the acceptance beliefs (cnt / ttl, see ToMAgent.belief_key).
+        # save / restore_beliefs leave those as they are
+        self.belief_version = 0
+
     def _log(self, msg: str):
         if self.logger:
             self.logger.log(f"[ToM0-{self.player_id}] {msg}")
@@ -54,7 +104,7 @@ class ToM0Model:
     def _init_belief_priors(self):
         """Initialize belief matrices with priors from JS implementation"""
         # Using simplified version of the JS priors
-        self.cnt_beliefs = [
+        self.cnt_beliefs = np.array([
             [5, 5, 5, 5, 5, 5, 5, 5, 5],
             [14, 248, 407, 5, 5, 5, 5, 5, 5],
             [26, 316, 196, 129, 5, 5, 5, 5, 5],
@@ -64,9 +114,9 @@ class ToM0Model:
             [5, 5, 5, 5, 5, 5, 5, 5, 5],
             [5, 5, 5, 5, 5, 5, 5, 5, 5],
             [5, 5, 5, 5, 5, 5, 5, 5, 5]
-        ]
+        ], dtype=np.int64)
 
-        self.ttl_beliefs = [
+        self.ttl_beliefs = np.array([
             [226, 25, 27, 34, 45, 5, 5, 5, 5],
             [14, 495, 912, 26, 34, 5, 5, 5, 5],
             [26, 566, 392, 289, 23, 5, 5, 5, 5],
@@ -76,7 +126,9 @@ class ToM0Model:
             [5, 5, 5, 5, 5, 5, 5, 5, 5],
             [5, 5, 5, 5, 5, 5, 5, 5, 5],
             [5, 5, 5, 5, 5, 5, 5, 5, 5]
-        ]
+        ], dtype=np.int64)
+        self.acceptance_table = np.where(self.ttl_beliefs == 0, 0.5,
+                                         self.cnt_beliefs / np.maximum(self.ttl_beliefs, 1))
 
     def init(self, game_env: ColoredTrails, player_id: str):
         """Initialize for a new game"""
@@ -85,24 +137,41 @@ class ToM0Model:
         self.game = game_env
 
         # Initialize belief_offer for all possible offers
-        self.belief_offer = {}
-        for offer in self._generate_all_possible_offers():
-            self.belief_offer[offer] = self.get_acceptance_rate(offer[0], offer[1])
+        self.offers = self._generate_all_possible_offers()
+        self.offer_codes = {offer: code for code, offer in enumerate(self.offers)}
+        self.give_sizes = np.array([len(give) for give, _ in self.offers], dtype=np.int64)
+        self.receive_sizes = np.array([len(receive) for _, receive in self.offers], dtype=np.int64)
+        self.offer_cells = self.get_offer_cells(self.offers)
+        self.belief_offer = self.acceptance_table[self.offer_cells]
 
         self.save_count = 0
         self.saved_beliefs = []
+        self.belief_log = []
         self.belief_history = []  # Reset history for new game
+        self.belief_version += 1
 
     def save_beliefs(self):
-        """Save current beliefs to be restored later"""
-        self.saved_beliefs.append(dict(self.belief_offer))
+        """Save current beliefs to be restored later (a checkpoint in the undo log)"""
+        self.saved_beliefs.append(len(self.belief_log))
         self.save_count += 1
 
     def restore_beliefs(self):
-        """Restore previously saved beliefs"""
+        """Restore previously saved beliefs, undoing the changes made since save_beliefs"""
         self.save_count -= 1
-        self.belief_offer = self.saved_beliefs[self.save_count]
-        self.saved_beliefs.pop()
+        checkpoint = self.saved_beliefs.pop()
+        belief_log = self.belief_log
+        while len(belief_log) > checkpoint:
+            codes, beliefs = belief_log.pop()
+            self.belief_offer[codes] = beliefs
+
+    def _scale_offer_beliefs(self, mask: np.ndarray, factor: float):
+        """Multiply the beliefs in the masked offers, logging the old values while beliefs are saved"""
+        codes = np.flatnonzero(mask)
+        if not len(codes):
+            return
+        if self.save_count:
+            self.belief_log.append((codes, self.belief_offer[codes]))
+        self.belief_offer[codes] *= factor
 
     def _get_chip_difference(self, give_chips: List[str], receive_chips: List[str]) -> Tuple[int, int]:
         """Calculate positive and negative chip differences for a trade"""
@@ -113,56 +182,51 @@ class ToM0Model:
         neg = len(give_chips)     # chips we give (negative for us)
         return min(pos, 8), min(neg, 8)  # cap at 8 for matrix bounds
 
+    def get_offer_cells(self, offers: List[Tuple[List[str], List[str]]]) -> Tuple[np.ndarray, np.ndarray]:
+        """(pos, neg) index arrays of the belief-matrix cells of a list of offers"""
+        cells = [self._get_chip_difference(give_chips, receive_chips) for give_chips, receive_chips in offers]
+        return tuple(np.array(cells, dtype=np.intp).reshape(-1, 2).T)
+
     def get_acceptance_rate(self, give_chips: List[str], receive_chips: List[str]) -> float:
         """Returns the believed probability that a given offer will be accepted"""
         pos, neg = self._get_chip_difference(give_chips, receive_chips)
+        return float(self.acceptance_table[pos, neg])
 
-        if self.ttl_beliefs[pos][neg] == 0:
-            return 0.5
-
-        return self.cnt_beliefs[pos][neg] / self.ttl_beliefs[pos][neg]
+    def get_acceptance_rates(self, offer_cells: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+        """get_acceptance_rate of many offers, given their cells (see get_offer_cells), in one gather"""
+        return self.acceptance_table[offer_cells]
 
     def observe(self, give_chips: List[str], receive_chips: List[str], is_accepted: bool, player_id: str):
         """Observe an offer being made and whether it was accepted"""
         pos, neg = self._get_chip_difference(give_chips, receive_chips)
 
         # Update total observations
-        self.ttl_beliefs[pos][neg] += 1
+        self.ttl_beliefs[pos, neg] += 1
 
         if player_id != self.player_id:
             # Observing opponent's behavior
-            self.cnt_beliefs[pos][neg] += 1
+            self.cnt_beliefs[pos, neg] += 1
             self.increase_color_belief(give_chips, receive_chips)
         elif is_accepted:
-            self.cnt_beliefs[pos][neg] += 1
+            self.cnt_beliefs[pos, neg] += 1
         else:
             self.decrease_color_belief(give_chips, receive_chips)
+        self.acceptance_table[pos, neg] = self.cnt_beliefs[pos, neg] / self.ttl_beliefs[pos, neg]
+        self.belief_version += 1
 
         # Record belief state for visualization
         self._record_belief_state(give_chips, receive_chips, is_accepted)
 
     def _record_belief_state(self, give_chips: List[str], receive_chips: List[str], is_accepted: bool):
         """Record current belief state for visualization"""
-        # Sample some key acceptance rates
-        sample_offers = [
-            (["RE"], ["BL"]),
-            (["BL"], ["RE"]),
-            (["YE"], ["GR"]),
-            (["Pass"], ["Pass"])
-        ]
-
+        # Sample some key acceptance rates (SAMPLE_OFFERS)
         belief_snapshot = {
             'round': len(self.belief_history),
             'offer': (give_chips, receive_chips),
             'accepted': is_accepted,
-            'acceptance_rates': {}
+            'acceptance_rates': dict(zip(self.sample_keys, self.acceptance_table[self.sample_cells].tolist()))
         }
 
-        for offer in sample_offers:
-            if all(c in COLORS or c == "Pass" for c in offer[0] + offer[1]):
-                rate = self.get_acceptance_rate(offer[0], offer[1])
-                belief_snapshot['acceptance_rates'][str(offer)] = rate
-
         self.belief_history.append(belief_snapshot)
 
     def get_belief_summary(self) -> Dict:
@@ -176,7 +240,7 @@ class ToM0Model:
 
         # Get top 5 offers by acceptance rate
         offer_rates = []
-        for offer, rate in self.belief_offer.items():
+        for offer, rate in zip(self.offers, self.belief_offer.tolist()):
             if offer != (("Pass",), ("Pass",)):
                 offer_rates.append((offer, rate))
 
@@ -184,41 +248,22 @@ class ToM0Model:
         summary['top_acceptance_rates'] = offer_rates[:5]
 
         # Sample belief matrix (first 3x3)
-        for i in range(min(3, len(self.cnt_beliefs))):
-            row = []
-            for j in range(min(3, len(self.cnt_beliefs[i]))):
-                if self.ttl_beliefs[i][j] > 0:
-                    rate = self.cnt_beliefs[i][j] / self.ttl_beliefs[i][j]
-                else:
-                    rate = 0.5
-                row.append(f"{rate:.2f}")
-            summary['belief_matrix_sample'].append(row)
+        for row in self.acceptance_table[:3, :3].tolist():
+            summary['belief_matrix_sample'].append([f"{rate:.2f}" for rate in row])
 
         return summary
 
     def increase_color_belief(self, give_chips: List[str], receive_chips: List[str]):
         """Decrease belief that offers less generous than this will be successful"""
-        offer_key = (tuple(sorted(give_chips)), tuple(sorted(receive_chips)))
-
-        for test_offer in self.belief_offer:
-            test_give, test_receive = test_offer
-
-            # If test offer is less generous (gives less or asks for more)
-            if (len(test_give) < len(give_chips) or
-                len(test_receive) > len(receive_chips)):
-                self.belief_offer[test_offer] *= (1 - self.learning_speed)
+        # Test offers that are less generous (give less or ask for more)
+        self._scale_offer_beliefs((self.give_sizes < len(give_chips)) | (self.receive_sizes > len(receive_chips)),
+                                  1 - self.learning_speed)
 
     def decrease_color_belief(self, give_chips: List[str], receive_chips: List[str]):
         """Decrease belief that offers no more generous than this will be successful"""
-        offer_key = (tuple(sorted(give_chips)), tuple(sorted(receive_chips)))
-
-        for test_offer in self.belief_offer:
-            test_give, test_receive = test_offer
-
-            # If test offer is no more generous
-            if (len(test_give) <= len(give_chips) and
-                len(test_receive) >= len(receive_chips)):
-                self.belief_offer[test_offer] *= (1 - self.learning_speed)
+        # Test offers that are no more generous
+        self._scale_offer_beliefs((self.give_sizes <= len(give_chips)) & (self.receive_sizes >= len(receive_chips)),
+                                  1 - self.learning_speed)
 
     def _generate_all_possible_offers(self) -> List[Tuple[Tuple[str], Tuple[str]]]:
         """Generate all possible offers for initialization"""
@@ -256,13 +301,224 @@ class ToM0Model:
         self.opponent_id = "p2" if new_player_id == "p1" else "p1"
 
 
+class OfferIndex:
+    """
+    Integer ids for the offers ToM agents reason about.
+
+    Ids 0 .. n_candidates - 1 are every offer _generate_possible_offers can produce over
+    the colors (pass, 1-for-1 in different colors, 2-for-1 and 1-for-2), in generation
+    order, so a player's candidates in a game state are the ids whose chips both players
+    hold, in that same order (see candidates). That part is built once (OFFER_INDEX) and
+    shared by every agent. Any other offer, e.g. one proposed by a non-ToM agent, gets the
+    next free id the first time it is looked up; those ids belong to one agent hierarchy's
+    scoped() copy and are dropped with clear_extras (a new game, see ToMAgent.init).
+
+    Per id: the offer as (give, receive) chip lists (internal, see offer for copies), the id of
+    the flipped offer (the same trade seen by the other player, like flipArray in
+    ct_alt_game.py), whether it is a pass and its ToM0Model belief-matrix cell. Candidates
+    also have give / receive count vectors (in color order) and cell index arrays.
+    """
+
+    def __init__(self, colors: List[str] = COLORS):
+        self.colors = list(colors)
+        self.offers: List[Tuple[List[str], List[str]]] = []
+        self.ids: Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], int] = {}
+        self.flip: List[int] = []
+        self.is_pass: List[bool] = []
+        self.cells: List[Tuple[int, int]] = []
+
+        self._add(["Pass"], ["Pass"])
+        for my_color in self.colors:
+            for opp_color in self.colors:
+                if my_color != opp_color:
+                    self._add([my_color], [opp_color])
+        for my_color in self.colors:
+            for opp_color in self.colors:
+                self._add([my_color, my_color], [opp_color])
+        for my_color in self.colors:
+            for opp_color in self.colors:
+                self._add([my_color], [opp_color, opp_color])
+        self.n_candidates = len(self.offers)
+        # The candidates are closed under flipping
+        self.flip = [self.ids[(tuple(receive_chips), tuple(give_chips))] for give_chips, receive_chips in self.offers]
+
+        color_index = {color: i for i, color in enumerate(self.colors)}
+        self.give = np.zeros((self.n_candidates, len(self.colors)), dtype=np.int64)
+        self.receive = np.zeros((self.n_candidates, len(self.colors)), dtype=np.int64)
+        for offer_id, (give_chips, receive_chips) in enumerate(self.offers):
+            for chip in give_chips:
+                if chip != "Pass":
+                    self.give[offer_id, color_index[chip]] += 1
+            for chip in receive_chips:
+                if chip != "Pass":
+                    self.receive[offer_id, color_index[chip]] += 1
+        self.cell_index = tuple(np.array(self.cells, dtype=np.intp).T)
+        # give / receive vectors laid out for other color orders (see vectors)
+        self._vectors = {tuple(self.colors): (self.give, self.receive)}
+
+    def _add(self, give_chips: List[str], receive_chips: List[str]) -> int:
+        offer_id = self.ids[(tuple(give_chips), tuple(receive_chips))] = len(self.offers)
+        self.offers.append((list(give_chips), list(receive_chips)))
+        self.is_pass.append(give_chips == ["Pass"])
+        # Same cell as ToM0Model._get_chip_difference
+        if give_chips == ["Pass"] or receive_chips == ["Pass"]:
+            self.cells.append((0, 0))
+        else:
+            self.cells.append((min(len(receive_chips), 8), min(len(give_chips), 8)))
+        self.flip.append(offer_id)
+        return offer_id
+
+    def scoped(self) -> "OfferIndex":
+        """A copy sharing the candidate part, with its own (empty) set of other offers."""
+        index = object.__new__(OfferIndex)
+        index.__dict__.update(self.__dict__)
+        index.offers, index.ids = list(self.offers), dict(self.ids)
+        index.flip, index.is_pass, index.cells = list(self.flip), list(self.is_pass), list(self.cells)
+        index.clear_extras()
+        return index
+
+    def clear_extras(self):
+        """Drops the ids of every offer outside the candidates."""
+        n_candidates = self.n_candidates
+        if len(self.offers) > n_candidates:
+            for data in (self.offers, self.flip, self.is_pass, self.cells):
+                del data[n_candidates:]
+            self.ids = {key: offer_id for key, offer_id in self.ids.items() if offer_id < n_candidates}
+
+    def offer(self, offer_id: int) -> Tuple[List[str], List[str]]:
+        """The (give, receive) chips of an id, as new lists the caller may keep or modify."""
+        give_chips, receive_chips = self.offers[offer_id]
+        return list(give_chips), list(receive_chips)
+
+    def offer_id(self, give_chips: List[str], receive_chips: List[str]) -> int:
+        """Id of an offer (equal chip lists, in the same order, share an id)."""
+        offer_id = self.ids.get((tuple(give_chips), tuple(receive_chips)))
+        if offer_id is None:
+            offer_id = self._add(give_chips, receive_chips)
+            flipped = self.ids.get((tuple(receive_chips), tuple(give_chips)))
+            if flipped is None:
+                flipped = self._add(receive_chips, give_chips)
+            self.flip[offer_id] = flipped
+            self.flip[flipped] = offer_id
+        return offer_id
+
+    def candidates(self, my_chips: Dict[str, int], opp_chips: Dict[str, int]) -> List[int]:
+        """Ids of the candidate offers of a player holding my_chips against opp_chips."""
+        my_counts = np.array([my_chips.get(color, 0) for color in self.colors])
+        opp_counts = np.array([opp_chips.get(color, 0) for color in self.colors])
+        held = (self.give <= my_counts).all(axis=1) & (self.receive <= opp_counts).all(axis=1)
+        return np.flatnonzero(held).tolist()
+
+    def vectors(self, colors: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Candidate give / receive count vectors with columns in the order of `colors`."""
+        key = tuple(colors)
+        vectors = self._vectors.get(key)
+        if vectors is None:
+            columns = [key.index(color) for color in self.colors]
+            vectors = tuple(np.zeros((self.n_candidates, len(key)), dtype=np.int64) for _ in range(2))
+            vectors[0][:, columns] = self.give
+            vectors[1][:, columns] = self.receive
+            self._vectors[key] = vectors
+        return vectors
+
+
+OFFER_INDEX = OfferIndex()
+
+
+class DirectGainCache:
+    """
+    Per game state data on the offers of an OfferIndex (by default a scoped copy of
+    OFFER_INDEX), shared by an agent and every model in its hierarchy: each player's
+    candidate offer ids and the direct utility gains (ColoredTrails.evaluate_trade) of
+    offers. An offer is scored once per game state instead of once per level, location and
+    candidate. A player's entries are dropped as soon as the chips (or goal, or the game)
+    they depend on change, and everything, including the non-candidate offer ids, by clear.
+    """
+
+    def __init__(self, index: Optional[OfferIndex] = None):
+        self.index = OFFER_INDEX.scoped() if index is None else index
+        # player_id -> (game, chip counts, extra chips, goal, {offer id: gain})
+        self.tables: Dict[str, Tuple] = {}
+        # player_id -> (game, chip counts, opponent chip counts, candidate ids)
+        self.candidate_ids: Dict[str, Tuple] = {}
+
+    def clear(self):
+        """Drops every entry and the ids of non-candidate offers (a new game)."""
+        self.tables.clear()
+        self.candidate_ids.clear()
+        self.index.clear_extras()
+
+    def table(self, game: ColoredTrails, player_id: str) -> Dict[int, float]:
+        """The gains recorded for a player's current chips (emptied if they changed)."""
+        state = game.states[player_id]
+        # A ChipCounter hands out the same counts tuple until it is mutated
+        counts, extra = chip_vector(state.chips, game.color_index)
+        entry = self.tables.get(player_id)
+        if (entry is None or entry[0] is not game or entry[1] is not counts or entry[2] != extra
+                or entry[3] != state.goal_pos):
+            entry = self.tables[player_id] = (game, counts, extra, state.goal_pos, {})
+        return entry[4]
+
+    def candidates(self, game: ColoredTrails, player_id: str, opponent_id: str) -> List[int]:
+        """Ids of a player's candidate offers in the current game state (built once per state)."""
+        my_chips = game.states[player_id].chips
+        opp_chips = game.states[opponent_id].chips
+        my_counts, _ = chip_vector(my_chips, game.color_index)
+        opp_counts, _ = chip_vector(opp_chips, game.color_index)
+        entry = self.candidate_ids.get(player_id)
+        if entry is None or entry[0] is not game or entry[1] is not my_counts or entry[2] is not opp_counts:
+            entry = self.candidate_ids[player_id] = (game, my_counts, opp_counts,
+                                                     self.index.candidates(my_chips, opp_chips))
+        return entry[3]
+
+    def gain(self, game: ColoredTrails, player_id: str, offer_id: int) -> float:
+        """game.evaluate_trade(player_id, give_chips, receive_chips) of an offer, once per game state."""
+        table = self.table(game, player_id)
+        gain = table.get(offer_id)
+        if gain is None:
+            give_chips, receive_chips = self.index.offers[offer_id]
+            gain = table[offer_id] = game.evaluate_trade(player_id, give_chips, receive_chips)
+        return gain
+
+    def gains(self, game: ColoredTrails, player_id: str, offer_ids: List[int]) -> List[float]:
+        """
+        Gains of a list of candidate offers (ids below index.n_candidates). The ones not
+        recorded yet are scored together with a single ColoredTrails.score_many call.
+        """
+        table = self.table(game, player_id)
+        missing = [offer_id for offer_id in offer_ids if offer_id not in table]
+        if missing:
+            counts, _ = chip_vector(game.states[player_id].chips, game.color_index)
+            give, receive = self.index.vectors(game.colors)
+            current = np.asarray(counts, dtype=np.int64)
+            rows = np.array(missing, dtype=np.intp)
+            held = (give[rows] <= current).all(axis=1).tolist()
+            scored = [offer_id for offer_id, has_chips in zip(missing, held)
+                      if has_chips and not self.index.is_pass[offer_id]]
+            for offer_id, has_chips in zip(missing, held):
+                if self.index.is_pass[offer_id]:
+                    table[offer_id] = 0
+                elif not has_chips:
+                    table[offer_id] = -float('inf')
+
+            if scored:
+                current_score, _, _ = game.get_max_score_and_path(player_id)
+                rows = np.array(scored, dtype=np.intp)
+                new_scores, _, _ = game.score_many(player_id, current - give[rows] + receive[rows])
+                for offer_id, new_score in zip(scored, new_scores.tolist()):
+                    table[offer_id] = new_score - current_score
+
+        return [table[offer_id] for offer_id in offer_ids]
+
+
 class ToMAgent:
     """
     Theory of Mind agent that models opponent's decision-making.
     Supports different orders of recursive reasoning.
     """
 
-    def __init__(self, player_id: str, game_env: ColoredTrails, order: int = 1, logger=None):
+    def __init__(self, player_id: str, game_env: ColoredTrails, order: int = 1, logger=None,
+                 gain_cache: Optional[DirectGainCache] = None):
         self.player_id = player_id
         self.opponent_id = "p2" if player_id == "p1" else "p1"
         self.game = game_env
@@ -274,40 +530,55 @@ class ToMAgent:
         self.mode = MODE_ALL_LOCATION
         self.history = []
 
-        # Location beliefs (probability distribution over opponent's possible goal locations)
-        self.location_beliefs = []
+        # Location beliefs (probability distribution over opponent's possible goal locations,
+        # as a float array indexed like possible_locations). Updates replace the array, so
+        # save_beliefs only needs an undo log of the arrays replaced and the log length at
+        # each open save_beliefs
+        self.location_beliefs = np.zeros(0)
+        self.belief_log = []
         self.saved_beliefs = []
         self.save_count = 0
         self.last_accuracy = 0
 
+        # Bumped by every change of the location beliefs and every offer received or sent
+        # (see belief_key)
+        self.belief_version = 0
+
+        # Memoized get_value / get_best_value results (order 0, see _value_memo), valid while
+        # memo_key (belief key, gain table and candidate ids of the game state) is unchanged
+        self.memo_key = None
+        self.value_memo = {}
+        self.best_value_memo = None
+
         # Track belief history for visualization
         self.location_belief_history = []
         self.confidence_history = []
 
-        # Initialize possible goal locations
-        self.possible_locations = []
-        for r in range(BOARD_SIZE):
-            for c in range(BOARD_SIZE):
-                if abs(r - 2) + abs(c - 2) > 2:
-                    self.possible_locations.append((r, c))
+        # Possible goal locations (shared, read-only tuple from the board index)
+        self.possible_locations = game_env.board_index.candidate_goals
+
+        # Candidate offers and direct utility gains per game state, shared with every model
+        # below this one
+        self.gain_cache = DirectGainCache() if gain_cache is None else gain_cache
+        self.offer_index = self.gain_cache.index
 
         # Get our actual location index
         self.loc = self._get_location_index(self.game.states[player_id].goal_pos)
 
         # Initialize location beliefs (uniform distribution)
-        self.location_beliefs = [1.0 / len(self.possible_locations)] * len(self.possible_locations)
+        self.location_beliefs = self._uniform_beliefs()
 
         # Create sub-models based on order
         if order > 0:
             # Model of opponent at order-1
             self.opponent_model = ToMAgent(
-                self.opponent_id, game_env, order - 1, logger
+                self.opponent_id, game_env, order - 1, logger, self.gain_cache
             )
             self.opponent_model.confidence_locked = True
 
             # Self model at order-1 (for mixing strategies)
             self.self_model = ToMAgent(
-                player_id, game_env, order - 1, logger
+                player_id, game_env, order - 1, logger, self.gain_cache
             )
         else:
             # Order-0 uses basic learning model
@@ -320,58 +591,101 @@ class ToMAgent:
         if self.logger:
             self.logger.log(f"[ToM{self.order}-{self.player_id}] {msg}")
 
+    def _uniform_beliefs(self) -> np.ndarray:
+        return np.full(len(self.possible_locations), 1.0 / len(self.possible_locations))
+
     def _get_location_index(self, goal_pos: Tuple[int, int]) -> int:
         """Get the index of a goal position in the possible locations list"""
-        try:
-            return self.possible_locations.index(goal_pos)
-        except ValueError:
-            return 0
+        return self.game.board_index.location_index.get(tuple(goal_pos), 0)
 
     def init(self, game_env: ColoredTrails, player_id: str):
         """Initialize for a new game"""
         self.player_id = player_id
         self.opponent_id = "p2" if player_id == "p1" else "p1"
         self.game = game_env
+        self.possible_locations = game_env.board_index.candidate_goals
+        if len(self.location_beliefs) != len(self.possible_locations):
+            self.location_beliefs = self._uniform_beliefs()
         self.loc = self._get_location_index(game_env.states[player_id].goal_pos)
+        self.belief_log = []
         self.saved_beliefs = []
         self.save_count = 0
+        self.belief_version += 1
+        # Candidate ids and gains of the last game, and ids of offers seen in it
+        self.gain_cache.clear()
 
         if self.order > 0:
             self.opponent_model.init(game_env, self.opponent_id)
             self.self_model.init(game_env, player_id)
             # Reset location beliefs to uniform
-            self.location_beliefs = [1.0 / len(self.possible_locations)] * len(self.possible_locations)
+            self.location_beliefs = self._uniform_beliefs()
         else:
             self.opponent_model.init(game_env, player_id)
 
     def save_beliefs(self):
-        """Save current beliefs"""
+        """Save current beliefs (a checkpoint in the undo log)"""
         if self.order > 0:
-            self.saved_beliefs.append(list(self.location_beliefs))
+            self.saved_beliefs.append(len(self.belief_log))
             self.save_count += 1
         self.opponent_model.save_beliefs()
 
     def restore_beliefs(self):
-        """Restore saved beliefs"""
+        """Restore saved beliefs, undoing the updates made since save_beliefs"""
         if self.order > 0:
             self.save_count -= 1
-            self.location_beliefs = self.saved_beliefs[self.save_count]
-            self.saved_beliefs.pop()
+            checkpoint = self.saved_beliefs.pop()
+            if len(self.belief_log) > checkpoint:
+                self.location_beliefs = self.belief_log[checkpoint]
+                del self.belief_log[checkpoint:]
+                self.belief_version += 1
         self.opponent_model.restore_beliefs()
 
+    def _set_location_beliefs(self, beliefs: np.ndarray):
+        """Replace the location beliefs, logging the old array while beliefs are saved"""
+        if self.save_count:
+            self.belief_log.append(self.location_beliefs)
+        self.location_beliefs = beliefs
+        self.belief_version += 1
+
+    def belief_key(self) -> Tuple[int, ...]:
+        """Belief versions of this agent and of every model below it (unchanged key, unchanged beliefs)"""
+        if self.order == 0:
+            return self.belief_version, self.opponent_model.belief_version
+        return (self.belief_version,) + self.self_model.belief_key() + self.opponent_model.belief_key()
+
+    def _value_memo(self) -> Optional[Dict[int, float]]:
+        """
+        Memo of _get_value results (by offer id) for the current beliefs and game state, or
+        None if values are not memoized. Only order-0 values are: they read nothing but the
+        acceptance rates and the direct gains. At higher orders get_value reasons through the
+        opponent model's receive_offer, whose ToM0Model observations outlive restore_beliefs,
+        so a memoized result would skip side effects that later decisions depend on.
+        """
+        if self.order > 0 or not MEMOIZE_VALUES:
+            return None
+        key = self.belief_key()
+        gains = self.gain_cache.table(self.game, self.player_id)
+        candidates = self._candidate_ids()
+        memo_key = self.memo_key
+        if memo_key is None or memo_key[0] != key or memo_key[1] is not gains or memo_key[2] is not candidates:
+            self.memo_key = (key, gains, candidates)
+            self.value_memo = {}
+            self.best_value_memo = None
+        return self.value_memo
+
     def get_location_beliefs(self, location: int) -> float:
         """Get belief probability for a specific location"""
         if self.confidence_locked:
-            return self.location_beliefs[location]
+            return float(self.location_beliefs[location])
 
         if self.order == 0:
             return 1.0 / len(self.possible_locations)
 
         if self.confidence >= 1.0:
-            return self.location_beliefs[location]
+            return float(self.location_beliefs[location])
 
         # Mix with lower-order model
-        return (self.confidence * self.location_beliefs[location] +
+        return (self.confidence * float(self.location_beliefs[location]) +
                 (1 - self.confidence) * self.self_model.get_location_beliefs(location))
 
     def inform_location(self, game_env: ColoredTrails):
@@ -381,8 +695,9 @@ class ToMAgent:
         if self.order > 0:
             # Set location beliefs to actual location with certainty
             opp_loc = self._get_location_index(game_env.states[self.opponent_id].goal_pos)
-            self.location_beliefs = [0.0] * len(self.possible_locations)
-            self.location_beliefs[opp_loc] = 1.0
+            beliefs = np.zeros(len(self.possible_locations))
+            beliefs[opp_loc] = 1.0
+            self._set_location_beliefs(beliefs)
 
             self.self_model.inform_location(game_env)
             self.opponent_model.inform_location(game_env)
@@ -399,24 +714,26 @@ class ToMAgent:
             best_offers = []
             best_value = -float('inf')
 
-            for give_chips, receive_chips in self._generate_possible_offers():
+            offer_ids = self._candidate_ids()
+            utility_gains = self.gain_cache.gains(self.game, self.player_id, offer_ids)
+            acceptance_rates = self._acceptance_rates(offer_ids)
+
+            for offer_id, utility_gain, acceptance_rate in zip(offer_ids, utility_gains, acceptance_rates):
                 # Calculate expected value = utility_gain * acceptance_rate
-                utility_gain = self._calculate_direct_utility_gain(give_chips, receive_chips)
-                acceptance_rate = self.opponent_model.get_acceptance_rate(give_chips, receive_chips)
                 expected_value = utility_gain * acceptance_rate
 
                 if expected_value > best_value + PRECISION:
                     best_value = expected_value
-                    best_offers = [(give_chips, receive_chips)]
+                    best_offers = [offer_id]
                 elif abs(expected_value - best_value) < PRECISION:
-                    best_offers.append((give_chips, receive_chips))
+                    best_offers.append(offer_id)
 
             if not best_offers or best_value < 0:
                 self._log("No beneficial trade found, passing")
                 self.history.append(f"{self.player_id} PASSED")
                 return ["Pass"], ["Pass"]
 
-            give_chips, receive_chips = random.choice(best_offers)
+            give_chips, receive_chips = self.offer_index.offer(random.choice(best_offers))
             self._log(f"Proposing: give {give_chips} for {receive_chips} (expected value: {best_value:.2f})")
             self.history.append(f"{self.player_id} offers {give_chips} for {receive_chips}")
 
@@ -426,7 +743,7 @@ class ToMAgent:
             return give_chips, receive_chips
         else:
             # Higher-order: use existing logic
-            valid_offers = self.get_valid_offers(offer_to_me=None)
+            valid_offers = self._valid_offer_ids(None)
 
             if not valid_offers:
                 self._log("No valid offers found, passing")
@@ -435,16 +752,16 @@ class ToMAgent:
 
             selected = random.choice(valid_offers)
 
-            if selected == (["Pass"], ["Pass"]):
+            if selected == PASS_ID:
                 self._log("Best option is to pass")
                 self.history.append(f"{self.player_id} PASSED")
                 return ["Pass"], ["Pass"]
 
-            give_chips, receive_chips = selected
+            give_chips, receive_chips = self.offer_index.offer(selected)
             self._log(f"Proposing: give {give_chips} for {receive_chips}")
             self.history.append(f"{self.player_id} offers {give_chips} for {receive_chips}")
 
-            self.send_offer(give_chips, receive_chips)
+            self._send_offer(selected)
 
             return give_chips, receive_chips
 
@@ -472,9 +789,11 @@ class ToMAgent:
                 self.history.append(f"{self.player_id} REJECT (insufficient {chip})")
                 return False
 
+        offer_id = self.offer_index.offer_id(opp_give, opp_receive)
+
         if self.order == 0:
             # Order-0: Accept if utility gain is positive
-            utility_gain = self._calculate_direct_utility_gain(opp_receive, opp_give)
+            utility_gain = self._gain(self.offer_index.flip[offer_id])
             accept = utility_gain > 0
 
             # Update beliefs based on the outcome
@@ -491,13 +810,13 @@ class ToMAgent:
         else:
             # Higher-order: use existing logic
             # Receive the offer (update models)
-            self.receive_offer(opp_give, opp_receive)
+            self._receive_offer(offer_id)
 
             # Get our best alternative
-            best_offers = self.get_valid_offers(offer_to_me=(opp_give, opp_receive))
+            best_offers = self._valid_offer_ids(offer_id)
 
             # If the opponent's offer is among our best options, accept
-            if (opp_give, opp_receive) in best_offers:
+            if offer_id in best_offers:
                 self._log("ACCEPTING (offer is among best options)")
                 self.history.append(f"{self.player_id} ACCEPTED")
                 return True
@@ -508,36 +827,39 @@ class ToMAgent:
 
     def get_valid_offers(self, offer_to_me: Optional[Tuple[List[str], List[str]]]) -> List[Tuple[List[str], List[str]]]:
         """Get all offers that maximize expected utility"""
+        offer_id = None if offer_to_me is None else self.offer_index.offer_id(*offer_to_me)
+        return [self.offer_index.offer(i) for i in self._valid_offer_ids(offer_id)]
+
+    def _valid_offer_ids(self, offer_to_me: Optional[int]) -> List[int]:
+        """get_valid_offers on offer ids (offer_to_me as proposed by the opponent)"""
         all_offers = []
         best_value = 0
 
-        # Generate possible offers
-        possible = self._generate_possible_offers()
-
-        for give_chips, receive_chips in possible:
-            value = self.get_value(give_chips, receive_chips)
+        # Candidate offers, with their direct gains scored in one pass
+        possible = self._candidate_ids()
+        values = self._get_values(possible, self.gain_cache.gains(self.game, self.player_id, possible))
 
+        for offer_id, value in zip(possible, values):
             if value > best_value - PRECISION:
                 if value > best_value + PRECISION:
                     all_offers = []
                     best_value = value
-                all_offers.append((give_chips, receive_chips))
+                all_offers.append(offer_id)
 
         # If offered something, check if it's better than our best counter-offer
         if offer_to_me is not None:
-            opp_give, opp_receive = offer_to_me
-            offer_value = self._calculate_direct_utility_gain(opp_receive, opp_give)
+            offer_value = self._gain(self.offer_index.flip[offer_to_me])
 
             if offer_value > best_value - PRECISION:
                 if offer_value > best_value + PRECISION:
-                    all_offers = [(opp_give, opp_receive)]
+                    all_offers = [offer_to_me]
                     best_value = offer_value
-                elif (opp_give, opp_receive) not in all_offers:
-                    all_offers.append((opp_give, opp_receive))
+                elif offer_to_me not in all_offers:
+                    all_offers.append(offer_to_me)
 
         # If best value is negative, passing/withdrawing is better
         if best_value < PRECISION:
-            all_offers = [(["Pass"], ["Pass"])]
+            all_offers = [PASS_ID]
 
         return all_offers
 
@@ -546,14 +868,18 @@ class ToMAgent:
         Get expected value of making an offer, assuming (predicting) the opponent's goal
         is the one currently set in the opponent_model (loc attribute).
 
-        This method is called inside a loop over location beliefs in get_value(). So there is no leakage of the actual
-        goal location.
+        This method is called for every location held possible in get_value() (see _location_values). So there is
+        no leakage of the actual goal location.
         """
-        direct_gain = self._calculate_direct_utility_gain(give_chips, receive_chips)
+        return self._get_location_value(self.offer_index.offer_id(give_chips, receive_chips))
+
+    def _get_location_value(self, offer_id: int) -> float:
+        """get_location_value of an offer id"""
+        direct_gain = self._gain(offer_id)
 
         if self.order == 0:
             # Order-0 case (should only be hit in edge cases, get_value handles this)
-            acceptance = self.opponent_model.get_acceptance_rate(give_chips, receive_chips)
+            acceptance = self._acceptance_rate(offer_id)
             return direct_gain * acceptance
 
         # --- Higher Order (Order > 0) Logic ---
@@ -562,7 +888,7 @@ class ToMAgent:
         # which acts as the opponent's acceptance probability for us.
 
         # 1. Flip the offer: Opponent receives `give_chips` and gives `receive_chips`
-        opp_value_of_receiving_offer = self.opponent_model.get_value(receive_chips, give_chips)
+        opp_value_of_receiving_offer = self.opponent_model._get_value_of(self.offer_index.flip[offer_id])
 
         # 2. Get the opponent's best possible value
         opp_best_value = self.opponent_model.get_best_value()
@@ -591,23 +917,39 @@ class ToMAgent:
 
     def get_value(self, give_chips: List[str], receive_chips: List[str]) -> float:
         """Get expected value of making an offer"""
+        return self._get_value_of(self.offer_index.offer_id(give_chips, receive_chips))
+
+    def _get_value_of(self, offer_id: int) -> float:
+        """get_value of an offer id"""
+        return self._get_value(offer_id, self._gain(offer_id))
+
+    def _get_value(self, offer_id: int, direct_gain: float) -> float:
+        """get_value given the offer's direct utility gain (the gain_cache one; memoized at order 0)"""
+        memo = self._value_memo()
+        if memo is None:
+            return self._compute_value(offer_id, direct_gain)
+        value = memo.get(offer_id)
+        if value is None:
+            value = memo[offer_id] = self._compute_value(offer_id, direct_gain)
+        return value
+
+    def _compute_value(self, offer_id: int, direct_gain: float) -> float:
+        """get_value given the offer's direct utility gain"""
         # Check if this trade improves our position
-        direct_gain = self._calculate_direct_utility_gain(give_chips, receive_chips)
-
-        if direct_gain <= 0 and give_chips != ["Pass"]:
+        if direct_gain <= 0 and not self.offer_index.is_pass[offer_id]:
             return -1  # Don't make trades that hurt us
 
         if self.order == 0:
             # Order-0: Simple expected value = utility_gain * acceptance_probability
             # No Theory of Mind - just learned acceptance rates
-            acceptance_rate = self.opponent_model.get_acceptance_rate(give_chips, receive_chips)
+            acceptance_rate = self._acceptance_rate(offer_id)
 
             return direct_gain * acceptance_rate
 
         # Higher order: consider opponent's likely response
         if self.confidence > 0 or self.confidence_locked:
             self.opponent_model.save_beliefs()
-            self.opponent_model.receive_offer(receive_chips, give_chips)  # Flipped for opponent
+            self.opponent_model._receive_offer(self.offer_index.flip[offer_id])  # Flipped for opponent
 
             if self.mode == MODE_ONE_LOCATION:
                 # Use most likely location
@@ -622,15 +964,12 @@ class ToMAgent:
                 if hasattr(self.opponent_model, 'loc'):
                     self.opponent_model.loc = loc
 
-                value = self.get_location_beliefs(give_chips, receive_chips)
+                value = self.get_location_beliefs(*self.offer_index.offers[offer_id])
             else:
                 # Average over all locations weighted by belief
-                value = 0
-                for l in range(len(self.location_beliefs)):
-                    if self.location_beliefs[l] > 0:
-                        if hasattr(self.opponent_model, 'loc'):
-                            self.opponent_model.loc = l
-                        value += self.location_beliefs[l] * self.get_location_value(give_chips, receive_chips)
+                held = np.flatnonzero(self.location_beliefs > 0)
+                location_values = self._location_values(offer_id, len(held))
+                value = _running_sum(self.location_beliefs[held] * location_values)
 
             self.opponent_model.restore_beliefs()
         else:
@@ -640,9 +979,37 @@ class ToMAgent:
         if self.confidence >= 1 or self.confidence_locked:
             return value
 
-        low_value = self.self_model.get_value(give_chips, receive_chips)
+        low_value = self.self_model._get_value(offer_id, direct_gain)
         return self.confidence * value + (1 - self.confidence) * low_value
 
+    def _get_values(self, offer_ids: List[int], direct_gains: List[float]) -> List[float]:
+        """
+        _get_value of every offer, in order. At order 0 the acceptance rates of all offers
+        come from one gather over the ToM0Model acceptance table.
+        """
+        if self.order > 0:
+            return [self._get_value(offer_id, direct_gain) for offer_id, direct_gain in zip(offer_ids, direct_gains)]
+
+        is_pass = self.offer_index.is_pass
+        return [-1 if direct_gain <= 0 and not is_pass[offer_id] else direct_gain * acceptance_rate
+                for offer_id, direct_gain, acceptance_rate in zip(offer_ids, direct_gains,
+                                                                   self._acceptance_rates(offer_ids))]
+
+    def _location_values(self, offer_id: int, n_locations: int) -> np.ndarray:
+        """
+        get_location_value of an offer at each of n_locations hypothesized opponent locations.
+
+        The opponent model does not read the hypothesized location, so the values only differ
+        through the side effects of its own hypothetical reasoning (ToM0Model observations
+        made by an order >= 1 opponent model), and those are evaluated once per location in
+        order. An order-0 opponent model has none: one evaluation covers every location.
+        """
+        if self.opponent_model.order == 0:
+            if not n_locations:
+                return np.zeros(0)
+            return np.full(n_locations, float(self._get_location_value(offer_id)))
+        return np.array([self._get_location_value(offer_id) for _ in range(n_locations)], dtype=float)
+
     def _estimate_opponent_gain(self, give_chips: List[str], receive_chips: List[str]) -> float:
         """
         Estimate opponent's utility gain from accepting our offer by averaging
@@ -650,26 +1017,9 @@ class ToMAgent:
 
         The chips are flipped: opponent receives `receive_chips` and gives `give_chips`.
         """
-        # Calculate the opponent's chips after the hypothetical trade
-        opp_chips_after_trade = dict(self.game.states[self.opponent_id].chips)
-
-        for chip in give_chips:  # Opponent receives these chips
-            if chip != "Pass":
-                opp_chips_after_trade[chip] = opp_chips_after_trade.get(chip, 0) + 1
-
-        for chip in receive_chips:  # Opponent gives these chips
-            if chip != "Pass" and chip in opp_chips_after_trade:
-                opp_chips_after_trade[chip] -= 1
-                if opp_chips_after_trade[chip] == 0:
-                    del opp_chips_after_trade[chip]
-
-        # Use the opponent's actual game state object for calculation setup
-        temp_state = self.game.states[self.opponent_id]
-        original_chips = temp_state.chips
-
-        # 🔒 CRITICAL FIX: Save the true goal position before simulation
-        # The game environment (temp_state) should not be modified by modeling.
-        true_goal_pos = temp_state.goal_pos
+        # The opponent can only hand over chips it actually holds
+        opp_chips = self.game.states[self.opponent_id].chips
+        opp_give = list((Counter(chip for chip in receive_chips if chip != "Pass") & opp_chips).elements())
 
         expected_gain = 0.0
 
@@ -678,78 +1028,65 @@ class ToMAgent:
             if belief_prob <= PRECISION:
                 continue
 
-            # 1. Temporarily set the opponent's goal to the hypothesized location
+            # Opponent's utility gain assuming this hypothesized goal, weighted by its belief
             hypothesized_goal = self.possible_locations[l_idx]
-            temp_state.goal_pos = hypothesized_goal
-
-            # Calculate opponent's current max score assuming this hypothesized goal
-            temp_state.chips = original_chips  # Use *actual* current chips
-            opp_current_score, _, _ = self.game.get_max_score_and_path(self.opponent_id)
-
-            # Calculate opponent's new max score assuming this hypothesized goal
-            temp_state.chips = Counter(opp_chips_after_trade)  # Use *simulated* post-trade chips
-            opp_new_score, _, _ = self.game.get_max_score_and_path(self.opponent_id)
-
-            # Calculate utility gain for this specific location
-            gain_at_location = opp_new_score - opp_current_score
-
-            # Weight the gain by the belief probability
+            gain_at_location = self.game.evaluate_trade(self.opponent_id, opp_give, give_chips,
+                                                         goal=hypothesized_goal)
             expected_gain += belief_prob * gain_at_location
         # --- END MODELING ---
 
-        # CRITICAL RESTORATION: Reset the opponent's state to its original, true values
-        temp_state.goal_pos = true_goal_pos
-        temp_state.chips = original_chips
-
         return expected_gain
 
     def get_best_value(self) -> float:
+        """Get the best achievable value (memoized at order 0)"""
+        if self._value_memo() is None:
+            return self._compute_best_value()
+        if self.best_value_memo is None:
+            self.best_value_memo = self._compute_best_value()
+        return self.best_value_memo
+
+    def _compute_best_value(self) -> float:
         """Get the best achievable value"""
         best = 0
-        for give_chips, receive_chips in self._generate_possible_offers():
-            value = self.get_value(give_chips, receive_chips)
+        possible = self._candidate_ids()
+        for value in self._get_values(possible, self.gain_cache.gains(self.game, self.player_id, possible)):
             if value > best:
                 best = value
         return max(0, best)
 
     def update_location_beliefs(self, give_chips: List[str], receive_chips: List[str]):
         """Update beliefs about opponent's location based on their offer"""
+        self._update_location_beliefs(self.offer_index.offer_id(give_chips, receive_chips))
+
+    def _update_location_beliefs(self, offer_id: int):
+        """update_location_beliefs for an offer id (as made by the opponent)"""
         if self.order == 0:
             return
 
-        accuracy = 0
-        sum_beliefs = 0
-
-        for l in range(len(self.location_beliefs)):
-            # Temporarily set opponent model to this location
-            if hasattr(self.opponent_model, 'loc'):
-                old_loc = self.opponent_model.loc
-                self.opponent_model.loc = l
-
-            # How likely is opponent to make this offer from location l?
-            if hasattr(self.opponent_model, 'get_value'):
-                offer_value = self.opponent_model.get_value(give_chips, receive_chips)
-                best_value = self.opponent_model.get_best_value()
-
-                if offer_value <= 0:
-                    self.location_beliefs[l] = 0
-                else:
-                    likelihood = max((offer_value + 1) / (best_value + 1), 0)
-                    self.location_beliefs[l] *= likelihood
-                    accuracy += self.location_beliefs[l]
+        # How likely is opponent to make this offer from each location? One row of
+        # (offer value, best value) of the opponent model per location, see _location_values
+        n_locations = len(self.location_beliefs)
+        if self.opponent_model.order == 0:
+            values = np.array([(self.opponent_model._get_value_of(offer_id),
+                                self.opponent_model.get_best_value())] * n_locations, dtype=float)
+        else:
+            values = np.array([(self.opponent_model._get_value_of(offer_id),
+                                self.opponent_model.get_best_value()) for _ in range(n_locations)], dtype=float)
+        offer_values, best_values = values[:, 0], values[:, 1]
 
-                if hasattr(self.opponent_model, 'loc'):
-                    self.opponent_model.loc = old_loc
+        likelihood = np.maximum((offer_values + 1) / (best_values + 1), 0)
+        beliefs = np.where(offer_values <= 0, 0.0, self.location_beliefs * likelihood)
 
-            sum_beliefs += self.location_beliefs[l]
+        # Ruled-out locations add nothing, so the belief mass kept (accuracy) is also the normalizer
+        accuracy = _running_sum(beliefs)
 
         # Normalize
-        if sum_beliefs > 0:
-            for l in range(len(self.location_beliefs)):
-                self.location_beliefs[l] /= sum_beliefs
+        if accuracy > 0:
+            beliefs /= accuracy
         else:
             # Reset to uniform if no beliefs
-            self.location_beliefs = [1.0 / len(self.possible_locations)] * len(self.possible_locations)
+            beliefs = self._uniform_beliefs()
+        self._set_location_beliefs(beliefs)
 
         self.last_accuracy = accuracy
 
@@ -763,7 +1100,7 @@ class ToMAgent:
     def _record_location_beliefs(self):
         """Record current location beliefs for visualization"""
         # Find top 3 most likely locations
-        location_probs = list(enumerate(self.location_beliefs))
+        location_probs = list(enumerate(self.location_beliefs.tolist()))
         location_probs.sort(key=lambda x: x[1], reverse=True)
 
         belief_snapshot = {
@@ -789,7 +1126,7 @@ class ToMAgent:
                 return self.opponent_model.get_belief_summary()
         else:
             # For higher orders, show location beliefs
-            location_probs = list(enumerate(self.location_beliefs))
+            location_probs = list(enumerate(self.location_beliefs.tolist()))
             location_probs.sort(key=lambda x: x[1], reverse=True)
 
             summary['top_goal_beliefs'] = []
@@ -805,91 +1142,73 @@ class ToMAgent:
 
     def receive_offer(self, give_chips: List[str], receive_chips: List[str]):
         """Process receiving an offer from opponent"""
-        if give_chips == ["Pass"]:
+        self._receive_offer(self.offer_index.offer_id(give_chips, receive_chips))
+
+    def _receive_offer(self, offer_id: int):
+        """receive_offer of an offer id (as made by the opponent)"""
+        if self.offer_index.is_pass[offer_id]:
             return
+        self.belief_version += 1
 
         if self.order > 0:
             # Update location beliefs based on the offer
-            self.update_location_beliefs(give_chips, receive_chips)
+            self._update_location_beliefs(offer_id)
 
             # Update sub-models
-            self.self_model.receive_offer(give_chips, receive_chips)
-            self.opponent_model.send_offer(receive_chips, give_chips)  # They sent this
+            self.self_model._receive_offer(offer_id)
+            self.opponent_model._send_offer(self.offer_index.flip[offer_id])  # They sent this
         else:
             # Order-0: just observe
+            give_chips, receive_chips = self.offer_index.offer(offer_id)
             self.opponent_model.observe(give_chips, receive_chips, True, self.opponent_id)
 
     def send_offer(self, give_chips: List[str], receive_chips: List[str]):
         """Process sending an offer"""
+        self._send_offer(self.offer_index.offer_id(give_chips, receive_chips))
+
+    def _send_offer(self, offer_id: int):
+        """send_offer of an offer id"""
+        self.belief_version += 1
         if self.order > 0:
-            self.self_model.send_offer(give_chips, receive_chips)
-            self.opponent_model.receive_offer(receive_chips, give_chips)  # They receive flipped
+            self.self_model._send_offer(offer_id)
+            self.opponent_model._receive_offer(self.offer_index.flip[offer_id])  # They receive flipped
         else:
             # Order-0: observe our own offer as accepted (optimistic)
+            give_chips, receive_chips = self.offer_index.offer(offer_id)
             self.opponent_model.observe(give_chips, receive_chips, True, self.player_id)
 
-    def _calculate_direct_utility_gain(self, give_chips: List[str], receive_chips: List[str]) -> float:
-        """Calculate direct utility gain from a trade"""
-        if give_chips == ["Pass"]:
-            return 0
-
-        current_score, _, _ = self.game.get_max_score_and_path(self.player_id)
-
-        # Check if we can make this trade
-        my_chips = self.game.states[self.player_id].chips
-        for chip in give_chips:
-            if chip != "Pass" and my_chips.get(chip, 0) < give_chips.count(chip):
-                return -float('inf')
-
-        # Simulate the trade
-        new_chips = dict(my_chips)
-        for chip in receive_chips:
-            if chip != "Pass":
-                new_chips[chip] = new_chips.get(chip, 0) + 1
-        for chip in give_chips:
-            if chip != "Pass":
-                new_chips[chip] -= 1
-                if new_chips[chip] == 0:
-                    del new_chips[chip]
-
-        temp_state = self.game.states[self.player_id]
-        original_chips = temp_state.chips
-        temp_state.chips = Counter(new_chips)
-        new_score, _, _ = self.game.get_max_score_and_path(self.player_id)
-        temp_state.chips = original_chips
-
-        return new_score - current_score
+    def _gain(self, offer_id: int) -> float:
+        """Direct utility gain of an offer id (shared per game state, see DirectGainCache)"""
+        return self.gain_cache.gain(self.game, self.player_id, offer_id)
 
-    def _generate_possible_offers(self) -> List[Tuple[List[str], List[str]]]:
-        """Generate reasonable trade offers to consider"""
-        offers = []
-
-        # Pass option
-        offers.append((["Pass"], ["Pass"]))
-
-        my_chips = self.game.states[self.player_id].chips
-        opp_chips = self.game.states[self.opponent_id].chips
+    def _calculate_direct_utility_gain(self, give_chips: List[str], receive_chips: List[str]) -> float:
+        """Calculate direct utility gain from a trade (shared per game state, see DirectGainCache)"""
+        return self._gain(self.offer_index.offer_id(give_chips, receive_chips))
 
-        # Only generate offers with chips we actually have
-        my_colors = [color for color in COLORS if my_chips.get(color, 0) > 0]
-        opp_colors = [color for color in COLORS if opp_chips.get(color, 0) > 0]
+    def _calculate_direct_utility_gains(self, offers: List[Tuple[List[str], List[str]]]) -> List[float]:
+        """
+        Batched _calculate_direct_utility_gain: the offers not scored yet in this game state
+        are scored with a single ColoredTrails.score_many call.
+        """
+        offer_ids = [self.offer_index.offer_id(give_chips, receive_chips) for give_chips, receive_chips in offers]
+        if all(offer_id < self.offer_index.n_candidates for offer_id in offer_ids):
+            return self.gain_cache.gains(self.game, self.player_id, offer_ids)
+        return [self._gain(offer_id) for offer_id in offer_ids]
 
-        # Single chip trades
-        for my_color in my_colors:
-            for opp_color in opp_colors:
-                if my_color != opp_color:
-                    offers.append(([my_color], [opp_color]))
+    def _acceptance_rate(self, offer_id: int) -> float:
+        """ToM0Model.get_acceptance_rate of an offer id (order 0)"""
+        pos, neg = self.offer_index.cells[offer_id]
+        return float(self.opponent_model.acceptance_table[pos, neg])
 
-        # 2-for-1 trades
-        for my_color in my_colors:
-            if my_chips[my_color] >= 2:
-                for opp_color in opp_colors:
-                    offers.append(([my_color, my_color], [opp_color]))
+    def _acceptance_rates(self, offer_ids: List[int]) -> List[float]:
+        """Acceptance rates of candidate offer ids, gathered in one pass (order 0)"""
+        pos, neg = self.offer_index.cell_index
+        return self.opponent_model.get_acceptance_rates((pos[offer_ids], neg[offer_ids])).tolist()
 
-        # 1-for-2 trades
-        for my_color in my_colors:
-            for opp_color in opp_colors:
-                if opp_chips[opp_color] >= 2:
-                    offers.append(([my_color], [opp_color, opp_color]))
+    def _candidate_ids(self) -> List[int]:
+        """Ids of the offers to consider in the current game state (see OfferIndex)"""
+        return self.gain_cache.candidates(self.game, self.player_id, self.opponent_id)
 
-        return offers
\ No newline at end of file
+    def _generate_possible_offers(self) -> List[Tuple[List[str], List[str]]]:
+        """Generate reasonable trade offers to consider"""
+        return [self.offer_index.offer(offer_id) for offer_id in self._candidate_ids()]
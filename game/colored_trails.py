@@ -1,7 +1,12 @@
+import copy
+import heapq
 import json
+import operator
 import random
-from collections import Counter, deque
-from typing import List, Tuple, Dict, Set, Optional
+from collections import Counter, OrderedDict
+from typing import Any, List, Tuple, Dict, Set, Optional, NamedTuple, Sequence
+
+import numpy as np
 
 # --- Configuration Constants ---
 BOARD_SIZE = 5
@@ -14,150 +19,1895 @@ GOAL_BONUS = 500
 UNUSED_CHIP_POINTS = 50
 PENALTY_PER_ROUND = 1
 
+# --- Negotiation Protocol ---
+# Rounds of alternating proposals (p1 then p2) before the game ends without a trade
+MAX_NEGOTIATION_ROUNDS = 5
+
+# Grid of color names, row by row (generated and loaded boards are tuples of tuples)
+BoardMap = Sequence[Sequence[str]]
+
+# --- Board Geometry ---
+# Colors are addressed by their index in the game's color list and cells by their
+# row-major index (r * size + c), so the pathfinding never touches strings or tuples.
+COLOR_INDEX = {color: i for i, color in enumerate(COLORS)}
+MOVES = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+
+
+class BoardGeometry:
+    """
+    Shape-dependent search tables for a square board with a given start position.
+    Shared by every board of the same size and start (see get_geometry).
+    """
+
+    def __init__(self, size: int, start_pos: Tuple[int, int]):
+        self.size = size
+        self.start_pos = tuple(start_pos)
+        self.n_cells = size * size
+        self.start_cell = self.cell(self.start_pos)
+
+        # neighbors[cell] lists the adjacent cells in MOVES order
+        self.neighbors: List[Tuple[int, ...]] = [
+            tuple((r + dr) * size + (c + dc) for dr, dc in MOVES
+                  if 0 <= r + dr < size and 0 <= c + dc < size)
+            for r in range(size) for c in range(size)
+        ]
+        # Same lists padded with -1, for vectorized search
+        self.neighbor_array = np.array(
+            [list(n) + [-1] * (len(MOVES) - len(n)) for n in self.neighbors], dtype=np.int64)
+        self._distances: Dict[int, List[int]] = {}
+        # Bitboards (bit `cell` per cell): every cell, and the cells that may shift one column
+        # right / left without wrapping into the next row
+        self.full_mask = (1 << self.n_cells) - 1
+        last_col = sum(1 << (r * size + size - 1) for r in range(size))
+        self.not_last_col = self.full_mask & ~last_col
+        self.not_first_col = self.full_mask & ~(last_col >> (size - 1))
+        self._rings: Dict[int, Tuple[int, ...]] = {}
+        self._within: Dict[int, Tuple[int, ...]] = {}
+
+        # Rotations and reflections of the square that keep the start cell in place, as
+        # cell permutations (symmetries[k][cell] = image of cell); the identity comes first.
+        # symmetry_sources[k][cell] is the cell that symmetry k moves onto `cell`.
+        self.symmetries: List[Tuple[int, ...]] = []
+        for k in range(8):
+            image = []
+            for r in range(size):
+                for c in range(size):
+                    rr, cc = (r, c) if k < 4 else (r, size - 1 - c)
+                    for _ in range(k % 4):
+                        rr, cc = cc, size - 1 - rr
+                    image.append(rr * size + cc)
+            image = tuple(image)
+            if image[self.start_cell] == self.start_cell and image not in self.symmetries:
+                self.symmetries.append(image)
+        self.symmetry_sources: List[Tuple[int, ...]] = [
+            tuple(sorted(range(self.n_cells), key=image.__getitem__)) for image in self.symmetries]
+        self.symmetry_getters = [operator.itemgetter(*sources) if len(sources) > 1
+                                 else (lambda board, cell=sources[0]: (board[cell],))
+                                 for sources in self.symmetry_sources]
+        # goal_symmetries[cell] = (smallest image of cell, symmetries that send it there)
+        self.goal_symmetries: List[Tuple[int, Tuple[int, ...]]] = []
+        for cell in range(self.n_cells):
+            smallest = min(image[cell] for image in self.symmetries)
+            self.goal_symmetries.append(
+                (smallest, tuple(k for k, image in enumerate(self.symmetries) if image[cell] == smallest)))
+
+    def cell(self, pos: Tuple[int, int]) -> int:
+        return pos[0] * self.size + pos[1]
+
+    def pos(self, cell: int) -> Tuple[int, int]:
+        return divmod(cell, self.size)
+
+    def distances(self, cell: int) -> List[int]:
+        """Manhattan distance from `cell` to every cell (computed once per cell)."""
+        row = self._distances.get(cell)
+        if row is None:
+            r0, c0 = divmod(cell, self.size)
+            row = [abs(r - r0) + abs(c - c0) for r in range(self.size) for c in range(self.size)]
+            self._distances[cell] = row
+        return row
+
+    def distance_rings(self, cell: int) -> Tuple[int, ...]:
+        """rings[d] = bitmask of the cells at Manhattan distance d from `cell`."""
+        rings = self._rings.get(cell)
+        if rings is None:
+            row = self.distances(cell)
+            masks = [0] * (max(row) + 1)
+            for other, dist in enumerate(row):
+                masks[dist] |= 1 << other
+            rings = self._rings[cell] = tuple(masks)
+        return rings
+
+    def within_rings(self, cell: int) -> Tuple[int, ...]:
+        """within[d] = bitmask of the cells at Manhattan distance <= d from `cell`."""
+        within = self._within.get(cell)
+        if within is None:
+            masks = []
+            mask = 0
+            for ring in self.distance_rings(cell):
+                mask |= ring
+                masks.append(mask)
+            within = self._within[cell] = tuple(masks)
+        return within
+
+    def expand(self, mask: int) -> int:
+        """Bitmask of the cells adjacent to any cell of `mask`."""
+        size = self.size
+        return (((mask & self.not_last_col) << 1) | ((mask & self.not_first_col) >> 1)
+                | ((mask << size) & self.full_mask) | (mask >> size))
+
+
+_GEOMETRIES: Dict[Tuple[int, Tuple[int, int]], BoardGeometry] = {}
+
+
+def get_geometry(size: int = BOARD_SIZE, start_pos: Optional[Tuple[int, int]] = None) -> BoardGeometry:
+    """Returns the shared BoardGeometry for a board size (start defaults to the center)."""
+    if start_pos is None:
+        start_pos = (size // 2, size // 2)
+    key = (size, tuple(start_pos))
+    geometry = _GEOMETRIES.get(key)
+    if geometry is None:
+        geometry = BoardGeometry(size, start_pos)
+        _GEOMETRIES[key] = geometry
+    return geometry
+
+
+DEFAULT_GEOMETRY = get_geometry(BOARD_SIZE, START_POS)
+
+# Color tuples and their name -> index maps, shared by every game with the same colors
+DEFAULT_COLORS = tuple(COLORS)
+_COLOR_TABLES: Dict[Tuple[str, ...], Tuple[Tuple[str, ...], Dict[str, int]]] = {
+    DEFAULT_COLORS: (DEFAULT_COLORS, COLOR_INDEX)}
+
+
+def _color_tables(colors: Sequence[str]) -> Tuple[Tuple[str, ...], Dict[str, int]]:
+    colors = tuple(colors)
+    tables = _COLOR_TABLES.get(colors)
+    if tables is None:
+        tables = _COLOR_TABLES[colors] = (colors, {color: i for i, color in enumerate(colors)})
+    return tables
+
+
+def chip_vector(chips: Dict[str, int], color_index: Dict[str, int] = COLOR_INDEX) -> Tuple[Sequence[int], int]:
+    """
+    Splits a chip inventory into per-color counts (in color-index order) and the number of
+    chips that can never be spent (unknown colors), which still count as unused chips.
+    A ChipCounter returns its cached (read-only) count tuple instead of a fresh list.
+    """
+    if type(chips) is ChipCounter:
+        return chips.vector(color_index)
+    return _split_chips(chips, color_index)
+
+
+def _split_chips(chips: Dict[str, int], color_index: Dict[str, int]) -> Tuple[List[int], int]:
+    counts = [0] * len(color_index)
+    extra = 0
+    for color, count in chips.items():
+        idx = color_index.get(color)
+        if idx is not None and count > 0:
+            counts[idx] += count
+        else:
+            extra += count
+    return counts, extra
+
+
+class ChipCounter(Counter):
+    """
+    Chip inventory of a player (GameState.chips). Behaves exactly like a Counter,
+    insertion order included, and also keeps its fixed-length count vector per color
+    list, so repeated scoring of an unchanged inventory does not re-split it. Any
+    mutation drops the cached vector.
+    """
+    __slots__ = ('_vector',)
+
+    def __init__(self, iterable=None, /, **kwds):
+        self._vector = None
+        super().__init__(iterable, **kwds)
+
+    def vector(self, color_index: Dict[str, int] = COLOR_INDEX) -> Tuple[Tuple[int, ...], int]:
+        """Cached chip_vector of this inventory: (per-color counts tuple, unspendable chips)."""
+        cached = self._vector
+        if cached is None or cached[0] is not color_index:
+            counts, extra = _split_chips(self, color_index)
+            cached = self._vector = (color_index, tuple(counts), extra)
+        return cached[1], cached[2]
+
+    def __setitem__(self, key, value):
+        self._vector = None
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._vector = None
+        super().__delitem__(key)
+
+    def update(self, iterable=None, /, **kwds):
+        self._vector = None
+        super().update(iterable, **kwds)
+
+    def clear(self):
+        self._vector = None
+        super().clear()
+
+    def pop(self, *args):
+        self._vector = None
+        return super().pop(*args)
+
+    def popitem(self):
+        self._vector = None
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        self._vector = None
+        return super().setdefault(key, default)
+
+    def copy(self) -> 'ChipCounter':
+        """Copy that keeps the cached count vector (counts are plain ints, so this is also deep)."""
+        clone = ChipCounter.__new__(ChipCounter)
+        dict.update(clone, self)
+        clone._vector = self._vector
+        return clone
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+
+def chips_to_matrix(hands: List[Dict[str, int]], colors: List[str] = COLORS) -> np.ndarray:
+    """Stacks chip inventories into an (N x len(colors)) count matrix for batched scoring."""
+    color_index = {color: i for i, color in enumerate(colors)}
+    matrix = np.zeros((len(hands), len(colors)), dtype=np.int64)
+    for row, chips in enumerate(hands):
+        for color, count in chips.items():
+            if color not in color_index:
+                raise ValueError(f"Unknown chip color: {color}")
+            matrix[row, color_index[color]] += count
+    return matrix
+
+
+def trades_to_matrices(trades: Sequence[Tuple[Sequence[str], Sequence[str]]],
+                       colors: Sequence[str] = COLORS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stacks (give, receive) chip lists into (T x len(colors)) give and receive count
+    matrices for apply_trades / ColoredTrails.evaluate_trades. "Pass" entries count as nothing.
+    """
+    color_index = {color: i for i, color in enumerate(colors)}
+    give = np.zeros((len(trades), len(colors)), dtype=np.int64)
+    receive = np.zeros((len(trades), len(colors)), dtype=np.int64)
+    for row, (give_chips, receive_chips) in enumerate(trades):
+        for matrix, chips in ((give, give_chips), (receive, receive_chips)):
+            for chip in chips:
+                if chip == "Pass":
+                    continue
+                if chip not in color_index:
+                    raise ValueError(f"Unknown chip color: {chip}")
+                matrix[row, color_index[chip]] += 1
+    return give, receive
+
+
+def apply_trades(proposer: np.ndarray, responder: np.ndarray, give: np.ndarray,
+                 receive: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized ColoredTrails.apply_trade over stacked inventories and trades.
+
+    All inputs are integer chip counts with colors on the last axis and broadcast against
+    each other, e.g. (S x 1 x C) inventories with (T x C) trades to try every trade in every
+    state. A trade is valid when the proposer holds `give` and the responder holds `receive`;
+    invalid trades leave both inventories unchanged.
+
+    :return: (valid mask, proposer inventories after the trade, responder inventories after the trade)
+    """
+    proposer = np.asarray(proposer, dtype=np.int64)
+    responder = np.asarray(responder, dtype=np.int64)
+    give = np.asarray(give, dtype=np.int64)
+    receive = np.asarray(receive, dtype=np.int64)
+    valid = ((give >= 0) & (receive >= 0) & (give <= proposer) & (receive <= responder)).all(axis=-1)
+    delta = np.where(valid[..., None], receive - give, 0)
+    return valid, proposer + delta, responder - delta
+
+
+def encode_chips(counts: List[int], radices: List[int]) -> int:
+    """
+    Converts a per-color counts vector to its mixed-radix integer code
+    (first color is the least significant digit, as in convertChips).
+    """
+    code = 0
+    for i in range(len(counts) - 1, -1, -1):
+        code = code * radices[i] + counts[i]
+    return code
+
+
+def decode_chips(code: int, radices: List[int]) -> List[int]:
+    """Converts a mixed-radix chip code back into its per-color counts vector."""
+    counts = []
+    for radix in radices:
+        counts.append(code % radix)
+        code //= radix
+    return counts
+
+
+# Chip vectors packed into 8-bit fields (one per color) for dominance checks: A holds at
+# least as many chips of every color as B iff ((A | PACK_GUARD) - B) & PACK_GUARD == PACK_GUARD.
+PACK_BITS = 8
+PACK_LIMIT = (1 << (PACK_BITS - 1)) - 1
+PACK_UNITS = [1 << (PACK_BITS * i) for i in range(len(COLORS))]
+PACK_GUARD = sum(unit << (PACK_BITS - 1) for unit in PACK_UNITS)
+
+
+def pack_units(n_colors: int) -> Tuple[List[int], int]:
+    """Returns the per-color units and the guard mask for packing n_colors counts."""
+    if n_colors == len(PACK_UNITS):
+        return PACK_UNITS, PACK_GUARD
+    units = [1 << (PACK_BITS * i) for i in range(n_colors)]
+    return units, sum(unit << (PACK_BITS - 1) for unit in units)
+
+
+def pack_chips(counts: List[int]) -> int:
+    """Packs a per-color counts vector (each count <= PACK_LIMIT) into one integer."""
+    return sum(count << (PACK_BITS * i) for i, count in enumerate(counts))
+
+
+class _SparseVisited(dict):
+    """Drop-in for the flat visited bytearray when cells x codes is too large to allocate."""
+
+    def __missing__(self, key):
+        return 0
+
+
+# Largest cells x codes visited table allocated as a flat bytearray
+VISITED_TABLE_LIMIT = 1 << 22
+
+
+def search_max_score(board_colors: bytes, goal_cell: int, counts: List[int], extra: int = 0,
+                     prune_dominated: bool = True,
+                     stats: Optional[Dict[str, int]] = None,
+                     geometry: BoardGeometry = DEFAULT_GEOMETRY,
+                     prune_hopeless: bool = True,
+                     closest_dist: Optional[int] = None,
+                     path: Optional[List[int]] = None) -> Tuple[int, int, int]:
+    """
+    Breadth-first search over (cell, chip code) states.
+
+    The inventory is encoded as a mixed-radix integer whose radix per color is the
+    initial count + 1, so spending a chip of color k is `code - strides[k]` and the
+    visited set is a flat bytearray indexed by cell * n_codes + code. States are
+    discovered in the same order as the original Counter-based BFS, which keeps the
+    tie-breaking (and therefore the returned triple) identical.
+
+    With prune_dominated, every cell also keeps a Pareto frontier of the chip vectors it
+    was reached with. An arrival holding a subset of an earlier arrival's chips can only
+    reach what that arrival reaches, later and with fewer chips, so it is discarded
+    without changing the result.
+
+    With prune_hopeless, a state is not expanded once its distance to the goal minus its
+    remaining chips is at least the best distance found so far: none of its descendants
+    can get strictly closer, and all of them are discovered after the current best, so
+    they can never replace it (and every descendant is hopeless too). If the closest
+    reachable distance is already known (closest_dist, see closest_reachable_distance),
+    states that cannot reach it are skipped from the start and the search stops at the
+    first state that does.
+
+    :param board_colors: Row-major color indices of the board cells.
+    :param goal_cell: Row-major index of the goal cell.
+    :param counts: Spendable chips per color (in color-index order).
+    :param extra: Chips that count as unused but can never be spent.
+    :param prune_dominated: Discard arrivals dominated by a cell's Pareto frontier.
+    :param stats: Optional dict that receives the number of 'expanded' and 'pruned' states.
+    :param geometry: Board size and start position (defaults to the standard 5x5 board).
+    :param prune_hopeless: Skip states that cannot get closer to the goal than the best so far.
+    :param closest_dist: Smallest goal distance of any reachable cell, if known.
+    :param path: Optional list that receives the cells of the scored route, start first.
+    :return: (max_score, min_steps_to_goal, max_unused_chips_value)
+    """
+    spendable = sum(counts)
+    total_chips = spendable + extra
+    if stats is not None:
+        stats['expanded'] = stats['pruned'] = 0
+
+    n_cells = geometry.n_cells
+    start_cell = geometry.start_cell
+    neighbors = geometry.neighbors
+    if goal_cell == start_cell:
+        if path is not None:
+            path[:] = [start_cell]
+        return GOAL_BONUS + total_chips * UNUSED_CHIP_POINTS, 0, total_chips * UNUSED_CHIP_POINTS
+
+    radices = [count + 1 for count in counts]
+    strides = []
+    n_codes = 1
+    for radix in radices:
+        strides.append(n_codes)
+        n_codes *= radix
+
+    prune_dominated = prune_dominated and max(counts, default=0) <= PACK_LIMIT
+    units, guard = pack_units(len(counts))
+    pareto: List[List[int]] = [[] for _ in range(n_cells)]
+    start_packed = pack_chips(counts)
+    pareto[start_cell].append(start_packed)
+
+    goal_dist = geometry.distances(goal_cell)
+    if n_cells * n_codes <= VISITED_TABLE_LIMIT:
+        visited = bytearray(n_cells * n_codes)
+    else:
+        visited = _SparseVisited()
+    start_code = n_codes - 1  # every digit at its maximum
+    start_idx = start_cell * n_codes + start_code
+    visited[start_idx] = 1
+    # Parent state of every discovered state, only kept when the route is requested
+    came_from: Optional[Dict[int, int]] = {} if path is not None else None
+
+    # Best fallback (closest to goal, then most chips, then first discovered)
+    best_dist = goal_dist[start_cell]
+    best_steps = 0
+    best_cell = start_cell
+    best_idx = start_idx
+    # States with goal distance - remaining chips >= hopeless are not expanded
+    if closest_dist is not None:
+        hopeless = min(best_dist, closest_dist + 1)
+    elif prune_hopeless:
+        hopeless = best_dist
+    else:
+        hopeless = n_cells + total_chips + 1  # never reached
+
+    expanded = pruned = 0
+    frontier = [(start_cell, start_code, start_packed)]
+    steps = 0
+    while frontier and best_dist != closest_dist:
+        steps += 1
+        expanded += len(frontier)
+        next_frontier = []
+        append = next_frontier.append
+        for cell, code, packed in frontier:
+            for nxt in neighbors[cell]:
+                color = board_colors[nxt]
+                stride = strides[color]
+                if (code // stride) % radices[color] == 0:
+                    continue
+                new_code = code - stride
+                idx = nxt * n_codes + new_code
+                if visited[idx]:
+                    continue
+                visited[idx] = 1
+                if came_from is not None:
+                    came_from[idx] = cell * n_codes + code
+
+                if nxt == goal_cell:
+                    # Case 1: Goal is reachable (BFS: first arrival uses the fewest steps)
+                    if stats is not None:
+                        stats['expanded'] = expanded
+                        stats['pruned'] = pruned
+                    if came_from is not None:
+                        path[:] = [state // n_codes for state in _trace_route(came_from, idx, start_idx)]
+                    unused_value = (total_chips - steps) * UNUSED_CHIP_POINTS
+                    return steps * STEP_POINTS + GOAL_BONUS + unused_value, steps, unused_value
+
+                new_packed = packed - units[color]
+                if prune_dominated:
+                    cell_front = pareto[nxt]
+                    dominated = False
+                    for other in cell_front:
+                        if ((other | guard) - new_packed) & guard == guard:
+                            dominated = True
+                            break
+                    if dominated:
+                        pruned += 1
+                        continue
+                    cell_front.append(new_packed)
+
+                if goal_dist[nxt] < best_dist:
+                    best_dist = goal_dist[nxt]
+                    best_steps = steps
+                    best_cell = nxt
+                    best_idx = idx
+                    if best_dist == closest_dist:
+                        break  # first arrival at the closest reachable distance
+                    if prune_hopeless:
+                        hopeless = min(hopeless, best_dist)
+                if goal_dist[nxt] - (spendable - steps) >= hopeless:
+                    pruned += 1
+                    continue
+                append((nxt, new_code, new_packed))
+            if best_dist == closest_dist:
+                break
+        frontier = next_frontier
+
+    if stats is not None:
+        stats['expanded'] = expanded
+        stats['pruned'] = pruned
+
+    # Case 2: Goal not reachable, score the best reachable position
+    if came_from is not None:
+        path[:] = [state // n_codes for state in _trace_route(came_from, best_idx, start_idx)]
+    unused_value = (total_chips - best_steps) * UNUSED_CHIP_POINTS
+    distance_moved_points = (goal_dist[start_cell] - best_dist) * STEP_POINTS
+    return distance_moved_points + unused_value, geometry.distances(start_cell)[best_cell], unused_value
+
+
+# Relaxed distance of cells that cannot be reached at all
+UNREACHABLE = 1 << 30
+
+
+def relaxed_distances(board_colors: bytes, source_cell: int, counts: List[int],
+                      geometry: BoardGeometry = DEFAULT_GEOMETRY, into_source: bool = False) -> List[int]:
+    """
+    Fewest moves from source_cell to every cell (or, with into_source, from every cell to
+    source_cell) when any cell whose color the inventory holds can be entered, however
+    many chips of that color there are. Chips only run out along a path, so this is a
+    lower bound on the steps of every real path (UNREACHABLE if there is none).
+    """
+    neighbors = geometry.neighbors
+    dist = [UNREACHABLE] * geometry.n_cells
+    dist[source_cell] = 0
+    queue = [source_cell]
+    for cell in queue:
+        if into_source:
+            # Moving from a neighbor into `cell` needs a chip of its color
+            if not counts[board_colors[cell]]:
+                continue
+            for prev in neighbors[cell]:
+                if dist[prev] == UNREACHABLE:
+                    dist[prev] = dist[cell] + 1
+                    queue.append(prev)
+        else:
+            for nxt in neighbors[cell]:
+                if dist[nxt] == UNREACHABLE and counts[board_colors[nxt]]:
+                    dist[nxt] = dist[cell] + 1
+                    queue.append(nxt)
+    return dist
+
+
+def closest_reachable_distance(board_colors: bytes, goal_cell: int, counts: List[int],
+                               geometry: BoardGeometry = DEFAULT_GEOMETRY,
+                               stats: Optional[Dict[str, int]] = None,
+                               upper: Optional[int] = None, lower: int = 0) -> int:
+    """
+    Smallest goal distance of any cell reachable with `counts` (0 if the goal is reachable).
+
+    Best-first search on the lower bound (goal distance - remaining chips), which never
+    decreases along a path, so the search stops as soon as no state can get strictly
+    closer than the best cell found. Cells keep Pareto frontiers as in search_max_score.
+
+    :param upper: Goal distance of a cell already known to be reachable, if any.
+    :param lower: Known lower bound on the answer; the search stops once it is reached.
+    """
+    start_cell = geometry.start_cell
+    neighbors = geometry.neighbors
+    goal_dist = geometry.distances(goal_cell)
+    spendable = sum(counts)
+    units, guard = pack_units(len(counts))
+    pareto: List[List[int]] = [[] for _ in range(geometry.n_cells)]
+    start_packed = pack_chips(counts)
+    pareto[start_cell].append(start_packed)
+
+    best_dist = goal_dist[start_cell] if upper is None else min(upper, goal_dist[start_cell])
+    # Heap entries: (goal distance - remaining chips, steps, cell, packed chips)
+    heap = [(goal_dist[start_cell] - spendable, 0, start_cell, start_packed)]
+    expanded = pruned = 0
+    while heap and best_dist > lower:
+        bound, steps, cell, packed = heapq.heappop(heap)
+        if bound >= best_dist:
+            break
+        if packed not in pareto[cell]:
+            continue
+        expanded += 1
+        steps += 1
+        remaining = spendable - steps
+        for nxt in neighbors[cell]:
+            color = board_colors[nxt]
+            if not (packed >> (PACK_BITS * color)) & PACK_LIMIT:
+                continue
+            if goal_dist[nxt] < best_dist:
+                best_dist = goal_dist[nxt]
+            if goal_dist[nxt] - remaining >= best_dist:
+                continue
+
+            new_packed = packed - units[color]
+            cell_front = pareto[nxt]
+            dominated = False
+            for other in cell_front:
+                if ((other | guard) - new_packed) & guard == guard:
+                    dominated = True
+                    break
+            if dominated:
+                pruned += 1
+                continue
+            cell_front[:] = [other for other in cell_front
+                             if ((new_packed | guard) - other) & guard != guard]
+            cell_front.append(new_packed)
+            heapq.heappush(heap, (goal_dist[nxt] - remaining, steps, nxt, new_packed))
+
+    if stats is not None:
+        stats['expanded'] = stats.get('expanded', 0) + expanded
+        stats['pruned'] = stats.get('pruned', 0) + pruned
+    return best_dist
+
+
+def _trace_route(came_from: Dict, end, start) -> List:
+    """Follows parent links from state `end` back to `start`; returns the states, start first."""
+    route = [end]
+    while route[-1] != start:
+        route.append(came_from[route[-1]])
+    route.reverse()
+    return route
+
+
+def astar_max_score(board_colors: bytes, goal_cell: int, counts: List[int], extra: int = 0,
+                    stats: Optional[Dict[str, int]] = None,
+                    geometry: BoardGeometry = DEFAULT_GEOMETRY,
+                    path: Optional[List[int]] = None) -> Tuple[int, int, int]:
+    """
+    Best-first variant of search_max_score for large boards; returns the same triple.
+
+    States are expanded in order of steps taken + relaxed distance to the goal (see
+    relaxed_distances, using the starting inventory's colors). That heuristic never
+    overestimates and drops by at most one per move, so the first arrival at the goal
+    uses the fewest steps. States whose remaining chips cannot cover the relaxed distance
+    are dropped, and each cell keeps a Pareto frontier of chip vectors like the pruned
+    BFS (a superset of chips always means fewer steps taken, since every step spends one
+    chip). If the start is already out of relaxed range, the A* phase is skipped.
+
+    The unreachable-goal score depends on which closest cell the breadth-first search
+    discovers first, so when the goal cannot be reached, closest_reachable_distance finds
+    the closest distance and a BFS bounded by it picks that first cell. The closest cell
+    generated by the A* phase and the relaxed reach of the start bound that distance from
+    both sides, which often settles it without a second exhaustive search.
+
+    :param path: Optional list that receives the cells of the scored route, start first.
+    """
+    if stats is not None:
+        stats['expanded'] = stats['pruned'] = 0
+    start_cell = geometry.start_cell
+    if goal_cell == start_cell or max(counts, default=0) > PACK_LIMIT:
+        return search_max_score(board_colors, goal_cell, counts, extra, stats=stats, geometry=geometry,
+                                path=path)
+
+    spendable = sum(counts)
+    goal_dist = geometry.distances(goal_cell)
+    to_goal = relaxed_distances(board_colors, goal_cell, counts, geometry, into_source=True)
+    if to_goal[start_cell] > spendable:
+        return _bounded_fallback(board_colors, goal_cell, counts, extra, stats, geometry, path=path)
+
+    neighbors = geometry.neighbors
+    units, guard = pack_units(len(counts))
+    pareto: List[List[int]] = [[] for _ in range(geometry.n_cells)]
+    start_packed = pack_chips(counts)
+    pareto[start_cell].append(start_packed)
+    # Parent (cell, packed chips) of every pushed state, only kept when the route is requested
+    came_from: Optional[Dict[Tuple[int, int], Tuple[int, int]]] = {} if path is not None else None
+
+    # Heap entries: (steps + relaxed distance, -steps, sequence, cell, packed chips)
+    heap = [(to_goal[start_cell], 0, 0, start_cell, start_packed)]
+    closest = goal_dist[start_cell]  # goal distance of the closest cell generated so far
+    sequence = 0
+    expanded = pruned = 0
+    while heap:
+        _, neg_steps, _, cell, packed = heapq.heappop(heap)
+        if packed not in pareto[cell]:
+            continue  # superseded by a dominating arrival after it was pushed
+        expanded += 1
+        steps = 1 - neg_steps
+        remaining = spendable - steps
+        for nxt in neighbors[cell]:
+            color = board_colors[nxt]
+            if not (packed >> (PACK_BITS * color)) & PACK_LIMIT:
+                continue
+            if goal_dist[nxt] < closest:
+                closest = goal_dist[nxt]
+            if to_goal[nxt] > remaining:
+                continue
+
+            if nxt == goal_cell:
+                if stats is not None:
+                    stats['expanded'] = expanded
+                    stats['pruned'] = pruned
+                if came_from is not None:
+                    route = _trace_route(came_from, (cell, packed), (start_cell, start_packed))
+                    path[:] = [state[0] for state in route] + [goal_cell]
+                unused_value = (spendable + extra - steps) * UNUSED_CHIP_POINTS
+                return steps * STEP_POINTS + GOAL_BONUS + unused_value, steps, unused_value
+
+            new_packed = packed - units[color]
+            cell_front = pareto[nxt]
+            dominated = False
+            for other in cell_front:
+                if ((other | guard) - new_packed) & guard == guard:
+                    dominated = True
+                    break
+            if dominated:
+                pruned += 1
+                continue
+            # Drop frontier entries the new arrival dominates
+            cell_front[:] = [other for other in cell_front
+                             if ((new_packed | guard) - other) & guard != guard]
+            cell_front.append(new_packed)
+            if came_from is not None:
+                came_from[(nxt, new_packed)] = (cell, packed)
+            sequence += 1
+            heapq.heappush(heap, (steps + to_goal[nxt], -steps, sequence, nxt, new_packed))
+
+    if stats is not None:
+        stats['expanded'] = expanded
+        stats['pruned'] = pruned
+    return _bounded_fallback(board_colors, goal_cell, counts, extra, stats, geometry, closest, path)
+
+
+def _bounded_fallback(board_colors: bytes, goal_cell: int, counts: List[int], extra: int,
+                      stats: Optional[Dict[str, int]], geometry: BoardGeometry,
+                      upper: Optional[int] = None, path: Optional[List[int]] = None) -> Tuple[int, int, int]:
+    """
+    Result of search_max_score for a goal known to be unreachable, via the closest
+    reachable distance (`upper` is the goal distance of a cell known to be reachable).
+    """
+    reach = relaxed_reach_mask(board_colors, counts, geometry)
+    lower = max(1, next(dist for dist, within in enumerate(geometry.within_rings(goal_cell)) if reach & within))
+
+    closest_stats: Dict[str, int] = {}
+    if upper is not None and upper <= lower:
+        closest = upper
+    else:
+        closest = closest_reachable_distance(board_colors, goal_cell, counts, geometry, closest_stats,
+                                             upper, lower)
+    search_stats: Dict[str, int] = {}
+    result = search_max_score(board_colors, goal_cell, counts, extra, stats=search_stats,
+                              geometry=geometry, closest_dist=closest, path=path)
+    if stats is not None:
+        for key in ('expanded', 'pruned'):
+            stats[key] = stats.get(key, 0) + closest_stats.get(key, 0) + search_stats[key]
+    return result
+
+
+# --- Bitboard Reachability ---
+# A set of cells is one integer with bit `cell` set per member, so a whole set moves one step
+# with four shifts (BoardGeometry.expand) and is restricted to a color with one AND.
+
+# Largest number of spent-chip vectors (product of count + 1) bitboard_max_score enumerates;
+# past about this many the pruned breadth-first search is faster on the 5x5 board
+BITBOARD_CODE_LIMIT = 36
+
+_SPEND_TABLES: Dict[Tuple[int, ...], Tuple[Tuple[int, Tuple[Tuple[int, int], ...]], ...]] = {}
+
+
+def _spend_table(counts: Tuple[int, ...]) -> Tuple[Tuple[int, Tuple[Tuple[int, int], ...]], ...]:
+    """
+    table[code] = (chips spent, (color, next code) pairs for the chips still spendable) for
+    every spent-chip vector, as a mixed-radix code with radix count + 1 per color (0 = nothing
+    spent). Spending a chip adds its color's stride, so every code comes after the codes it
+    is reached from.
+    """
+    table = _SPEND_TABLES.get(counts)
+    if table is None:
+        strides = []
+        n_codes = 1
+        for count in counts:
+            strides.append(n_codes)
+            n_codes *= count + 1
+        rows = []
+        for code in range(n_codes):
+            spent = [(code // stride) % (count + 1) for stride, count in zip(strides, counts)]
+            rows.append((sum(spent), tuple((color, code + strides[color]) for color, count in enumerate(counts)
+                                           if spent[color] < count)))
+        table = _SPEND_TABLES[counts] = tuple(rows)
+    return table
+
+
+def bitboard_levels(color_masks: Sequence[int], counts: Sequence[int],
+                    geometry: BoardGeometry = DEFAULT_GEOMETRY) -> List[int]:
+    """
+    levels[steps] = bitmask of the cells some walk from the start ends on after exactly
+    `steps` moves, each move spending a chip of the entered cell's color from `counts`.
+
+    Exact: one reach mask is kept per spent-chip vector, and the cells entered by spending
+    a chip of color k are expand(mask) & color_masks[k].
+    """
+    table = _spend_table(tuple(counts))
+    size, full = geometry.size, geometry.full_mask
+    not_last_col, not_first_col = geometry.not_last_col, geometry.not_first_col
+    reach = [0] * len(table)
+    reach[0] = 1 << geometry.start_cell
+    levels = [0] * (sum(counts) + 1)
+    for code, (spent, moves) in enumerate(table):
+        mask = reach[code]
+        if not mask:
+            continue
+        levels[spent] |= mask
+        # geometry.expand(mask), inlined
+        front = (((mask & not_last_col) << 1) | ((mask & not_first_col) >> 1)
+                 | ((mask << size) & full) | (mask >> size))
+        for color, nxt in moves:
+            reach[nxt] |= front & color_masks[color]
+    return levels
+
+
+def relaxed_reach_mask(board_colors: bytes, counts: Sequence[int],
+                       geometry: BoardGeometry = DEFAULT_GEOMETRY,
+                       color_masks: Optional[Sequence[int]] = None) -> int:
+    """
+    Bitmask of the cells within sum(counts) moves of the start through cells whose color
+    the inventory holds, however many chips of that color there are (the bitboard form of
+    relaxed_distances(...) <= spendable). A superset of the cells any real walk reaches.
+    """
+    if color_masks is None:
+        allowed = sum(1 << cell for cell, color in enumerate(board_colors) if counts[color])
+    else:
+        allowed = 0
+        for color, count in enumerate(counts):
+            if count:
+                allowed |= color_masks[color]
+    expand = geometry.expand
+    mask = 1 << geometry.start_cell
+    for _ in range(sum(counts)):
+        grown = mask | (expand(mask) & allowed)
+        if grown == mask:
+            break
+        mask = grown
+    return mask
+
+
+def bitboard_max_score(board_colors: bytes, goal_cell: int, counts: List[int], extra: int = 0,
+                       geometry: BoardGeometry = DEFAULT_GEOMETRY) -> Optional[Tuple[int, int, int]]:
+    """
+    search_max_score's triple from bitboard_levels, or None when the search is still needed.
+
+    A reachable goal is scored from the first level holding it. Otherwise the breadth-first
+    search keeps the first closest cell it discovers: the closest goal distance over all
+    levels, at the first level that reaches it. Score and unused value follow from those
+    two; the step count is that cell's distance from the start, which is only known without
+    the search order if every closest cell of that level is equally far from the start.
+    None is also returned for inventories with more than BITBOARD_CODE_LIMIT spent-chip
+    vectors.
+    """
+    spendable = sum(counts)
+    total_chips = spendable + extra
+    start_cell = geometry.start_cell
+    if goal_cell == start_cell:
+        return GOAL_BONUS + total_chips * UNUSED_CHIP_POINTS, 0, total_chips * UNUSED_CHIP_POINTS
+    n_codes = 1
+    for count in counts:
+        n_codes *= count + 1
+    if n_codes > BITBOARD_CODE_LIMIT:
+        return None
+
+    color_masks = board_color_masks(board_colors, len(counts))
+    levels = bitboard_levels(color_masks, counts, geometry)
+    goal_bit = 1 << goal_cell
+    for steps, mask in enumerate(levels):
+        if mask & goal_bit:
+            unused_value = (total_chips - steps) * UNUSED_CHIP_POINTS
+            return steps * STEP_POINTS + GOAL_BONUS + unused_value, steps, unused_value
+
+    rings = geometry.distance_rings(goal_cell)
+    start_dist = best_dist = geometry.distances(goal_cell)[start_cell]
+    best_steps = 0
+    closer = geometry.within_rings(goal_cell)[best_dist - 1]  # cells closer than best_dist
+    for steps in range(1, len(levels)):
+        mask = levels[steps] & closer
+        if mask:
+            best_dist = next(dist for dist in range(1, best_dist) if mask & rings[dist])
+            best_steps = steps
+            if best_dist == 1:
+                break  # nothing is closer than a neighbor of the unreachable goal
+            closer = geometry.within_rings(goal_cell)[best_dist - 1]
+
+    closest = levels[best_steps] & rings[best_dist]
+    for moved, ring in enumerate(geometry.distance_rings(start_cell)):
+        if closest & ring:
+            if closest & ~ring:
+                return None  # the search order decides between cells at different distances
+            unused_value = (total_chips - best_steps) * UNUSED_CHIP_POINTS
+            return (start_dist - best_dist) * STEP_POINTS + unused_value, moved, unused_value
+
+
+def _downward_closure(marks: np.ndarray, radices: List[int]) -> np.ndarray:
+    """Marks every code that is <= (per color) some marked code."""
+    lattice = marks.reshape(radices[::-1])
+    for axis in range(lattice.ndim):
+        lattice = np.flip(np.logical_or.accumulate(np.flip(lattice, axis), axis=axis), axis)
+    return lattice.reshape(-1)
+
+
+def _upward_min(values: np.ndarray, radices: List[int]) -> np.ndarray:
+    """For every code, the minimum value over all codes that are <= it (per color)."""
+    lattice = values.reshape(radices[::-1])
+    for axis in range(lattice.ndim):
+        lattice = np.minimum.accumulate(lattice, axis=axis)
+    return lattice.reshape(-1)
+
+
+def enumerate_spent_states(board_colors: bytes, radices: List[int], allowed: np.ndarray,
+                           geometry: BoardGeometry = DEFAULT_GEOMETRY) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Lists every (cell, spent chips) state reachable from the start, in BFS discovery order.
+
+    Spent chips are mixed-radix codes over `radices` and only codes marked in `allowed`
+    (a downward-closed set) are entered. An inventory X can reach exactly the states whose
+    spent vector is <= X, and reaches them in the same relative order, so its search result
+    is the first affordable state closest to the goal (see score_inventories). The search
+    runs level by level; within a level, candidates are kept in (parent, move) order and
+    only first occurrences survive, which is exactly the FIFO order of search_max_score.
+
+    :return: (cells, spent codes), both indexed by discovery order
+    """
+    n_codes = len(allowed)
+    strides = np.cumprod([1] + radices[:-1]).astype(np.int64)
+    radix_arr = np.asarray(radices, dtype=np.int64)
+    colors = np.frombuffer(board_colors, dtype=np.uint8).astype(np.int64)
+
+    neighbor_array = geometry.neighbor_array
+    visited = np.zeros(geometry.n_cells * n_codes, dtype=bool)
+    visited[geometry.start_cell * n_codes] = True
+    frontier_cells = np.array([geometry.start_cell], dtype=np.int64)
+    frontier_codes = np.array([0], dtype=np.int64)
+    all_cells = [frontier_cells]
+    all_codes = [frontier_codes]
+
+    while len(frontier_cells):
+        nxt = neighbor_array[frontier_cells]                       # (F x moves), row-major = FIFO order
+        codes = np.broadcast_to(frontier_codes[:, None], nxt.shape)
+        valid = nxt >= 0
+        nxt, codes = nxt[valid], codes[valid]
+        color = colors[nxt]
+        stride = strides[color]
+        can_spend = (codes // stride) % radix_arr[color] < radix_arr[color] - 1
+        nxt, new_codes = nxt[can_spend], codes[can_spend] + stride[can_spend]
+        keep = allowed[new_codes]
+        nxt, new_codes = nxt[keep], new_codes[keep]
+
+        idx = nxt * n_codes + new_codes
+        fresh = ~visited[idx]
+        nxt, new_codes, idx = nxt[fresh], new_codes[fresh], idx[fresh]
+        _, first = np.unique(idx, return_index=True)
+        first.sort()
+        frontier_cells, frontier_codes = nxt[first], new_codes[first]
+        visited[idx[first]] = True
+        all_cells.append(frontier_cells)
+        all_codes.append(frontier_codes)
+
+    return np.concatenate(all_cells), np.concatenate(all_codes)
+
+
+# score_inventories scores a request in one pass only while its (cell x spent chips) state
+# table has at most BATCH_STATE_LIMIT entries and at most BATCH_CODES_PER_INVENTORY
+# spent-chip codes per inventory; past that, scoring the inventories one by one (_search)
+# is cheaper
+BATCH_STATE_LIMIT = 1 << 25
+BATCH_CODES_PER_INVENTORY = 64
+
+
+def score_inventories(board_colors: bytes, goal_cell: int, chip_matrix: np.ndarray,
+                      geometry: BoardGeometry = DEFAULT_GEOMETRY) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized search_max_score for many inventories of one player.
+
+    One BFS over the downward closure of all requested inventories lists the reachable
+    (cell, spent chips) states; a per-code prefix minimum of (distance to goal, discovery
+    order) over the chip lattice then yields every inventory's best state at once.
+    That pass costs about cells x codes of the closure whatever the number of inventories,
+    so requests with few inventories, many chips or a large board (see
+    BATCH_CODES_PER_INVENTORY) are scored per inventory with cached_search_max_score.
+
+    :param board_colors: Row-major color indices of the board cells.
+    :param goal_cell: Row-major index of the goal cell.
+    :param chip_matrix: (N x colors) non-negative integer chip counts, one inventory per row
+                        (columns in the board's color order).
+    :param geometry: Board size and start position (defaults to the standard 5x5 board).
+    :return: (max_scores, steps, unused_chip_values), each an int array of length N
+    """
+    chip_matrix = np.asarray(chip_matrix, dtype=np.int64)
+    if chip_matrix.ndim != 2:
+        raise ValueError("chip_matrix must be a 2-D (inventories x colors) array")
+    if (chip_matrix < 0).any():
+        raise ValueError("chip_matrix must not contain negative chip counts")
+    if chip_matrix.shape[0] == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty.copy(), empty.copy()
+
+    radices = (chip_matrix.max(axis=0) + 1).tolist()
+    n_codes = 1
+    for radix in radices:
+        n_codes *= radix
+    if (n_codes > BATCH_CODES_PER_INVENTORY * chip_matrix.shape[0]
+            or geometry.n_cells * n_codes > BATCH_STATE_LIMIT):
+        results = np.array([cached_search_max_score(board_colors, goal_cell, counts, geometry=geometry)
+                            for counts in chip_matrix.tolist()], dtype=np.int64)
+        return results[:, 0], results[:, 1], results[:, 2]
+
+    strides = np.cumprod([1] + radices[:-1]).astype(np.int64)
+    row_codes = chip_matrix @ strides
+
+    marks = np.zeros(n_codes, dtype=bool)
+    marks[row_codes] = True
+    cells, codes = enumerate_spent_states(board_colors, radices, _downward_closure(marks, radices), geometry)
+    n_states = len(cells)
+
+    # Closest to the goal first, then earliest discovered (fewest steps, BFS tie-break)
+    goal_dist = geometry.distances(goal_cell)
+    start_cell = geometry.start_cell
+    dist = np.asarray(goal_dist, dtype=np.int64)[cells]
+    order_key = dist * n_states + np.arange(n_states)
+    best_key = np.full(n_codes, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(best_key, codes, order_key)
+    best = _upward_min(best_key, radices)[row_codes] % n_states
+
+    digits = (codes[best, None] // strides) % np.asarray(radices, dtype=np.int64)
+    best_steps = digits.sum(axis=1)
+    best_dist = dist[best]
+    unused = (chip_matrix.sum(axis=1) - best_steps) * UNUSED_CHIP_POINTS
+    reached = best_dist == 0
+
+    scores = np.where(reached,
+                      best_steps * STEP_POINTS + GOAL_BONUS,
+                      (goal_dist[start_cell] - best_dist) * STEP_POINTS) + unused
+    steps = np.where(reached, best_steps,
+                     np.asarray(geometry.distances(start_cell), dtype=np.int64)[cells[best]])
+    return scores, steps, unused
+
+
+class ScoreCache:
+    """
+    Bounded LRU memo with hit / miss / eviction statistics, used for every process-wide
+    cache of the game engine: score triples (SCORE_CACHE, keyed by board fingerprint,
+    start cell, goal cell and chip vector), color masks, board indexes, best paths,
+    read-only redistribution score arrays and negotiation solutions.
+
+    Keys start with the board fingerprint (the row-major color bytes), so every
+    ColoredTrails instance built on the same board (including agents' throwaway copies)
+    shares entries. Values are never None.
+    """
+
+    def __init__(self, maxsize: int = 65536):
+        self.maxsize = maxsize
+        self.entries: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key: Tuple, result: Any):
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = result
+        # Writing an existing key counts as a use as well
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, maxsize: int):
+        """Changes the capacity, evicting least recently used entries if needed."""
+        self.maxsize = maxsize
+        while len(self.entries) > max(maxsize, 0):
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drops all entries and resets the statistics."""
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Process-wide memo used by every ColoredTrails instance
+SCORE_CACHE = ScoreCache()
+
+
+def configure_score_cache(maxsize: int):
+    """Sets the capacity of the process-wide score cache (0 disables memoization)."""
+    SCORE_CACHE.resize(maxsize)
+
+
+def score_cache_stats() -> Dict[str, float]:
+    """Returns hits, misses, evictions, size and hit rate of the process-wide score cache."""
+    return SCORE_CACHE.stats()
+
+
+def _search(board_colors: bytes, goal_cell: int, counts: List[int], extra: int,
+            geometry: BoardGeometry) -> Tuple[int, int, int]:
+    # The standard 5x5 board uses the breadth-first search, larger boards the best-first one;
+    # small inventories on the 5x5 board are scored on bitboards first
+    if geometry.n_cells > DEFAULT_GEOMETRY.n_cells:
+        return astar_max_score(board_colors, goal_cell, counts, extra, geometry=geometry)
+    return (bitboard_max_score(board_colors, goal_cell, counts, extra, geometry)
+            or search_max_score(board_colors, goal_cell, counts, extra, geometry=geometry))
+
+
+def cached_search_max_score(board_colors: bytes, goal_cell: int, counts: List[int],
+                            extra: int = 0,
+                            geometry: BoardGeometry = DEFAULT_GEOMETRY) -> Tuple[int, int, int]:
+    """
+    Scores an inventory, memoized through SCORE_CACHE. The standard 5x5 board uses the
+    breadth-first search_max_score; larger boards use the best-first astar_max_score.
+    """
+    key = (board_colors, geometry.start_cell, goal_cell, tuple(counts), extra)
+    result = SCORE_CACHE.get(key)
+    if result is None:
+        result = _search(board_colors, goal_cell, counts, extra, geometry)
+        SCORE_CACHE.put(key, result)
+    return result
+
+
+# --- Board Index ---
+# Process-wide memo of per-color cell bitmasks, keyed by (board, color count)
+COLOR_MASKS = ScoreCache(maxsize=4096)
+
+
+def board_color_masks(board_colors: bytes, n_colors: int = len(COLORS)) -> Tuple[int, ...]:
+    """masks[color] = bitmask with bit `cell` set for every cell of that color."""
+    key = (board_colors, n_colors)
+    masks = COLOR_MASKS.get(key)
+    if masks is None:
+        bits = [0] * n_colors
+        for cell, color in enumerate(board_colors):
+            bits[color] |= 1 << cell
+        masks = tuple(bits)
+        COLOR_MASKS.put(key, masks)
+    return masks
+
+
+class BoardIndex:
+    """
+    Immutable per-board tables, built once per (board, start, colors) and shared by every
+    ColoredTrails instance on that board, its agents and temporary evaluations
+    (see get_board_index). Shape-only tables (neighbors, distances) live in the geometry.
+
+    color_array:     the board's row-major color indices as a read-only uint8 array
+    color_cells:     color_cells[color] = cells of that color, in cell order
+    color_masks:     color_masks[color] = bitmask with bit `cell` set for cells of that color
+    candidate_goals: goal positions at least min_goal_dist from the start, row by row
+                     (the opponent locations a ToM agent reasons about)
+    goal_cells:      the same as cell ids; location_index maps a position to its candidate index
+    goal_distances:  (candidates x cells) read-only Manhattan distance table
+    """
+    __slots__ = ('geometry', 'board_colors', 'color_array', 'color_cells', 'color_masks',
+                 'candidate_goals', 'goal_cells', 'location_index', 'goal_distances')
+
+    def __init__(self, board_colors: bytes, geometry: BoardGeometry = DEFAULT_GEOMETRY,
+                 n_colors: int = len(COLORS), min_goal_dist: int = 3):
+        self.geometry = geometry
+        self.board_colors = board_colors
+        self.color_array = np.frombuffer(board_colors, dtype=np.uint8)
+        self.color_cells = tuple(tuple(cell for cell, color in enumerate(board_colors) if color == wanted)
+                                 for wanted in range(n_colors))
+        self.color_masks = board_color_masks(board_colors, n_colors)
+        from_start = geometry.distances(geometry.start_cell)
+        self.goal_cells = tuple(cell for cell in range(geometry.n_cells) if from_start[cell] >= min_goal_dist)
+        self.candidate_goals = tuple(geometry.pos(cell) for cell in self.goal_cells)
+        self.location_index = {pos: i for i, pos in enumerate(self.candidate_goals)}
+        self.goal_distances = np.array([geometry.distances(cell) for cell in self.goal_cells],
+                                       dtype=np.int64).reshape(len(self.goal_cells), geometry.n_cells)
+        self.goal_distances.setflags(write=False)
+
+    @property
+    def neighbors(self) -> List[Tuple[int, ...]]:
+        return self.geometry.neighbors
+
+
+# Process-wide memo of BoardIndex objects, keyed by (board, start cell, size, colors)
+BOARD_INDEXES = ScoreCache(maxsize=1024)
+
+
+def get_board_index(board_colors: bytes, geometry: BoardGeometry = DEFAULT_GEOMETRY,
+                    n_colors: int = len(COLORS)) -> BoardIndex:
+    """Returns the shared BoardIndex of a board (built on first use)."""
+    key = (board_colors, geometry.size, geometry.start_cell, n_colors)
+    index = BOARD_INDEXES.get(key)
+    if index is None:
+        index = BoardIndex(board_colors, geometry, n_colors)
+        BOARD_INDEXES.put(key, index)
+    return index
+
+
+# --- Canonical Scenarios ---
+# Rotating or reflecting a board about the start, or relabelling its colors (together with
+# the inventory), gives a scenario with the same max score and unused-chip value. The step
+# count of an unreachable goal is the distance to the first closest cell in search order,
+# which can differ between equivalent scenarios, so sharing is limited to scores.
+class CanonicalForm(NamedTuple):
+    """
+    Canonical representative of a (board, goal, inventory) scenario.
+
+    key:             (start cell, goal cell, board color bytes, counts, extra) of the representative
+    symmetry:        index into geometry.symmetries of the board transform used
+    cells:           cells[original cell] = canonical cell
+    original_colors: original_colors[canonical color index] = original color index
+    """
+    key: Tuple
+    symmetry: int
+    cells: Tuple[int, ...]
+    original_colors: bytes
+
+    def original_cell(self, cell: int) -> int:
+        return self.cells.index(cell)
+
+    def original_path(self, path: Sequence[Tuple[int, int]],
+                      geometry: BoardGeometry = DEFAULT_GEOMETRY) -> Tuple[Tuple[int, int], ...]:
+        """Maps a route (positions) on the canonical board back to the original board."""
+        return tuple(geometry.pos(self.original_cell(geometry.cell(pos))) for pos in path)
+
+    def canonical_counts(self, counts: Sequence[int]) -> Tuple[int, ...]:
+        return tuple(map(counts.__getitem__, self.original_colors))
+
+    def original_counts(self, counts: Sequence[int]) -> Tuple[int, ...]:
+        original = [0] * len(self.original_colors)
+        for color, count in zip(self.original_colors, counts):
+            original[color] = count
+        return tuple(original)
+
+    def original_chips(self, chips: Sequence[str], colors: Sequence[str] = DEFAULT_COLORS) -> List[str]:
+        """Maps chip names (e.g. one side of an offer) in canonical colors back to the original ones."""
+        index = {color: i for i, color in enumerate(colors)}
+        return [colors[self.original_colors[index[chip]]] if chip in index else chip for chip in chips]
+
+    def original_offer(self, give: Sequence[str], receive: Sequence[str],
+                       colors: Sequence[str] = DEFAULT_COLORS) -> Tuple[List[str], List[str]]:
+        return self.original_chips(give, colors), self.original_chips(receive, colors)
+
+
+_IDENTITY_BYTES = bytes(range(256))
+
+
+def canonical_form(board_colors: bytes, goal_cell: int, counts: Sequence[int], extra: int = 0,
+                   geometry: BoardGeometry = DEFAULT_GEOMETRY) -> CanonicalForm:
+    """
+    Maps every scenario that differs only by a board symmetry about the start or by a color
+    relabelling to the same key. Among the symmetries that send the goal to its smallest
+    image, colors are renumbered by first appearance on the transformed board (colors absent
+    from the board by decreasing chip count) and the smallest (board, counts) wins.
+    """
+    n_colors = len(counts)
+    goal, symmetries = geometry.goal_symmetries[goal_cell]
+    best = None
+    for k in symmetries:
+        moved = bytes(geometry.symmetry_getters[k](board_colors))
+        order = bytes(dict.fromkeys(moved))
+        if len(order) < n_colors:
+            order += bytes(sorted((color for color in range(n_colors) if color not in order),
+                                  key=counts.__getitem__, reverse=True))
+        candidate = (moved.translate(bytes.maketrans(order, _IDENTITY_BYTES[:len(order)])),
+                     tuple(map(counts.__getitem__, order)))
+        if best is None or candidate < best[0]:
+            best = (candidate, k, order)
+    (board, canonical_counts), k, order = best
+    return CanonicalForm((geometry.start_cell, goal, board, canonical_counts, extra), k,
+                         geometry.symmetries[k], order)
+
+
+# Process-wide memo of score triples keyed by canonical form, shared by equivalent scenarios
+# (see cached_max_score); disabled until configure_canonical_cache is called
+CANONICAL_CACHE = ScoreCache(maxsize=0)
+
+
+def configure_canonical_cache(maxsize: int):
+    """Sets the capacity of the canonical score cache (0, the default, disables it)."""
+    CANONICAL_CACHE.resize(maxsize)
+
+
+def cached_max_score(board_colors: bytes, goal_cell: int, counts: List[int], extra: int = 0,
+                     geometry: BoardGeometry = DEFAULT_GEOMETRY) -> int:
+    """
+    Max score of an inventory. Like cached_search_max_score, but once the canonical cache is
+    enabled a miss in SCORE_CACHE is answered from any equivalent scenario scored before.
+    """
+    key = (board_colors, geometry.start_cell, goal_cell, tuple(counts), extra)
+    result = SCORE_CACHE.get(key)
+    if result is not None:
+        return result[0]
+    if CANONICAL_CACHE.maxsize <= 0:
+        result = _search(board_colors, goal_cell, counts, extra, geometry)
+        SCORE_CACHE.put(key, result)
+        return result[0]
+
+    canonical = canonical_form(board_colors, goal_cell, counts, extra, geometry)
+    shared = CANONICAL_CACHE.get(canonical.key)
+    if shared is not None:
+        result, symmetry = shared
+        # Same symmetry: the scenarios only differ by color labels, so the whole triple
+        # carries over; a reached goal's step count is the same in every orientation.
+        if symmetry == canonical.symmetry or result[0] == result[1] * STEP_POINTS + GOAL_BONUS + result[2]:
+            SCORE_CACHE.put(key, result)
+        return result[0]
+    result = _search(board_colors, goal_cell, counts, extra, geometry)
+    SCORE_CACHE.put(key, result)
+    CANONICAL_CACHE.put(canonical.key, (result, canonical.symmetry))
+    return result[0]
+
+
+class BestPath(NamedTuple):
+    """A scored route: the search result plus the cells walked and the chips spent."""
+    score: int
+    steps: int
+    unused_value: int
+    path: Tuple[Tuple[int, int], ...]  # positions from the start to the final cell
+    chips_spent: Tuple[str, ...]       # chip colors in the order they are spent
+    reaches_goal: bool
+
+    def as_score(self) -> Tuple[int, int, int]:
+        """The (max_score, min_steps_to_goal, max_unused_chips_value) triple."""
+        return self.score, self.steps, self.unused_value
+
+
+# Process-wide memo of BestPath objects (routes are only needed for logging and plots)
+PATH_CACHE = ScoreCache(maxsize=4096)
+
+
+def cached_best_path(board_colors: bytes, goal_cell: int, counts: List[int], extra: int = 0,
+                     geometry: BoardGeometry = DEFAULT_GEOMETRY,
+                     colors: Tuple[str, ...] = tuple(COLORS)) -> BestPath:
+    """
+    Scores an inventory and returns the route behind the score, from a single search.
+    Memoized through PATH_CACHE; the score triple is also stored in SCORE_CACHE.
+    """
+    key = (board_colors, colors, geometry.start_cell, goal_cell, tuple(counts), extra)
+    best = PATH_CACHE.get(key)
+    if best is None:
+        cells: List[int] = []
+        if geometry.n_cells > DEFAULT_GEOMETRY.n_cells:
+            result = astar_max_score(board_colors, goal_cell, counts, extra, geometry=geometry, path=cells)
+        else:
+            result = search_max_score(board_colors, goal_cell, counts, extra, geometry=geometry, path=cells)
+        SCORE_CACHE.put((board_colors, geometry.start_cell, goal_cell, tuple(counts), extra), result)
+        best = BestPath(*result,
+                        path=tuple(geometry.pos(cell) for cell in cells),
+                        chips_spent=tuple(colors[board_colors[cell]] for cell in cells[1:]),
+                        reaches_goal=cells[-1] == goal_cell)
+        PATH_CACHE.put(key, best)
+    return best
+
+
+class UtilityTable:
+    """
+    Precomputed scores for one (board, goal) pair.
+
+    Covers every inventory that fits inside `pool_counts` (normally both players' chips
+    combined, i.e. every hand either player can hold after any redistribution), indexed
+    by the inventory's mixed-radix code, so scoring is a lookup like CTgame.utilityFunction.
+    """
+
+    def __init__(self, board_colors: bytes, goal_cell: int, pool_counts: List[int],
+                 geometry: BoardGeometry = DEFAULT_GEOMETRY):
+        self.goal_cell = goal_cell
+        self.pool_counts = list(pool_counts)
+        self.radices = [count + 1 for count in pool_counts]
+        self.n_codes = 1
+        for radix in self.radices:
+            self.n_codes *= radix
+
+        # results[code] = (max_score, min_steps_to_goal, max_unused_chips_value), every hand
+        # scored in one score_inventories call (row i of redistribution_hands has code i)
+        scores, steps, unused = score_inventories(board_colors, goal_cell, redistribution_hands(pool_counts),
+                                                  geometry)
+        self.scores: List[int] = scores.tolist()
+        self.results: List[Tuple[int, int, int]] = list(zip(self.scores, steps.tolist(), unused.tolist()))
+        # The same triples as an (n_codes x 3) array, and the code stride of each color, for
+        # batched lookups (see lookup_many)
+        self.result_matrix = np.column_stack((scores, steps, unused))
+        self.strides = np.cumprod([1] + self.radices[:-1]).astype(np.int64)
+
+    def covers(self, counts: List[int], extra: int = 0) -> bool:
+        """Checks if an inventory is one of the redistributions of the pool."""
+        return extra == 0 and all(count <= pool for count, pool in zip(counts, self.pool_counts))
+
+    def code_of(self, counts: List[int]) -> int:
+        """Returns the table index of a per-color counts vector."""
+        return encode_chips(counts, self.radices)
+
+    def lookup(self, counts: List[int], extra: int = 0) -> Optional[Tuple[int, int, int]]:
+        """Returns the stored triple for an inventory, or None if the table does not cover it."""
+        if not self.covers(counts, extra):
+            return None
+        return self.results[encode_chips(counts, self.radices)]
+
+    def lookup_many(self, chip_matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Batched lookup of (N x colors) inventories: (covered, triples), where covered marks
+        the rows inside the pool and triples holds their (N_covered x 3) stored results.
+        """
+        covered = ((chip_matrix >= 0) & (chip_matrix <= np.asarray(self.pool_counts, dtype=np.int64))).all(axis=1)
+        return covered, self.result_matrix[chip_matrix[covered] @ self.strides]
+
+
+# --- Redistribution Outcomes ---
+# Process-wide memo of redistribution_scores arrays, keyed by (board, start, goal, pool)
+REDISTRIBUTION_CACHE = ScoreCache(maxsize=4096)
+
+
+def redistribution_hands(pool_counts: Sequence[int]) -> np.ndarray:
+    """
+    Every hand inside the pool as an (n_codes x colors) count matrix, row i holding the
+    hand with mixed-radix code i (radices pool + 1, as convertCode with binMax = pool).
+    The complement of hand i is hand n_codes - 1 - i (flipArray).
+    """
+    radices = np.asarray(pool_counts, dtype=np.int64) + 1
+    strides = np.cumprod(np.concatenate(([1], radices[:-1])))
+    codes = np.arange(int(np.prod(radices)), dtype=np.int64)
+    return (codes[:, None] // strides) % radices
+
+
+def redistribution_scores(board_colors: bytes, goal_cell: int, pool_counts: Sequence[int],
+                          geometry: BoardGeometry = DEFAULT_GEOMETRY) -> np.ndarray:
+    """
+    Max score for a goal of every hand inside the pool, indexed by hand code (see
+    redistribution_hands). Scored in one score_inventories pass and memoized in
+    REDISTRIBUTION_CACHE; the returned array is read-only.
+    """
+    key = (board_colors, geometry.start_cell, goal_cell, tuple(pool_counts))
+    scores = REDISTRIBUTION_CACHE.get(key)
+    if scores is None:
+        scores = score_inventories(board_colors, goal_cell, redistribution_hands(pool_counts), geometry)[0]
+        scores.setflags(write=False)
+        REDISTRIBUTION_CACHE.put(key, scores)
+    return scores
+
+
+class OutcomeMatrix(NamedTuple):
+    """
+    Both players' utilities under every redistribution of their pooled chips.
+
+    Redistribution i gives the first player hand i of redistribution_hands(pool) and the
+    second player the rest of the pool. utilities[i] = (first player's max score, second
+    player's max score); pareto lists the redistributions no other one weakly improves for
+    both players (strictly for one), in code order.
+    """
+    pool: Tuple[int, ...]
+    utilities: np.ndarray
+    status_quo: int
+    pareto: np.ndarray
+    welfare_max: int
+    nash: int
+
+    def hands(self, i: int) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        """(first player's counts, second player's counts) under redistribution i."""
+        first = decode_chips(i, [count + 1 for count in self.pool])
+        return tuple(first), tuple(p - c for p, c in zip(self.pool, first))
+
+    def trade(self, i: int) -> Tuple[Tuple[int, ...], Tuple[int, ...]]:
+        """Per-color (give, receive) counts that take the first player from the status quo to i."""
+        current, _ = self.hands(self.status_quo)
+        target, _ = self.hands(i)
+        return (tuple(max(c - t, 0) for c, t in zip(current, target)),
+                tuple(max(t - c, 0) for c, t in zip(current, target)))
+
+
+def pareto_mask(utilities: np.ndarray) -> np.ndarray:
+    """Boolean mask of the rows of an (N x 2) utility matrix that no other row dominates."""
+    u1 = utilities[:, 0]
+    u2 = utilities[:, 1]
+    # Distinct utility pairs, sorted by u1 then u2; walking them from the top, a pair is
+    # undominated iff its u2 beats every pair seen before (all have larger u1, or equal u1
+    # and larger u2)
+    span = int(u2.max() - u2.min()) + 1
+    pair_keys = (u1 - u1.min()) * span + (u2 - u2.min())
+    unique_keys, inverse = np.unique(pair_keys, return_inverse=True)
+    unique_u2 = (unique_keys % span)[::-1]
+    best_before = np.maximum.accumulate(np.concatenate(([-1], unique_u2[:-1])))
+    undominated = (unique_u2 > best_before)[::-1]
+    return undominated[inverse.reshape(-1)]
+
+
+def outcome_matrix(board_colors: bytes, goal_cells: Tuple[int, int],
+                   hands: Tuple[Sequence[int], Sequence[int]],
+                   extras: Tuple[int, int] = (0, 0),
+                   geometry: BoardGeometry = DEFAULT_GEOMETRY) -> OutcomeMatrix:
+    """
+    Utilities of two players under every redistribution of their pooled chips (the space
+    CTgame.calculateSetting enumerates), with the Pareto-optimal redistributions, the status
+    quo, the welfare (sum of utilities) maximum and the Nash bargaining point (maximum product
+    of both players' gains over the status quo; the status quo if no redistribution makes
+    both strictly better off). Ties go to the lowest code.
+
+    :param goal_cells: Goal cell of each player.
+    :param hands: Current per-color chip counts of each player.
+    :param extras: Chips of colors outside the board's colors; they stay with their owner.
+    """
+    pool = tuple(a + b for a, b in zip(hands[0], hands[1]))
+    first = redistribution_scores(board_colors, goal_cells[0], pool, geometry)
+    second = redistribution_scores(board_colors, goal_cells[1], pool, geometry)[::-1]
+    utilities = np.stack([first + extras[0] * UNUSED_CHIP_POINTS,
+                          second + extras[1] * UNUSED_CHIP_POINTS], axis=1)
+
+    status_quo = encode_chips(hands[0], [count + 1 for count in pool])
+    gains = utilities - utilities[status_quo]
+    product = np.where((gains > 0).all(axis=1), gains[:, 0] * gains[:, 1], 0)
+    nash = int(product.argmax()) if product.max() > 0 else status_quo
+    return OutcomeMatrix(pool, utilities, status_quo, np.flatnonzero(pareto_mask(utilities)),
+                         int(utilities.sum(axis=1).argmax()), nash)
+
 
 class GameState:
     """Represents the current state of a single player."""
+    __slots__ = ('current_pos', 'goal_pos', '_chips', '_initial_chips', 'steps_taken')
 
-    def __init__(self, goal_pos: Tuple[int, int], chips: Dict[str, int]):
-        self.current_pos = START_POS
+    def __init__(self, goal_pos: Tuple[int, int], chips: Dict[str, int],
+                 start_pos: Tuple[int, int] = START_POS):
+        self.current_pos = tuple(start_pos)
         self.goal_pos = goal_pos
-        self.chips = Counter(chips)
-        self.initial_chips = Counter(chips)  # Store initial chips for reference
+        self._chips = ChipCounter(chips)
+        self._initial_chips = tuple(self._chips.items())  # Store initial chips for reference
         self.steps_taken = 0
 
+    @property
+    def chips(self) -> ChipCounter:
+        return self._chips
+
+    @chips.setter
+    def chips(self, chips: Dict[str, int]):
+        self._chips = chips if type(chips) is ChipCounter else ChipCounter(chips)
+
+    @property
+    def initial_chips(self) -> Counter:
+        """The chips the player started with (a fresh Counter on every access)."""
+        return Counter(dict(self._initial_chips))
+
+    def __deepcopy__(self, memo):
+        clone = object.__new__(GameState)
+        memo[id(self)] = clone
+        clone.current_pos = self.current_pos if type(self.current_pos) is tuple else copy.deepcopy(self.current_pos, memo)
+        clone.goal_pos = self.goal_pos if type(self.goal_pos) is tuple else copy.deepcopy(self.goal_pos, memo)
+        clone._chips = self._chips.copy()
+        clone._initial_chips = self._initial_chips
+        clone.steps_taken = self.steps_taken
+        return clone
+
+    def key(self, color_index: Dict[str, int] = COLOR_INDEX) -> Tuple:
+        """Hashable summary of the state: (position, goal, chip counts, unspendable chips)."""
+        counts, extra = self._chips.vector(color_index)
+        return self.current_pos, self.goal_pos, counts, extra
+
+
+class GameSnapshot(NamedTuple):
+    """
+    Saved mutable part of a ColoredTrails game (see ColoredTrails.snapshot). The board,
+    goals and initial chips never change during a game, so they are not part of it.
+    """
+    # Per player: (GameState object, current_pos, steps_taken, chip items, cached chip vector)
+    players: Tuple[Tuple[GameState, Tuple[int, int], int, Tuple[Tuple[str, int], ...], Optional[Tuple]], ...]
+    offers_made: Tuple[Tuple[str, int], ...]
+    round_num: int
+    current_scores: Tuple[Tuple[str, Tuple], ...]
+
 
 class ColoredTrails:
     """
     Environment logic for the Colored Trails game.
     Handles board generation, movement checks, pathfinding, and scoring.
     """
+    __slots__ = ('board', 'states', 'colors', 'color_index', 'size', 'geometry', 'board_colors',
+                 'utility_tables', '_current_scores', '_board_index', 'offers_made', 'round_num')
 
-    def __init__(self, board_map: List[List[str]], player_states: Dict[str, GameState]):
+    def __init__(self, board_map: BoardMap, player_states: Dict[str, GameState],
+                 colors: Optional[List[str]] = None, start_pos: Optional[Tuple[int, int]] = None):
+        """
+        :param board_map: Square grid of color names; its size sets the board size.
+        :param player_states: GameState per player ID.
+        :param colors: Chip colors of this game (default: COLORS, extended by any other
+                       color that appears on the board).
+        :param start_pos: Shared start position (default: the players' current position).
+        """
         self.board = board_map
         self.states = player_states
+        if colors is None:
+            colors = DEFAULT_COLORS
+            for row in board_map:
+                for color in row:
+                    if color not in COLOR_INDEX and color not in colors:
+                        colors = colors + (color,)
+        self.colors, self.color_index = _color_tables(colors)
+        if start_pos is None:
+            first_state = next(iter(player_states.values()), None)
+            start_pos = first_state.current_pos if first_state is not None else START_POS
+        self.size = len(board_map)
+        self.geometry = get_geometry(self.size, start_pos)
+        # Row-major color indices used by the pathfinding
+        self.board_colors = bytes(self.color_index[color] for row in board_map for color in row)
+        # Opt-in precomputed utility tables, keyed by goal cell (see enable_utility_tables)
+        self.utility_tables: Optional[Dict[int, UtilityTable]] = None
+        # Per player: (counts, extra, goal, score triple) of the last current_score call
+        self._current_scores: Dict[str, Tuple] = {}
+        self._board_index: Optional[BoardIndex] = None
+        # Negotiation progress: offers made per player (each costs PENALTY_PER_ROUND) and the
+        # current round (0 before the first)
+        self.offers_made: Dict[str, int] = {player_id: 0 for player_id in player_states}
+        self.round_num = 0
+
+    def with_states(self, player_states: Dict[str, GameState]) -> 'ColoredTrails':
+        """
+        A game on the same board with other player states, e.g. for a temporary
+        evaluation. Board, color tables, geometry and utility tables are shared, not copied.
+        """
+        game = object.__new__(type(self))
+        for name in ColoredTrails.__slots__:
+            setattr(game, name, getattr(self, name))
+        game.states = player_states
+        game._current_scores = {}
+        game.offers_made = dict(self.offers_made)
+        return game
+
+    def snapshot(self) -> GameSnapshot:
+        """
+        Saves the players' positions and chips, the offers made and the round, for a later
+        restore(). Costs one small tuple per player, whatever happens in between, so a
+        look-ahead can try many trades on this game and roll back after each one instead of
+        deep-copying the states.
+        """
+        return GameSnapshot(
+            tuple((state, state.current_pos, state.steps_taken, tuple(state._chips.items()), state._chips._vector)
+                  for state in self.states.values()),
+            tuple(self.offers_made.items()),
+            self.round_num,
+            tuple(self._current_scores.items()))
+
+    def restore(self, snapshot: GameSnapshot):
+        """
+        Puts the game back into a snapshot taken on it. The GameState and ChipCounter objects
+        are updated in place, so references held by agents stay valid, and the scores cached
+        at snapshot time are valid again.
+        """
+        for state, current_pos, steps_taken, items, vector in snapshot.players:
+            state.current_pos = current_pos
+            state.steps_taken = steps_taken
+            chips = state._chips
+            dict.clear(chips)
+            dict.update(chips, items)
+            chips._vector = vector
+        self.offers_made.clear()
+        self.offers_made.update(snapshot.offers_made)
+        self.round_num = snapshot.round_num
+        self._current_scores = dict(snapshot.current_scores)
+
+    @property
+    def board_index(self) -> BoardIndex:
+        """The shared BoardIndex of this board (looked up on first use, then kept)."""
+        index = self._board_index
+        if index is None:
+            index = self._board_index = get_board_index(self.board_colors, self.geometry, len(self.colors))
+        return index
 
     @staticmethod
-    def _is_valid(r: int, c: int) -> bool:
-        """Checks if a coordinate is within the 5x5 board boundaries."""
-        return 0 <= r < BOARD_SIZE and 0 <= c < BOARD_SIZE
+    def _is_valid(r: int, c: int, size: int = BOARD_SIZE) -> bool:
+        """Checks if a coordinate is within the board boundaries (5x5 by default)."""
+        return 0 <= r < size and 0 <= c < size
 
     def _get_manhattan_distance(self, pos1: Tuple[int, int], pos2: Tuple[int, int]) -> int:
         """Calculates Manhattan distance between two positions."""
         return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
 
-    def get_max_score_and_path(self, player_id: str) -> Tuple[int, int, int]:
+    def enable_utility_tables(self):
         """
-        Calculates the maximum score a player can achieve from the start position
-        to the goal, given their current chip inventory, using a Breadth-First Search (BFS).
+        Opt in to precomputed utility tables. From now on the scores of score_chips,
+        score_counts, score_value, current_score, score_many and evaluate_trades are looked
+        up in a UtilityTable covering all redistributions of the players' pooled chips
+        (built the first time a goal is scored); inventories outside the pool are still
+        searched.
+        """
+        if self.utility_tables is None:
+            self.utility_tables = {}
 
-        The result is the utility (max score) used for negotiation.
+    def get_utility_table(self, goal_pos: Tuple[int, int]) -> UtilityTable:
+        """Returns (building it if needed) the UtilityTable for a goal on this board."""
+        goal_cell = self.geometry.cell(goal_pos)
+        if self.utility_tables is None:
+            self.utility_tables = {}
+
+        table = self.utility_tables.get(goal_cell)
+        if table is None:
+            pool = [0] * len(self.colors)
+            for state in self.states.values():
+                counts, _ = chip_vector(state.chips, self.color_index)
+                pool = [a + b for a, b in zip(pool, counts)]
+            table = UtilityTable(self.board_colors, goal_cell, pool, self.geometry)
+            self.utility_tables[goal_cell] = table
+        return table
+
+    def score_chips(self, goal_pos: Tuple[int, int], chips: Dict[str, int]) -> Tuple[int, int, int]:
+        """
+        Scores a (possibly hypothetical) chip inventory for a goal on this board,
+        without building temporary GameState/ColoredTrails objects.
 
-        :param player_id: The ID of the player to score.
         :return: (max_score, min_steps_to_goal, max_unused_chips_value)
         """
-        state = self.states[player_id]
-        goal = state.goal_pos
-        start_chips = state.chips
+        counts, extra = chip_vector(chips, self.color_index)
+        return self.score_counts(goal_pos, counts, extra)
 
-        # Pathfinding state: (position, steps, chips_remaining_counter)
-        queue = deque([(START_POS, 0, start_chips)])
+    def score_counts(self, goal_pos: Tuple[int, int], counts: List[int], extra: int = 0) -> Tuple[int, int, int]:
+        """score_chips for an inventory already split by chip_vector (counts in self.colors order)."""
+        if self.utility_tables is not None:
+            result = self.get_utility_table(goal_pos).lookup(counts, extra)
+            if result is not None:
+                return result
+        return cached_search_max_score(self.board_colors, self.geometry.cell(goal_pos), counts, extra,
+                                       self.geometry)
 
-        # Visited: (position, chips_tuple) -> steps
-        # Stores the minimum steps required to reach a (position, chip_configuration) state.
-        visited: Dict[Tuple[Tuple[int, int], Tuple], int] = {}
+    def current_score(self, player_id: str) -> Tuple[int, int, int]:
+        """
+        Score triple of a player's current chips, kept per player until the inventory or the
+        goal changes. A ChipCounter hands out the same count tuple until it is mutated (e.g.
+        by apply_trade), so checking for a change is an identity test.
+        """
+        state = self.states[player_id]
+        counts, extra = chip_vector(state.chips, self.color_index)
+        cached = self._current_scores.get(player_id)
+        if cached is not None and cached[0] is counts and cached[1] == extra and cached[2] == state.goal_pos:
+            return cached[3]
+        result = self.score_counts(state.goal_pos, counts, extra)
+        self._current_scores[player_id] = (counts, extra, state.goal_pos, result)
+        return result
 
-        best_path_data: Optional[Tuple[int, int]] = None  # (min_steps, max_remaining_chips)
+    def score_value(self, goal_pos: Tuple[int, int], counts: List[int], extra: int = 0) -> int:
+        """
+        Just the max score of score_counts. Without utility tables this goes through
+        cached_max_score, which can share results with equivalent scenarios.
+        """
+        if self.utility_tables is not None:
+            result = self.get_utility_table(goal_pos).lookup(counts, extra)
+            if result is not None:
+                return result[0]
+        return cached_max_score(self.board_colors, self.geometry.cell(goal_pos), counts, extra,
+                                self.geometry)
 
-        # BFS guarantees finding the shortest path in terms of steps first.
-        while queue:
-            current_pos, steps, remaining_chips = queue.popleft()
+    def evaluate_trade(self, player_id: str, give: List[str], receive: List[str],
+                       goal: Optional[Tuple[int, int]] = None) -> float:
+        """
+        Utility change for a player who hands over `give` and gets `receive`, without
+        building game objects or touching self.states. "Pass" entries are ignored.
 
-            # Hashable representation of chips for the visited set
-            chips_tuple = tuple(sorted(remaining_chips.items()))
+        :param player_id: The player whose current chips are traded.
+        :param give: Chips the player gives away (["Pass"] means no trade).
+        :param receive: Chips the player receives.
+        :param goal: Goal to score for (default: the player's own goal), e.g. a
+                     hypothesized opponent goal.
+        :return: new score - current score; 0 for a pass and -inf if the player does not
+                 hold every chip in `give`.
+        """
+        if give == ["Pass"]:
+            return 0
+        state = self.states[player_id]
+        goal_pos = state.goal_pos if goal is None else goal
+        counts, extra = chip_vector(state.chips, self.color_index)
+        if goal is None:
+            current_score = self.current_score(player_id)[0]
+        else:
+            current_score = self.score_value(goal_pos, counts, extra)
 
-            if (current_pos, chips_tuple) in visited and visited[(current_pos, chips_tuple)] <= steps:
+        new_counts = list(counts)
+        color_index = self.color_index
+        for chip in give:
+            if chip == "Pass":
                 continue
-            visited[(current_pos, chips_tuple)] = steps
-
-            remaining_chip_count = sum(remaining_chips.values())
-
-            # Goal Check:
-            if current_pos == goal:
-                if best_path_data is None or \
-                        steps < best_path_data[0] or \
-                        (steps == best_path_data[0] and remaining_chip_count > best_path_data[1]):
-                    # Update if shorter path found, or same length but more chips remaining
-                    best_path_data = (steps, remaining_chip_count)
-
-            # Pruning: Don't explore paths longer than the current best known path to the goal
-            if best_path_data is not None and steps >= best_path_data[0]:
+            idx = color_index.get(chip)
+            if idx is not None and new_counts[idx] > 0:
+                new_counts[idx] -= 1
+            elif idx is None and state.chips.get(chip, 0) >= give.count(chip):
+                extra -= 1
+            else:
+                return -float('inf')
+        for chip in receive:
+            if chip == "Pass":
                 continue
+            idx = color_index.get(chip)
+            if idx is None:
+                extra += 1
+            else:
+                new_counts[idx] += 1
 
-            # Explore neighbors
-            for dr, dc in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-                next_r, next_c = current_pos[0] + dr, current_pos[1] + dc
-                next_pos = (next_r, next_c)
-
-                if self._is_valid(next_r, next_c):
-                    target_color = self.board[next_r][next_c]
-
-                    if remaining_chips.get(target_color, 0) > 0:
-                        # Make the move: use one chip
-                        new_chips = remaining_chips.copy()
-                        new_chips[target_color] -= 1
-
-                        if new_chips[target_color] == 0:
-                            del new_chips[target_color]
-
-                        queue.append((next_pos, steps + 1, new_chips))
-
-        # --- Scoring Calculation ---
+        new_score = self.score_value(goal_pos, new_counts, extra)
+        return new_score - current_score
 
-        if best_path_data:
-            # Case 1: Goal is reachable
-            min_steps_to_goal, max_remaining_chips = best_path_data
+    def _color_matrix(self, matrix: np.ndarray, name: str) -> np.ndarray:
+        """A chip count matrix as int64, checked to be (N x colors) in self.colors order."""
+        matrix = np.asarray(matrix, dtype=np.int64)
+        if matrix.ndim != 2 or matrix.shape[1] != len(self.colors):
+            raise ValueError(f"{name} must be an (N x {len(self.colors)}) matrix in the game's color order, "
+                             f"got shape {matrix.shape}")
+        return matrix
 
-            score = (min_steps_to_goal * STEP_POINTS) + GOAL_BONUS
-            final_unused_chip_value = max_remaining_chips * UNUSED_CHIP_POINTS
-            max_score = score + final_unused_chip_value
-            final_steps = min_steps_to_goal
+    def score_many(self, player_id: str,
+                   chip_matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Scores many hypothetical inventories for one player in a single vectorized pass.
 
-        else:
-            # Case 2: Goal not reachable
+        :param player_id: The ID of the player whose goal is used.
+        :param chip_matrix: (N x colors) integer chip counts in self.colors order.
+        :return: (max_scores, min_steps_to_goal, max_unused_chips_values) as NumPy arrays
+        """
+        chip_matrix = self._color_matrix(chip_matrix, "chip_matrix")
+        return self._score_inventories(self.states[player_id].goal_pos, chip_matrix)
 
-            # Find the best reachable position (closest to the goal)
-            min_dist_to_goal = self._get_manhattan_distance(START_POS, goal)
-            max_remaining_chips = sum(start_chips.values())
+    def _score_inventories(self, goal_pos: Tuple[int, int],
+                           chip_matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        score_inventories for a goal on this board. Once utility tables are enabled, the rows
+        the goal's UtilityTable covers are read from it and only the rest are searched.
+        """
+        goal_cell = self.geometry.cell(goal_pos)
+        if self.utility_tables is None:
+            return score_inventories(self.board_colors, goal_cell, chip_matrix, self.geometry)
 
-            if visited:
-                best_reach = None  # (min_dist, max_chips, position)
+        covered, triples = self.get_utility_table(goal_pos).lookup_many(chip_matrix)
+        results = np.empty((len(chip_matrix), 3), dtype=np.int64)
+        results[covered] = triples
+        if not covered.all():
+            results[~covered] = np.column_stack(score_inventories(self.board_colors, goal_cell,
+                                                                  chip_matrix[~covered], self.geometry))
+        return results[:, 0], results[:, 1], results[:, 2]
 
-                for (pos, chips_tuple), steps in visited.items():
-                    dist = self._get_manhattan_distance(pos, goal)
-                    chip_count = sum(c for _, c in chips_tuple)
+    def evaluate_trades(self, player_id: str, give: np.ndarray, receive: np.ndarray,
+                        goal: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """
+        evaluate_trade for many trades at once: (T x colors) give and receive count
+        matrices (see trades_to_matrices), scored in one score_inventories pass (or read
+        from the goal's UtilityTable, see enable_utility_tables).
 
-                    if best_reach is None or \
-                            dist < best_reach[0] or \
-                            (dist == best_reach[0] and chip_count > best_reach[1]):
-                        best_reach = (dist, chip_count, pos)
+        :return: float array of new score - current score per trade; -inf where the player
+                 does not hold the chips to give. An all-zero row (a pass) scores 0.
+        """
+        counts, _ = chip_vector(self.states[player_id].chips, self.color_index)
+        goal_pos = self.states[player_id].goal_pos if goal is None else goal
+        give = self._color_matrix(give, "give")
+        receive = self._color_matrix(receive, "receive")
+        if give.shape != receive.shape:
+            raise ValueError("give and receive must have the same number of trades")
+        current = np.asarray(counts, dtype=np.int64)
+        valid = ((give >= 0) & (receive >= 0) & (give <= current)).all(axis=1)
+        hands = np.vstack([current, current - np.where(valid[:, None], give, 0) + receive])
+        scores = self._score_inventories(goal_pos, hands)[0]
+        return np.where(valid, (scores[1:] - scores[0]).astype(float), -np.inf)
 
-                if best_reach:
-                    min_dist_to_goal, max_remaining_chips, best_pos_reached = best_reach
+    def outcome_matrix(self, player_id: str = 'p1', other_id: str = 'p2') -> OutcomeMatrix:
+        """
+        Both players' utilities under every redistribution of their current pooled chips,
+        with the Pareto frontier, status quo, welfare maximum and Nash point (see outcome_matrix).
+        """
+        states = (self.states[player_id], self.states[other_id])
+        vectors = [chip_vector(state.chips, self.color_index) for state in states]
+        return outcome_matrix(self.board_colors, tuple(self.geometry.cell(state.goal_pos) for state in states),
+                              (vectors[0][0], vectors[1][0]), (vectors[0][1], vectors[1][1]),
+                              self.geometry)
 
-                    initial_dist = self._get_manhattan_distance(START_POS, goal)
-                    distance_moved_points = (initial_dist - min_dist_to_goal) * STEP_POINTS
+    def best_path(self, goal_pos: Tuple[int, int], chips: Dict[str, int]) -> BestPath:
+        """
+        Like score_chips, but also returns the route behind the score (cells walked and
+        chips spent). Routes are memoized in the process-wide PATH_CACHE.
+        """
+        counts, extra = chip_vector(chips, self.color_index)
+        return cached_best_path(self.board_colors, self.geometry.cell(goal_pos), counts, extra,
+                                self.geometry, self.colors)
 
-                    final_unused_chip_value = max_remaining_chips * UNUSED_CHIP_POINTS
-                    max_score = distance_moved_points + final_unused_chip_value
-                    final_steps = self._get_manhattan_distance(START_POS, best_pos_reached)
+    def get_max_score_and_path(self, player_id: str, with_path: bool = False):
+        """
+        Calculates the maximum score a player can achieve from the start position
+        to the goal, given their current chip inventory, using a Breadth-First Search (BFS)
+        over integer-coded chip inventories (see search_max_score; boards larger than 5x5
+        use the equivalent best-first astar_max_score). Results are memoized
+        in the process-wide SCORE_CACHE, or looked up in a UtilityTable once
+        enable_utility_tables() has been called, and each player's current score is kept
+        until a trade changes their chips (see current_score).
 
-            else:
-                # No moves possible
-                max_score = 0
-                final_steps = 0
-                final_unused_chip_value = 0
+        The result is the utility (max score) used for negotiation.
 
-        return max_score, final_steps, final_unused_chip_value
+        :param player_id: The ID of the player to score.
+        :param with_path: Return a BestPath (score triple plus route and chips spent) instead.
+        :return: (max_score, min_steps_to_goal, max_unused_chips_value)
+        """
+        state = self.states[player_id]
+        if with_path:
+            return self.best_path(state.goal_pos, state.chips)
+        return self.current_score(player_id)
 
     def apply_trade(self, p1_id: str, p2_id: str, p1_give: List[str], p1_receive: List[str]):
         """
@@ -204,68 +1954,188 @@ class ColoredTrails:
         return True
 
     @staticmethod
-    def generate_random_game(seed: Optional[int] = None) -> Tuple[List[List[str]], Dict[str, GameState]]:
-        """Generates a new, random game instance."""
+    def generate_random_game(seed: Optional[int] = None, board_size: int = BOARD_SIZE,
+                             colors: Optional[List[str]] = None,
+                             start_pos: Optional[Tuple[int, int]] = None,
+                             n_chips: int = 4,
+                             min_goal_dist: int = 3) -> Tuple[BoardMap, Dict[str, GameState]]:
+        """
+        Generates a new, random game instance. The defaults give the standard game
+        (5x5 board, COLORS, start (2,2), 4 chips each, goals at least 3 steps away).
+        """
+        colors = COLORS if colors is None else colors
+        if start_pos is None:
+            start_pos = START_POS if board_size == BOARD_SIZE else (board_size // 2, board_size // 2)
 
         rng = random.Random(seed)
 
-        # 1. Generate Board (5x5, random colors)
-        board_map = [[rng.choice(COLORS) for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]
+        # 1. Generate Board (random colors)
+        board_map = tuple(tuple(rng.choice(colors) for _ in range(board_size)) for _ in range(board_size))
 
-        # 2. Generate Goal Locations (at least 3 steps away from START_POS (2,2))
+        # 2. Generate Goal Locations (at least min_goal_dist steps away from the start)
         possible_goals = []
-        for r in range(BOARD_SIZE):
-            for c in range(BOARD_SIZE):
-                if ColoredTrails._is_valid(r, c) and abs(r - START_POS[0]) + abs(c - START_POS[1]) >= 3:
+        for r in range(board_size):
+            for c in range(board_size):
+                if abs(r - start_pos[0]) + abs(c - start_pos[1]) >= min_goal_dist:
                     possible_goals.append((r, c))
 
         if len(possible_goals) < 2:
-            possible_goals = [(0, 0), (4, 4)]
+            possible_goals = [(0, 0), (board_size - 1, board_size - 1)]
 
         goal_p1, goal_p2 = rng.sample(possible_goals, 2)
 
-        # 3. Generate Initial Chips (4 random chips each)
-        chips_p1 = Counter([rng.choice(COLORS) for _ in range(4)])
-        chips_p2 = Counter([rng.choice(COLORS) for _ in range(4)])
+        # 3. Generate Initial Chips (n_chips random chips each)
+        chips_p1 = Counter([rng.choice(colors) for _ in range(n_chips)])
+        chips_p2 = Counter([rng.choice(colors) for _ in range(n_chips)])
 
         # 4. Create Player States
         player_states = {
-            'p1': GameState(goal_p1, chips_p1),
-            'p2': GameState(goal_p2, chips_p2),
+            'p1': GameState(goal_p1, chips_p1, start_pos),
+            'p2': GameState(goal_p2, chips_p2, start_pos),
         }
 
         return board_map, player_states
 
 
 
-def scenario_to_dict(board_map: List[List[str]], states: Dict[str, GameState], seed: Optional[int]) -> dict:
+def scenario_to_dict(board_map: BoardMap, states: Dict[str, GameState], seed: Optional[int],
+                     colors: Optional[List[str]] = None) -> dict:
     """Serialize a full scenario (board, goals, chips, optional seed) to a Python dict."""
     return {
-        "meta": {"board_size": BOARD_SIZE, "colors": COLORS, "start_pos": START_POS, "seed": seed},
-        "board": board_map,
+        "meta": {"board_size": len(board_map), "colors": COLORS if colors is None else colors,
+                 "start_pos": states['p1'].current_pos, "seed": seed},
+        "board": [list(row) for row in board_map],
         "players": {
             "p1": {"goal": states['p1'].goal_pos, "chips": dict(states['p1'].chips)},
             "p2": {"goal": states['p2'].goal_pos, "chips": dict(states['p2'].chips)},
         },
     }
 
-def save_scenario_json(path: str, board_map: List[List[str]], states: Dict[str, GameState],
-                       seed: Optional[int] = None):
+def save_scenario_json(path: str, board_map: BoardMap, states: Dict[str, GameState],
+                       seed: Optional[int] = None, colors: Optional[List[str]] = None):
     """Write scenario JSON to disk."""
     with open(path, "w", encoding="utf-8") as f:
-        json.dump(scenario_to_dict(board_map, states, seed), f, indent=2)
+        json.dump(scenario_to_dict(board_map, states, seed, colors), f, indent=2)
 
 
-def load_scenario_json(path: str) -> Tuple[List[List[str]], Dict[str, GameState]]:
+def load_scenario_json(path: str) -> Tuple[BoardMap, Dict[str, GameState]]:
     """Load a scenario JSON and reconstruct board & player states."""
     with open(path, "r", encoding="utf-8") as f:
         data = json.load(f)
 
-    board_map = data["board"]
+    board_map = tuple(tuple(row) for row in data["board"])
+    start_pos = tuple(data.get("meta", {}).get("start_pos", START_POS))
     p1 = data["players"]["p1"]
     p2 = data["players"]["p2"]
     states = {
-        "p1": GameState(tuple(p1["goal"]), p1["chips"]),
-        "p2": GameState(tuple(p2["goal"]), p2["chips"]),
+        "p1": GameState(tuple(p1["goal"]), p1["chips"], start_pos),
+        "p2": GameState(tuple(p2["goal"]), p2["chips"], start_pos),
     }
     return board_map, states
+
+
+# --- Bulk Scenario Generation ---
+class ScenarioBatch:
+    """
+    N scenarios stored as stacked arrays (see generate_scenario_batch):
+      boards: (N, size, size) uint8 color indices into `colors`
+      goals:  (N, 2, 2) int8 goal (row, col) of p1 and p2
+      chips:  (N, 2, n_colors) uint8 chip counts of p1 and p2
+    Scenarios are only turned into boards, GameStates and ColoredTrails when asked for.
+    """
+    __slots__ = ('boards', 'goals', 'chips', 'colors', 'start_pos')
+
+    def __init__(self, boards: np.ndarray, goals: np.ndarray, chips: np.ndarray,
+                 colors: Sequence[str] = COLORS, start_pos: Tuple[int, int] = START_POS):
+        self.boards = boards
+        self.goals = goals
+        self.chips = chips
+        self.colors = tuple(colors)
+        self.start_pos = tuple(start_pos)
+
+    def __len__(self) -> int:
+        return len(self.boards)
+
+    @property
+    def size(self) -> int:
+        return self.boards.shape[1]
+
+    def board_map(self, i: int) -> BoardMap:
+        """Board i as a tuple of tuples of color names."""
+        colors = self.colors
+        return tuple(tuple(colors[c] for c in row) for row in self.boards[i].tolist())
+
+    def board_colors(self, i: int) -> bytes:
+        """Board i as row-major color indices (ColoredTrails.board_colors)."""
+        return self.boards[i].tobytes()
+
+    def states(self, i: int) -> Dict[str, GameState]:
+        """Fresh player states of scenario i."""
+        colors = self.colors
+        states = {}
+        for p, (goal, counts) in enumerate(zip(self.goals[i].tolist(), self.chips[i].tolist())):
+            chips = {colors[c]: n for c, n in enumerate(counts) if n}
+            states[f"p{p + 1}"] = GameState(tuple(goal), chips, self.start_pos)
+        return states
+
+    def scenario(self, i: int) -> Tuple[BoardMap, Dict[str, GameState]]:
+        """Scenario i as (board_map, player_states), like generate_random_game."""
+        return self.board_map(i), self.states(i)
+
+    def game(self, i: int) -> 'ColoredTrails':
+        """Scenario i as a ColoredTrails game."""
+        return ColoredTrails(self.board_map(i), self.states(i), colors=self.colors,
+                             start_pos=self.start_pos)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.scenario(i)
+
+
+def generate_scenario_batch(n: int, seed=None, board_size: int = BOARD_SIZE,
+                            colors: Optional[List[str]] = None,
+                            start_pos: Optional[Tuple[int, int]] = None,
+                            n_chips: int = 4, min_goal_dist: int = 3) -> ScenarioBatch:
+    """
+    Vectorized counterpart of ColoredTrails.generate_random_game: n scenarios drawn in one
+    call from a NumPy Generator. Same distribution (uniform board colors, two distinct goals
+    at least min_goal_dist from the start, n_chips uniform chips per player), but a different
+    random stream, so batch scenarios do not match the per-seed games.
+
+    :param seed: int, SeedSequence or None; the same seed gives the same batch.
+    """
+    colors = COLORS if colors is None else colors
+    if start_pos is None:
+        start_pos = START_POS if board_size == BOARD_SIZE else (board_size // 2, board_size // 2)
+    n_colors = len(colors)
+    rng = np.random.default_rng(seed)
+
+    boards = rng.integers(0, n_colors, size=(n, board_size, board_size), dtype=np.uint8)
+
+    rows, cols = np.divmod(np.arange(board_size * board_size), board_size)
+    far = np.abs(rows - start_pos[0]) + np.abs(cols - start_pos[1]) >= min_goal_dist
+    candidates = np.stack([rows[far], cols[far]], axis=1)
+    if len(candidates) < 2:
+        candidates = np.array([(0, 0), (board_size - 1, board_size - 1)])
+    # Two distinct candidates per scenario: draw the second from the remaining ones
+    first = rng.integers(0, len(candidates), size=n)
+    second = rng.integers(0, len(candidates) - 1, size=n)
+    second += second >= first
+    goals = np.stack([candidates[first], candidates[second]], axis=1).astype(np.int8)
+
+    draws = rng.integers(0, n_colors, size=(n * 2, n_chips))
+    flat = (np.arange(n * 2)[:, None] * n_colors + draws).ravel()
+    chips = np.bincount(flat, minlength=n * 2 * n_colors).reshape(n, 2, n_colors).astype(np.uint8)
+
+    return ScenarioBatch(boards, goals, chips, colors, start_pos)
+
+
+def iter_scenario_batches(total: int, batch_size: int = 100_000, seed=None, **kwargs):
+    """
+    Yields ScenarioBatches covering `total` scenarios. Batch k uses the k-th child of
+    SeedSequence(seed), so every batch is reproducible on its own (e.g. in a worker process).
+    Keyword arguments are passed to generate_scenario_batch.
+    """
+    n_batches = -(-total // batch_size)
+    for k, child in enumerate(np.random.SeedSequence(seed).spawn(n_batches)):
+        yield generate_scenario_batch(min(batch_size, total - k * batch_size), child, **kwargs)
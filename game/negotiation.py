@@ -0,0 +1,221 @@
+"""
+Subgame-perfect play of the negotiation protocol of run_game_simulation, with full information.
+
+Protocol: up to MAX_NEGOTIATION_ROUNDS rounds in which p1 and then p2 propose. A proposer
+either passes, which ends the game without a trade, or makes an offer and pays
+PENALTY_PER_ROUND; an accepted offer is applied and ends the game. The game also ends
+without a trade after the last offer is rejected. A player's final score is the max score of
+their final chips minus their penalties.
+
+Any trade ends the game, so the inventories at turn t are always the starting ones and
+every node of the game tree at turn t is the same subgame. The transposition table over
+(turn, proposer, inventories) therefore has one entry per turn for each scenario. It is
+filled by backward induction from the last turn, and whole tables are memoized per scenario
+in SOLUTION_CACHE. An offer is any redistribution of the pooled chips (see outcome_matrix),
+so each turn is a few vector operations over the scenario's OutcomeMatrix. The
+redistribution scores come from the cached utility tables behind it.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from game.colored_trails import (
+    DEFAULT_GEOMETRY,
+    MAX_NEGOTIATION_ROUNDS,
+    PENALTY_PER_ROUND,
+    BoardGeometry,
+    ColoredTrails,
+    OutcomeMatrix,
+    ScenarioBatch,
+    ScoreCache,
+    get_geometry,
+    outcome_matrix,
+)
+from game.scenario_corpus import ScenarioCorpus
+
+# Proposer action of a turn that passes instead of offering
+PASS = -1
+
+
+class NegotiationSolution(NamedTuple):
+    """
+    Subgame-perfect strategies of one scenario (see solve_outcomes). Turn t is proposed by
+    the first player if t is even and by the second player if t is odd; scores are final
+    scores (max score minus penalties) in (first, second) order.
+    """
+    outcomes: OutcomeMatrix
+    values: np.ndarray    # (turns + 1) x 2: final scores of the subgame starting at turn t
+    offers: np.ndarray    # per turn: redistribution the proposer offers, or PASS
+    accepted: np.ndarray  # per turn: whether the responder accepts that offer
+
+    @property
+    def n_turns(self) -> int:
+        return len(self.offers)
+
+    @property
+    def scores(self) -> Tuple[int, int]:
+        """Final scores of both players under equilibrium play from the first turn."""
+        return int(self.values[0, 0]), int(self.values[0, 1])
+
+    def play(self) -> Tuple[int, int]:
+        """
+        (turn at which equilibrium play ends, redistribution it ends with). The turn equals
+        n_turns if every offer is rejected; the redistribution is the status quo unless an
+        offer is accepted.
+        """
+        for turn in range(self.n_turns):
+            if self.offers[turn] == PASS:
+                return turn, self.outcomes.status_quo
+            if self.accepted[turn]:
+                return turn, int(self.offers[turn])
+        return self.n_turns, self.outcomes.status_quo
+
+
+def _penalties(turn: int, penalty: int) -> np.ndarray:
+    """Penalties (first, second) of the offers made before `turn`."""
+    return np.array([(turn + 1) // 2, turn // 2], dtype=np.int64) * penalty
+
+
+def _best_for(scores: np.ndarray, mover: int, candidates: np.ndarray) -> int:
+    """Candidate redistribution with the highest score for `mover`, then for the other player, then the lowest code."""
+    other = scores[:, 1 - mover]
+    keys = scores[:, mover] * (int(other.max() - other.min()) + 1) + (other - other.min())
+    return int(np.where(candidates, keys, keys.min() - 1).argmax())
+
+
+def solve_outcomes(outcomes: OutcomeMatrix, rounds: int = MAX_NEGOTIATION_ROUNDS,
+                   penalty: int = PENALTY_PER_ROUND, accept_ties: bool = True) -> NegotiationSolution:
+    """
+    Backward induction over the 2 * rounds turns of the protocol.
+
+    At each turn the responder accepts an offer iff its final score is at least (with
+    accept_ties, otherwise strictly above) what it gets by rejecting, i.e. the value of
+    the next turn. The proposer then picks the best of three moves for itself:
+      - the accepted offer it likes best,
+      - passing (status quo, no further penalty),
+      - an offer that is rejected (it pays the penalty and play moves on; the offer recorded
+        is its favourite among the rejected ones).
+    Ties go to the higher score for the responder, then to the earlier move in that list.
+    Among offers, further ties go to the lowest redistribution code.
+    """
+    utilities = outcomes.utilities.astype(np.int64)
+    status_quo = utilities[outcomes.status_quo]
+    n_turns = 2 * rounds
+    values = np.empty((n_turns + 1, 2), dtype=np.int64)
+    offers = np.full(n_turns, PASS, dtype=np.int64)
+    accepted = np.zeros(n_turns, dtype=bool)
+
+    values[n_turns] = status_quo - _penalties(n_turns, penalty)
+    for turn in range(n_turns - 1, -1, -1):
+        proposer = turn % 2
+        responder = 1 - proposer
+        later = values[turn + 1]
+        # Final scores if the offer made at this turn is accepted
+        finals = utilities - _penalties(turn + 1, penalty)
+        if accept_ties:
+            accepts = finals[:, responder] >= later[responder]
+        else:
+            accepts = finals[:, responder] > later[responder]
+
+        moves = []
+        if accepts.any():
+            best = _best_for(finals, proposer, accepts)
+            moves.append((finals[best], best, True))
+        moves.append((status_quo - _penalties(turn, penalty), PASS, False))
+        if not accepts.all():
+            moves.append((later, _best_for(finals, proposer, ~accepts), False))
+
+        chosen = moves[0]
+        for move in moves[1:]:
+            if (move[0][proposer], move[0][responder]) > (chosen[0][proposer], chosen[0][responder]):
+                chosen = move
+        values[turn], offers[turn], accepted[turn] = chosen
+    return NegotiationSolution(outcomes, values, offers, accepted)
+
+
+# Process-wide memo of solutions, keyed by scenario and protocol parameters
+SOLUTION_CACHE = ScoreCache(maxsize=4096)
+
+
+def solve_negotiation(board_colors: bytes, goal_cells: Tuple[int, int],
+                      hands: Tuple[Sequence[int], Sequence[int]], extras: Tuple[int, int] = (0, 0),
+                      geometry: BoardGeometry = DEFAULT_GEOMETRY, rounds: int = MAX_NEGOTIATION_ROUNDS,
+                      penalty: int = PENALTY_PER_ROUND, accept_ties: bool = True) -> NegotiationSolution:
+    """
+    Subgame-perfect solution of a scenario; the first player of `goal_cells` / `hands`
+    proposes first. Memoized in SOLUTION_CACHE.
+    """
+    key = (board_colors, geometry.size, geometry.start_cell, tuple(goal_cells),
+           tuple(tuple(hand) for hand in hands), tuple(extras), rounds, penalty, accept_ties)
+    solution = SOLUTION_CACHE.get(key)
+    if solution is None:
+        outcomes = outcome_matrix(board_colors, goal_cells, hands, extras, geometry)
+        solution = solve_outcomes(outcomes, rounds, penalty, accept_ties)
+        SOLUTION_CACHE.put(key, solution)
+    return solution
+
+
+def solve_game(game: ColoredTrails, first: str = 'p1', second: str = 'p2', **kwargs) -> NegotiationSolution:
+    """Subgame-perfect solution of a game's current state, with `first` proposing first."""
+    return solve_outcomes(game.outcome_matrix(first, second), **kwargs)
+
+
+# --- Corpus baselines ---
+# Metric fields filled by negotiation_metrics: both players' equilibrium final scores, the
+# turn at which equilibrium play ends and the redistribution code it ends with
+NEGOTIATION_METRICS = ("spe_p1", "spe_p2", "spe_turn", "spe_outcome")
+
+
+def negotiation_metrics(batch: ScenarioBatch, rounds: int = MAX_NEGOTIATION_ROUNDS,
+                        penalty: int = PENALTY_PER_ROUND) -> Dict[str, np.ndarray]:
+    """NEGOTIATION_METRICS columns for every scenario of a batch (p1 proposes first)."""
+    geometry = get_geometry(batch.size, batch.start_pos)
+    columns = {name: np.zeros(len(batch), dtype=np.int32) for name in NEGOTIATION_METRICS}
+    goal_cells = (batch.goals[..., 0].astype(np.int64) * batch.size + batch.goals[..., 1]).tolist()
+    chips = batch.chips.tolist()
+    for i in range(len(batch)):
+        outcomes = outcome_matrix(batch.board_colors(i), tuple(goal_cells[i]), tuple(chips[i]),
+                                  geometry=geometry)
+        solution = solve_outcomes(outcomes, rounds, penalty)
+        columns["spe_p1"][i], columns["spe_p2"][i] = solution.scores
+        columns["spe_turn"][i], columns["spe_outcome"][i] = solution.play()
+    return columns
+
+
+def _solve_range(path: str, start: int, stop: int, rounds: int, penalty: int) -> Dict[str, np.ndarray]:
+    return negotiation_metrics(ScenarioCorpus(path).batch(start, stop), rounds, penalty)
+
+
+def solve_corpus(path: str, processes: Optional[int] = None, chunk_size: int = 2048,
+                 rounds: int = MAX_NEGOTIATION_ROUNDS, penalty: int = PENALTY_PER_ROUND,
+                 write: bool = False) -> Dict[str, np.ndarray]:
+    """
+    NEGOTIATION_METRICS for a whole corpus file, in chunks of chunk_size records spread over
+    `processes` worker processes (default: one per CPU). Each worker maps the file itself,
+    so only the result columns are sent between processes. With write=True the columns are
+    also stored in the corpus, which must have been created with those metric fields.
+    """
+    corpus = ScenarioCorpus(path)
+    n_records = len(corpus)
+    if write and not set(NEGOTIATION_METRICS) <= set(corpus.metrics):
+        raise ValueError("corpus has no fields for the negotiation metrics")
+    processes = processes or os.cpu_count() or 1
+    starts = list(range(0, n_records, chunk_size))
+    if processes == 1:
+        parts = [_solve_range(path, start, start + chunk_size, rounds, penalty) for start in starts]
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            parts = list(pool.map(_solve_range, [path] * len(starts), starts,
+                                  [start + chunk_size for start in starts],
+                                  [rounds] * len(starts), [penalty] * len(starts)))
+    columns = {name: (np.concatenate([part[name] for part in parts]) if parts
+                      else np.zeros(0, dtype=np.int32)) for name in NEGOTIATION_METRICS}
+    if write and n_records:
+        writable = ScenarioCorpus(path, mode="r+")
+        for name, column in columns.items():
+            writable.records[name] = column
+        writable.records.flush()
+    return columns
@@ -0,0 +1,273 @@
+"""
+Fixed-record binary scenario corpus, readable through numpy.memmap.
+
+File layout:
+  b"CTCORPUS"  magic (8 bytes)
+  uint32       header length in bytes (little endian)
+  header       JSON: format version, board size, colors, start position and metric names
+               (padded with spaces so records start at a multiple of 64 bytes)
+  records      one fixed-size record per scenario:
+                 board  (size, size) uint8 color indices
+                 goals  (2, 2) int8 goal (row, col) of p1 and p2
+                 chips  (2, n_colors) uint8 chip counts of p1 and p2
+                 seed   int64 (-1 if the scenario has no seed)
+                 plus one int32 field per optional precomputed metric
+
+The record count follows from the file size, so a corpus can be appended to and read while
+it grows. Nothing is loaded into memory: records are views on the mapped file.
+"""
+
+import json
+import os
+import struct
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from game.colored_trails import (
+    BOARD_SIZE,
+    COLORS,
+    START_POS,
+    BoardMap,
+    ColoredTrails,
+    GameState,
+    ScenarioBatch,
+    chip_vector,
+    get_geometry,
+    load_scenario_json,
+    outcome_matrix,
+    save_scenario_json,
+    scenario_to_dict,
+)
+
+CORPUS_MAGIC = b"CTCORPUS"
+CORPUS_VERSION = 1
+_HEADER_ALIGN = 64
+
+
+def scenario_record_dtype(board_size: int = BOARD_SIZE, n_colors: int = len(COLORS),
+                          metrics: Sequence[str] = ()) -> np.dtype:
+    """Record layout of a corpus with the given board size, color count and metric fields."""
+    fields = [
+        ("board", np.uint8, (board_size, board_size)),
+        ("goals", np.int8, (2, 2)),
+        ("chips", np.uint8, (2, n_colors)),
+        ("seed", np.int64),
+    ]
+    fields += [(name, np.int32) for name in metrics]
+    return np.dtype(fields)
+
+
+def _read_header(f) -> Tuple[dict, int]:
+    if f.read(len(CORPUS_MAGIC)) != CORPUS_MAGIC:
+        raise ValueError("not a scenario corpus file")
+    (header_len,) = struct.unpack("<I", f.read(4))
+    header = json.loads(f.read(header_len).decode("utf-8"))
+    if header.get("version") != CORPUS_VERSION:
+        raise ValueError(f"unsupported scenario corpus version {header.get('version')}")
+    return header, len(CORPUS_MAGIC) + 4 + header_len
+
+
+class ScenarioCorpusWriter:
+    """
+    Appends scenarios to a corpus file (created with a header if missing or if append=False).
+    Use as a context manager, or call close().
+    """
+
+    def __init__(self, path: str, board_size: int = BOARD_SIZE, colors: Optional[List[str]] = None,
+                 start_pos: Optional[Tuple[int, int]] = None, metrics: Sequence[str] = (),
+                 append: bool = False):
+        self.path = path
+        if append and os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                header, _ = _read_header(f)
+            self.board_size = header["board_size"]
+            self.colors = tuple(header["colors"])
+            self.start_pos = tuple(header["start_pos"])
+            self.metrics = tuple(header["metrics"])
+            self.file = open(path, "ab")
+        else:
+            self.board_size = board_size
+            self.colors = tuple(COLORS if colors is None else colors)
+            if start_pos is None:
+                start_pos = START_POS if board_size == BOARD_SIZE else (board_size // 2, board_size // 2)
+            self.start_pos = tuple(start_pos)
+            self.metrics = tuple(metrics)
+            self.file = open(path, "wb")
+            self._write_header()
+        self.dtype = scenario_record_dtype(self.board_size, len(self.colors), self.metrics)
+        self.color_index = {color: i for i, color in enumerate(self.colors)}
+
+    def _write_header(self):
+        header = json.dumps({
+            "version": CORPUS_VERSION,
+            "board_size": self.board_size,
+            "colors": list(self.colors),
+            "start_pos": list(self.start_pos),
+            "metrics": list(self.metrics),
+        }).encode("utf-8")
+        prefix = len(CORPUS_MAGIC) + 4
+        header += b" " * (-(prefix + len(header)) % _HEADER_ALIGN)
+        self.file.write(CORPUS_MAGIC + struct.pack("<I", len(header)) + header)
+
+    def append_batch(self, batch: ScenarioBatch, seeds: Optional[Sequence[int]] = None,
+                     metrics: Optional[Dict[str, Sequence[int]]] = None):
+        """Write every scenario of a batch (same board size and colors as the corpus)."""
+        if batch.size != self.board_size or batch.colors != self.colors:
+            raise ValueError("batch board size / colors do not match the corpus")
+        records = np.empty(len(batch), dtype=self.dtype)
+        records["board"] = batch.boards
+        records["goals"] = batch.goals
+        records["chips"] = batch.chips
+        records["seed"] = -1 if seeds is None else seeds
+        for name in self.metrics:
+            records[name] = metrics[name] if metrics and name in metrics else 0
+        self.file.write(records.tobytes())
+
+    def append_scenario(self, board_map: BoardMap, states: Dict[str, GameState],
+                        seed: Optional[int] = None, metrics: Optional[Dict[str, int]] = None):
+        """Write one scenario given as (board_map, player_states)."""
+        record = np.zeros(1, dtype=self.dtype)
+        record["board"] = [[self.color_index[color] for color in row] for row in board_map]
+        for p, pid in enumerate(("p1", "p2")):
+            record["goals"][0, p] = states[pid].goal_pos
+            counts, extra = chip_vector(states[pid].chips, self.color_index)
+            if extra:
+                raise ValueError(f"{pid} holds chips outside the corpus colors")
+            record["chips"][0, p] = counts
+        record["seed"] = -1 if seed is None else seed
+        for name, value in (metrics or {}).items():
+            record[name] = value
+        self.file.write(record.tobytes())
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ScenarioCorpus:
+    """
+    Read-only (or mode="r+" for in-place metric updates) memory-mapped view of a corpus file.
+    Indexing, slicing and iteration read only the records they touch.
+    """
+
+    def __init__(self, path: str, mode: str = "r"):
+        self.path = path
+        with open(path, "rb") as f:
+            header, offset = _read_header(f)
+        self.board_size = header["board_size"]
+        self.colors = tuple(header["colors"])
+        self.start_pos = tuple(header["start_pos"])
+        self.metrics = tuple(header["metrics"])
+        self.dtype = scenario_record_dtype(self.board_size, len(self.colors), self.metrics)
+        n_records = (os.path.getsize(path) - offset) // self.dtype.itemsize
+        if n_records:
+            self.records = np.memmap(path, dtype=self.dtype, mode=mode, offset=offset,
+                                     shape=(n_records,))
+        else:
+            self.records = np.empty(0, dtype=self.dtype)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def batch(self, start: int = 0, stop: Optional[int] = None) -> ScenarioBatch:
+        """Records start..stop as a ScenarioBatch whose arrays are views on the mapped file."""
+        records = self.records[start:stop]
+        return ScenarioBatch(records["board"], records["goals"], records["chips"],
+                             self.colors, self.start_pos)
+
+    def iter_batches(self, batch_size: int = 65536) -> Iterator[ScenarioBatch]:
+        """Streams the corpus in ScenarioBatches of at most batch_size records."""
+        for start in range(0, len(self), batch_size):
+            yield self.batch(start, start + batch_size)
+
+    def seed(self, i: int) -> Optional[int]:
+        seed = int(self.records["seed"][i])
+        return None if seed < 0 else seed
+
+    def metric(self, name: str) -> np.ndarray:
+        """Column of a precomputed metric (a view on the mapped file)."""
+        return self.records[name]
+
+    def scenario(self, i: int) -> Tuple[BoardMap, Dict[str, GameState]]:
+        return self.batch(i, i + 1).scenario(0)
+
+    def game(self, i: int) -> ColoredTrails:
+        return self.batch(i, i + 1).game(0)
+
+    def __iter__(self):
+        for batch in self.iter_batches():
+            yield from batch
+
+
+# --- Precomputed metrics ---
+# Metric fields filled by outcome_metrics (scores of the status quo, the welfare maximum and
+# the Nash bargaining point, and the size of the Pareto frontier)
+OUTCOME_METRICS = ("p1_score", "p2_score", "welfare_p1", "welfare_p2", "nash_p1", "nash_p2",
+                   "pareto_size")
+
+
+def outcome_metrics(batch: ScenarioBatch) -> Dict[str, np.ndarray]:
+    """OUTCOME_METRICS columns for every scenario of a batch (see outcome_matrix)."""
+    geometry = get_geometry(batch.size, batch.start_pos)
+    columns = {name: np.zeros(len(batch), dtype=np.int32) for name in OUTCOME_METRICS}
+    goal_cells = (batch.goals[..., 0].astype(np.int64) * batch.size + batch.goals[..., 1]).tolist()
+    chips = batch.chips.tolist()
+    for i in range(len(batch)):
+        outcomes = outcome_matrix(batch.board_colors(i), tuple(goal_cells[i]), tuple(chips[i]),
+                                  geometry=geometry)
+        for (first, second), point in ((("p1_score", "p2_score"), outcomes.status_quo),
+                                       (("welfare_p1", "welfare_p2"), outcomes.welfare_max),
+                                       (("nash_p1", "nash_p2"), outcomes.nash)):
+            columns[first][i], columns[second][i] = outcomes.utilities[point]
+        columns["pareto_size"][i] = len(outcomes.pareto)
+    return columns
+
+
+# --- JSON converters ---
+def corpus_to_json(corpus_path: str, out_dir: str, indices: Optional[Iterable[int]] = None,
+                   name_format: str = "scenario_{index}.json") -> List[str]:
+    """Writes the selected corpus records (default: all) as scenario JSON files."""
+    corpus = ScenarioCorpus(corpus_path)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i in range(len(corpus)) if indices is None else indices:
+        board_map, states = corpus.scenario(i)
+        path = os.path.join(out_dir, name_format.format(index=i))
+        save_scenario_json(path, board_map, states, seed=corpus.seed(i), colors=list(corpus.colors))
+        paths.append(path)
+    return paths
+
+
+def corpus_record_dict(corpus: ScenarioCorpus, i: int) -> dict:
+    """Record i in the JSON scenario layout (see scenario_to_dict)."""
+    board_map, states = corpus.scenario(i)
+    return scenario_to_dict(board_map, states, corpus.seed(i), colors=list(corpus.colors))
+
+
+def json_to_corpus(json_paths: Iterable[str], corpus_path: str, append: bool = False) -> int:
+    """
+    Packs scenario JSON files into a corpus. The first file fixes board size, colors and
+    start position; returns the number of scenarios written.
+    """
+    writer = None
+    count = 0
+    try:
+        for path in json_paths:
+            with open(path, "r", encoding="utf-8") as f:
+                meta = json.load(f).get("meta", {})
+            board_map, states = load_scenario_json(path)
+            if writer is None:
+                writer = ScenarioCorpusWriter(corpus_path, len(board_map), meta.get("colors"),
+                                              states["p1"].current_pos, append=append)
+            writer.append_scenario(board_map, states, meta.get("seed"))
+            count += 1
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
@@ -5,7 +5,7 @@ import matplotlib.colors as mcolors
 import matplotlib.patheffects as pe
 import numpy as np
 from pathlib import Path
-from itertools import product
+from itertools import cycle, product
 from utils.text_logger import TextLogger
 
 import sys
@@ -16,11 +16,9 @@ sys.stdout.reconfigure(encoding='utf-8')
 
 from game.colored_trails import (
     ColoredTrails,
-    GameState,
+    MAX_NEGOTIATION_ROUNDS,
     PENALTY_PER_ROUND,
-    BOARD_SIZE,
-    START_POS,
-    COLORS, load_scenario_json, save_scenario_json
+    load_scenario_json, save_scenario_json
 )
 from agents.llm_player_llama import LlamaMPlayer
 from agents.llm_player_claude import ClaudePlayer
@@ -28,14 +26,17 @@ from agents.llm_player_gemini import LLMPlayer as GeminiPlayer
 
 from agents.tom_agent import ToMAgent  # New import
 
-MAX_NEGOTIATION_ROUNDS = 5
+# Display colors of the standard chips; other board colors take the Tableau colors in turn
+HEX_COLORS = {"RE": '#DC143C', "BL": '#1E90FF', "YE": '#FFD700', "GR": '#32CD32', "OR": '#FF8C00'}
+EXTRA_HEX_COLORS = list(mcolors.TABLEAU_COLORS.values())
 
-COLOR_TO_VALUE = {"RE": 0, "BL": 1, "YE": 2, "GR": 3, "OR": 4}
-HEX_COLORS = ['#DC143C', '#1E90FF', '#FFD700', '#32CD32', '#FF8C00']
 
-COLOR_MAP = mcolors.ListedColormap(HEX_COLORS)
-BOUNDS = [-0.5, 0.5, 1.5, 2.5, 3.5, 4.5]
-NORM = mcolors.BoundaryNorm(BOUNDS, COLOR_MAP.N)
+def board_colormap(colors):
+    # (color -> value map, colormap, norm) for the colors of a game's board (game.colors)
+    extra = cycle(EXTRA_HEX_COLORS)
+    color_map = mcolors.ListedColormap([HEX_COLORS.get(color) or next(extra) for color in colors])
+    norm = mcolors.BoundaryNorm(np.arange(len(colors) + 1) - 0.5, color_map.N)
+    return {color: i for i, color in enumerate(colors)}, color_map, norm
 
 
 def set_global_seed(seed: int):
@@ -47,48 +48,52 @@ def set_global_seed(seed: int):
 
 def print_quick_metrics(game: ColoredTrails):
     # Function just to quickly see whether seed is promising and we should try it
-    p1_score, p1_steps, _ = game.get_max_score_and_path('p1')
-    p2_score, p2_steps, _ = game.get_max_score_and_path('p2')
+    p1_best = game.get_max_score_and_path('p1', with_path=True)
+    p2_best = game.get_max_score_and_path('p2', with_path=True)
     g1 = game.states['p1'].goal_pos
     g2 = game.states['p2'].goal_pos
 
-    hist = {c: 0 for c in COLORS}
-    for r in range(BOARD_SIZE):
-        for c in range(BOARD_SIZE):
+    hist = {c: 0 for c in game.colors}
+    for r in range(game.size):
+        for c in range(game.size):
             hist[game.board[r][c]] += 1
 
     print("\n--- QUICK METRICS ---")
-    print(f" P1: steps_to_goal={p1_steps}, path_score={p1_score}")
-    print(f" P2: steps_to_goal={p2_steps}, path_score={p2_score}")
+    print(f" P1: steps_to_goal={p1_best.steps}, path_score={p1_best.score}")
+    print(f"     route={list(p1_best.path)}, chips_spent={list(p1_best.chips_spent)}")
+    print(f" P2: steps_to_goal={p2_best.steps}, path_score={p2_best.score}")
+    print(f"     route={list(p2_best.path)}, chips_spent={list(p2_best.chips_spent)}")
     print(" Board color counts:", hist)
     print(" P1 chips:", dict(game.states['p1'].chips))
     print(" P2 chips:", dict(game.states['p2'].chips))
 
 
-def plot_game_state(game: ColoredTrails, save=False, save_path: Path = None):
+def plot_game_state(game: ColoredTrails, save=False, save_path: Path = None, show_paths=True):
     # Generates and displays a Matplotlib visualization of the game board and state.
+    # With show_paths, each player's best route for their current chips is drawn as well.
 
-    board_matrix = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=int)
-    for r in range(BOARD_SIZE):
-        for c in range(BOARD_SIZE):
-            board_matrix[r, c] = COLOR_TO_VALUE[game.board[r][c]]
+    color_to_value, color_map, norm = board_colormap(game.colors)
+    board_matrix = np.zeros((game.size, game.size), dtype=int)
+    for r in range(game.size):
+        for c in range(game.size):
+            board_matrix[r, c] = color_to_value[game.board[r][c]]
 
     fig, ax = plt.subplots(figsize=(6, 6))
-    cax = ax.imshow(board_matrix, cmap=COLOR_MAP, norm=NORM)
+    cax = ax.imshow(board_matrix, cmap=color_map, norm=norm)
 
-    ax.set_xticks(np.arange(-0.5, BOARD_SIZE, 1), minor=True)
-    ax.set_yticks(np.arange(-0.5, BOARD_SIZE, 1), minor=True)
+    ax.set_xticks(np.arange(-0.5, game.size, 1), minor=True)
+    ax.set_yticks(np.arange(-0.5, game.size, 1), minor=True)
     ax.grid(which="minor", color="black", linestyle='-', linewidth=2)
     ax.tick_params(which="minor", size=0)
 
-    ax.set_xticks(np.arange(BOARD_SIZE))
-    ax.set_yticks(np.arange(BOARD_SIZE))
-    ax.set_xticklabels(np.arange(BOARD_SIZE))
-    ax.set_yticklabels(np.arange(BOARD_SIZE))
+    ax.set_xticks(np.arange(game.size))
+    ax.set_yticks(np.arange(game.size))
+    ax.set_xticklabels(np.arange(game.size))
+    ax.set_yticklabels(np.arange(game.size))
     ax.set_xlabel("Column (C)")
     ax.set_ylabel("Row (R)")
 
-    s_pos = START_POS
+    s_pos = game.geometry.start_pos
     g1_pos = game.states['p1'].goal_pos
     g2_pos = game.states['p2'].goal_pos
 
@@ -102,6 +107,18 @@ def plot_game_state(game: ColoredTrails, save=False, save_path: Path = None):
         ax.text(g2_pos[1], g2_pos[0], '2️', ha='center', va='center', fontsize=20, color='black',
                 path_effects=[pe.withStroke(linewidth=1, foreground='white')])
 
+    if show_paths:
+        # Offset the two routes slightly so shared cells stay visible
+        for player_id, offset, style in (('p1', -0.12, '-'), ('p2', 0.12, '--')):
+            route = game.get_max_score_and_path(player_id, with_path=True).path
+            if len(route) > 1:
+                ax.plot([c + offset for _, c in route], [r + offset for r, _ in route], style,
+                        color='black', linewidth=2.5, marker='o', markersize=4,
+                        path_effects=[pe.withStroke(linewidth=4, foreground='white')],
+                        label=f"{player_id.upper()} route")
+        if ax.get_legend_handles_labels()[0]:
+            ax.legend(loc='upper right', fontsize=8)
+
     title_text = "Colored Trails Board State"
     fig.suptitle(title_text, fontsize=16, fontweight='bold')
     if not save:
@@ -176,28 +193,8 @@ def run_game_simulation(game: ColoredTrails, p1_type: str = 'LLAMA', p2_type: st
                     self.history.append(f"{self.player_id} REJECT (missing {chip})")
                     return False
 
-            # compute utility delta
-            current_score, _, _ = self.game.get_max_score_and_path(self.player_id)
-
-            hypo = dict(my_state.chips)
-            # Responder receives opp_give
-            for chip in opp_give:
-                hypo[chip] = hypo.get(chip, 0) + 1
-            # Responder gives opp_receive
-            for chip in opp_receive:
-                hypo[chip] -= 1
-                if hypo[chip] == 0:
-                    del hypo[chip]
-
-            # Make a temporary state to compute utility
-            temp_state = {
-                self.player_id: GameState(goal_pos=self.game.states[self.player_id].goal_pos, chips=hypo),
-                self.opponent_id: self.game.states[self.opponent_id]
-            }
-            temp_game = ColoredTrails(self.game.board, temp_state)
-            new_score, _, _ = temp_game.get_max_score_and_path(self.player_id)
-
-            accept = new_score > current_score
+            # compute utility delta: responder receives opp_give and gives opp_receive
+            accept = self.game.evaluate_trade(self.player_id, opp_receive, opp_give) > 0
             self.history.append(
                 f"{self.player_id} {'ACCEPTED' if accept else 'REJECTED'} offer ({opp_give} for {opp_receive})")
             return accept
@@ -223,7 +220,7 @@ def run_game_simulation(game: ColoredTrails, p1_type: str = 'LLAMA', p2_type: st
         'p2': create_agent('p2', p2_type, tom_order_p2)
     }
 
-    offers_made = {'p1': 0, 'p2': 0}
+    offers_made = game.offers_made
     trade_made = False
     negotiation_ended = False
 
@@ -243,6 +240,7 @@ def run_game_simulation(game: ColoredTrails, p1_type: str = 'LLAMA', p2_type: st
     for round_num in range(1, MAX_NEGOTIATION_ROUNDS + 1):
         if negotiation_ended:
             break
+        game.round_num = round_num
 
         log(f"\n{'=' * 60}")
         log(f"ROUND {round_num}")
@@ -419,6 +417,8 @@ def run_tournament(args, games=6, use_seeds = True):
             logger.log(f"Starting game {game_num} with seed {game_seed}" if game_seed is not None else f"Starting game {game_num}")
             board_map, player_states = ColoredTrails.generate_random_game(seed=game_num)
             game = ColoredTrails(board_map, player_states)
+            if args.utility_tables:
+                game.enable_utility_tables()
 
             run_game_simulation(
                 game,
@@ -562,6 +562,8 @@ def parse_args():
 
     p.add_argument("--set-global-seed", action="store_true",
                    help="Also set global seeds (numpy, python random) for full determinism.")
+    p.add_argument("--utility-tables", action="store_true",
+                   help="Precompute per-goal utility tables so every score is a table lookup.")
     return p.parse_args()
 
 
@@ -581,6 +583,8 @@ def main(args):
             print(f"Generated new scenario with seed={seed_used}")
 
     game = ColoredTrails(board_map, player_states)
+    if args.utility_tables:
+        game.enable_utility_tables()
 
     # for seeing if seed is promising enough to waste time on
     print_quick_metrics(game)
@@ -0,0 +1,224 @@
+"""
+Benchmarks for bulk scenario generation (development tool)
+
+Compares generate_scenario_batch against one-at-a-time ColoredTrails.generate_random_game
+and times the lazy conversion of batch rows back to ColoredTrails games, and compares the
+memory-mapped binary corpus with one JSON file per scenario, and measures how many score
+lookups the canonical (symmetry / color relabelling) cache saves over a corpus and how fast
+a corpus can be annotated with redistribution outcomes and subgame-perfect negotiation
+baselines.
+
+Run from the repository root: python -m utils.benchmark_scenarios
+"""
+
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from game.colored_trails import (
+    CANONICAL_CACHE,
+    SCORE_CACHE,
+    ColoredTrails,
+    ScenarioBatch,
+    configure_canonical_cache,
+    generate_scenario_batch,
+    get_geometry,
+    iter_scenario_batches,
+    load_scenario_json,
+)
+from game.colored_trails import REDISTRIBUTION_CACHE
+from game.scenario_corpus import (
+    OUTCOME_METRICS,
+    ScenarioCorpus,
+    ScenarioCorpusWriter,
+    corpus_to_json,
+    outcome_metrics,
+)
+from game.negotiation import NEGOTIATION_METRICS, solve_corpus
+
+
+def benchmark_generation(n_single: int = 20_000, n_batch: int = 1_000_000, batch_size: int = 250_000):
+    """Scenarios per minute: per-seed generation vs batched arrays."""
+    print("--- Scenario generation ---")
+    start = time.perf_counter()
+    for seed in range(n_single):
+        ColoredTrails.generate_random_game(seed=seed)
+    single = time.perf_counter() - start
+    print(f" generate_random_game: {n_single / single * 60:>13,.0f} scenarios/min")
+
+    start = time.perf_counter()
+    n = sum(len(batch) for batch in iter_scenario_batches(n_batch, batch_size, seed=0))
+    batched = time.perf_counter() - start
+    print(f" scenario batches:     {n / batched * 60:>13,.0f} scenarios/min  "
+          f"({single / n_single / (batched / n):.0f}x)")
+
+
+def benchmark_lazy_games(n_games: int = 20_000):
+    """Time to turn batch rows into ColoredTrails games vs generating them per seed."""
+    print("--- Batch rows -> ColoredTrails ---")
+    batch = generate_scenario_batch(n_games, seed=0)
+    start = time.perf_counter()
+    for i in range(n_games):
+        batch.game(i)
+    lazy = time.perf_counter() - start
+    start = time.perf_counter()
+    for seed in range(n_games):
+        ColoredTrails(*ColoredTrails.generate_random_game(seed=seed))
+    single = time.perf_counter() - start
+    print(f" batch.game(i): {lazy / n_games * 1e6:.1f} us/game   "
+          f"generate_random_game + ColoredTrails: {single / n_games * 1e6:.1f} us/game")
+
+
+def benchmark_corpus(n_scenarios: int = 500_000, n_json: int = 2000, n_random: int = 2000):
+    """Corpus write, random access and streaming vs per-scenario JSON files."""
+    print("--- Binary scenario corpus vs JSON files ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.ctc")
+        start = time.perf_counter()
+        with ScenarioCorpusWriter(path) as writer:
+            for batch in iter_scenario_batches(n_scenarios, 100_000, seed=0):
+                writer.append_batch(batch)
+        written = time.perf_counter() - start
+        print(f" write {n_scenarios} scenarios: {written:.2f} s  "
+              f"{os.path.getsize(path) / n_scenarios:.0f} bytes/scenario")
+
+        corpus = ScenarioCorpus(path)
+        indices = [random.Random(0).randrange(len(corpus)) for _ in range(n_random)]
+        start = time.perf_counter()
+        for i in indices:
+            corpus.scenario(i)
+        mapped = time.perf_counter() - start
+        start = time.perf_counter()
+        chips = sum(int(batch.chips.sum()) for batch in corpus.iter_batches())
+        streamed = time.perf_counter() - start
+        print(f" random access: {mapped / n_random * 1e6:.1f} us/scenario   "
+              f"stream all chip counts: {streamed * 1e3:.1f} ms ({chips} chips)")
+
+        json_paths = corpus_to_json(path, os.path.join(tmp, "json"), indices=range(n_json))
+        start = time.perf_counter()
+        for json_path in json_paths:
+            load_scenario_json(json_path)
+        loaded = time.perf_counter() - start
+        size = sum(os.path.getsize(p) for p in json_paths) / n_json
+        print(f" JSON files: {loaded / n_json * 1e6:.1f} us/scenario  {size:.0f} bytes/scenario")
+
+
+def _symmetric_variants(batch: ScenarioBatch, n_variants: int, seed: int = 0) -> ScenarioBatch:
+    """Each scenario of `batch` under n_variants random board symmetries and color relabellings."""
+    rng = np.random.default_rng(seed)
+    geometry = get_geometry(batch.size, batch.start_pos)
+    n, n_colors = len(batch) * n_variants, len(batch.colors)
+    boards = np.repeat(batch.boards.reshape(len(batch), -1), n_variants, axis=0)
+    goals = np.repeat(batch.goals, n_variants, axis=0).astype(np.int64)
+    chips = np.repeat(batch.chips, n_variants, axis=0)
+    images = np.array(geometry.symmetries)
+    sources = np.array(geometry.symmetry_sources)
+    k = rng.integers(0, len(images), size=n)
+    relabel = rng.permuted(np.tile(np.arange(n_colors), (n, 1)), axis=1)
+    boards = np.take_along_axis(relabel, np.take_along_axis(boards, sources[k], axis=1), axis=1)
+    goal_cells = images[k[:, None], goals[..., 0] * batch.size + goals[..., 1]]
+    goals = np.stack(np.divmod(goal_cells, batch.size), axis=-1)
+    new_chips = np.empty_like(chips)
+    np.put_along_axis(new_chips, np.repeat(relabel[:, None, :], 2, axis=1), chips, axis=2)
+    return ScenarioBatch(boards.reshape(n, batch.size, batch.size).astype(np.uint8), goals.astype(np.int8),
+                         new_chips, batch.colors, batch.start_pos)
+
+
+def _score_trades(batch: ScenarioBatch):
+    """Every 1-for-1 chip swap for both players of every scenario, as the agents score them."""
+    for i in range(len(batch)):
+        game = batch.game(i)
+        for pid in ("p1", "p2"):
+            held = [color for color, count in game.states[pid].chips.items() if count > 0]
+            for give in held:
+                for receive in game.colors:
+                    if receive != give:
+                        game.evaluate_trade(pid, [give], [receive])
+
+
+def benchmark_canonical_cache(n_scenarios: int = 2000, n_variants: int = 8):
+    """
+    Score lookups answered without a search, with and without the canonical cache, when every
+    1-for-1 trade is scored across a corpus. Random 5x5 corpora almost never repeat a scenario
+    up to symmetry; small boards and corpora with symmetric duplicates do.
+    """
+    print("--- Canonical cache over a corpus (all 1-for-1 trades) ---")
+    base = generate_scenario_batch(n_scenarios // n_variants, seed=1)
+    corpora = {
+        "5x5 random": generate_scenario_batch(n_scenarios, seed=0),
+        f"5x5 x{n_variants} symmetric variants": _symmetric_variants(base, n_variants),
+        "3x3, 3 colors": generate_scenario_batch(n_scenarios, seed=0, board_size=3,
+                                                 colors=["RE", "BL", "YE"], n_chips=3, min_goal_dist=2),
+    }
+    maxsize = SCORE_CACHE.maxsize
+    SCORE_CACHE.resize(1 << 20)
+    for label, batch in corpora.items():
+        line = f" {label:>26}:"
+        for mode, size in (("exact", 0), ("canonical", 1 << 20)):
+            configure_canonical_cache(size)
+            SCORE_CACHE.clear()
+            CANONICAL_CACHE.clear()
+            start = time.perf_counter()
+            _score_trades(batch)
+            elapsed = time.perf_counter() - start
+            lookups = SCORE_CACHE.hits + SCORE_CACHE.misses
+            searches = SCORE_CACHE.misses - CANONICAL_CACHE.hits
+            line += (f"  {mode} hit_rate={1 - searches / lookups:.3f} "
+                     f"searches={searches} ({elapsed:.2f} s)")
+        print(line)
+    configure_canonical_cache(0)
+    SCORE_CACHE.resize(maxsize)
+
+
+def benchmark_outcome_annotation(n_scenarios: int = 1000):
+    """Time per scenario of outcome_metrics (full redistribution matrix), cold and warm."""
+    print("--- Redistribution outcome annotation ---")
+    batch = generate_scenario_batch(n_scenarios, seed=0)
+    REDISTRIBUTION_CACHE.resize(max(REDISTRIBUTION_CACHE.maxsize, 2 * n_scenarios))
+    REDISTRIBUTION_CACHE.clear()
+    for label in ("cold", "warm (cached tables)"):
+        start = time.perf_counter()
+        metrics = outcome_metrics(batch)
+        elapsed = time.perf_counter() - start
+        print(f" {label:>20}: {elapsed / n_scenarios * 1e3:.3f} ms/scenario")
+    gain = (metrics["welfare_p1"] + metrics["welfare_p2"]) - (metrics["p1_score"] + metrics["p2_score"])
+    print(f" mean Pareto frontier size {metrics['pareto_size'].mean():.1f}, "
+          f"mean welfare gain over the status quo {gain.mean():.0f}, "
+          f"Nash point differs from the status quo in "
+          f"{((metrics['nash_p1'] != metrics['p1_score']) | (metrics['nash_p2'] != metrics['p2_score'])).mean():.0%}"
+          f" of scenarios ({len(OUTCOME_METRICS)} metric columns)")
+
+
+def benchmark_negotiation_solver(n_scenarios: int = 4000, corpus_size: int = 100_000):
+    """
+    Scenarios per second of solve_corpus on one process and on every CPU, and the projected
+    time to solve a corpus_size corpus.
+    """
+    print("--- Subgame-perfect negotiation baselines ---")
+    batch = generate_scenario_batch(n_scenarios, seed=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.bin")
+        with ScenarioCorpusWriter(path, metrics=NEGOTIATION_METRICS) as writer:
+            writer.append_batch(batch)
+        for processes in sorted({1, os.cpu_count() or 1}):
+            REDISTRIBUTION_CACHE.clear()
+            start = time.perf_counter()
+            columns = solve_corpus(path, processes=processes, write=True)
+            elapsed = time.perf_counter() - start
+            print(f" {processes:>3} process(es): {n_scenarios / elapsed:8.0f} scenarios/s  "
+                  f"-> {corpus_size / n_scenarios * elapsed / 60:.1f} min per {corpus_size:,} scenarios")
+        stored = ScenarioCorpus(path).metric("spe_p1")
+        assert (stored == columns["spe_p1"]).all()
+    print(f" equilibrium play ends at the first turn in {(columns['spe_turn'] == 0).mean():.0%} of scenarios")
+
+
+if __name__ == "__main__":
+    benchmark_generation()
+    benchmark_lazy_games()
+    benchmark_corpus()
+    benchmark_canonical_cache()
+    benchmark_outcome_annotation()
+    benchmark_negotiation_solver()
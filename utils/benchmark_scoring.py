@@ -0,0 +1,393 @@
+"""
+Benchmarks for the Colored Trails scorer (mostly a development tool)
+Compares ColoredTrails.get_max_score_and_path against the original Counter-based BFS
+and checks that both return exactly the same (score, steps, unused-chip value) triples.
+
+Run from the repository root: python -m utils.benchmark_scoring
+"""
+
+import random
+import time
+import tracemalloc
+from collections import Counter, deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from game.colored_trails import (
+    ColoredTrails,
+    GameState,
+    BOARD_SIZE,
+    COLORS,
+    START_POS,
+    STEP_POINTS,
+    GOAL_BONUS,
+    UNUSED_CHIP_POINTS,
+    COLOR_INDEX,
+    SCORE_CACHE,
+    chip_vector,
+    chips_to_matrix,
+    configure_score_cache,
+    decode_chips,
+    score_cache_stats,
+    astar_max_score,
+    bitboard_max_score,
+    cached_search_max_score,
+    get_geometry,
+    score_inventories,
+    search_max_score,
+)
+from agents.tom_agent import ToMAgent
+
+
+def legacy_max_score_and_path(board: List[List[str]], goal: Tuple[int, int], start_chips: Dict[str, int],
+                              stats: Optional[Dict[str, int]] = None) -> Tuple[int, int, int]:
+    """The original BFS over (position, Counter) states, kept as the reference implementation."""
+    def manhattan(p1, p2):
+        return abs(p1[0] - p2[0]) + abs(p1[1] - p2[1])
+
+    start_chips = Counter(start_chips)
+    queue = deque([(START_POS, 0, start_chips)])
+    visited: Dict[Tuple[Tuple[int, int], Tuple], int] = {}
+    best_path_data: Optional[Tuple[int, int]] = None
+    expanded = 0
+
+    while queue:
+        current_pos, steps, remaining_chips = queue.popleft()
+        chips_tuple = tuple(sorted(remaining_chips.items()))
+
+        if (current_pos, chips_tuple) in visited and visited[(current_pos, chips_tuple)] <= steps:
+            continue
+        visited[(current_pos, chips_tuple)] = steps
+
+        remaining_chip_count = sum(remaining_chips.values())
+
+        if current_pos == goal:
+            if best_path_data is None or \
+                    steps < best_path_data[0] or \
+                    (steps == best_path_data[0] and remaining_chip_count > best_path_data[1]):
+                best_path_data = (steps, remaining_chip_count)
+
+        if best_path_data is not None and steps >= best_path_data[0]:
+            continue
+
+        expanded += 1
+        for dr, dc in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
+            next_r, next_c = current_pos[0] + dr, current_pos[1] + dc
+            if 0 <= next_r < BOARD_SIZE and 0 <= next_c < BOARD_SIZE:
+                target_color = board[next_r][next_c]
+                if remaining_chips.get(target_color, 0) > 0:
+                    new_chips = remaining_chips.copy()
+                    new_chips[target_color] -= 1
+                    if new_chips[target_color] == 0:
+                        del new_chips[target_color]
+                    queue.append(((next_r, next_c), steps + 1, new_chips))
+
+    if stats is not None:
+        stats['expanded'] = expanded
+
+    if best_path_data:
+        min_steps_to_goal, max_remaining_chips = best_path_data
+        final_unused_chip_value = max_remaining_chips * UNUSED_CHIP_POINTS
+        return (min_steps_to_goal * STEP_POINTS + GOAL_BONUS + final_unused_chip_value,
+                min_steps_to_goal, final_unused_chip_value)
+
+    best_reach = None
+    for (pos, chips_tuple), steps in visited.items():
+        dist = manhattan(pos, goal)
+        chip_count = sum(c for _, c in chips_tuple)
+        if best_reach is None or dist < best_reach[0] or (dist == best_reach[0] and chip_count > best_reach[1]):
+            best_reach = (dist, chip_count, pos)
+
+    min_dist_to_goal, max_remaining_chips, best_pos_reached = best_reach
+    distance_moved_points = (manhattan(START_POS, goal) - min_dist_to_goal) * STEP_POINTS
+    final_unused_chip_value = max_remaining_chips * UNUSED_CHIP_POINTS
+    return (distance_moved_points + final_unused_chip_value,
+            manhattan(START_POS, best_pos_reached), final_unused_chip_value)
+
+
+def random_cases(n_cases: int, n_chips: int, seed: int = 0,
+                 min_goal_dist: int = 0) -> List[Tuple[List[List[str]], Tuple[int, int], Dict[str, int]]]:
+    """Random (board, goal, inventory) triples; goals are at least min_goal_dist from the start."""
+    rng = random.Random(seed)
+    goals = [(r, c) for r in range(BOARD_SIZE) for c in range(BOARD_SIZE)
+             if abs(r - START_POS[0]) + abs(c - START_POS[1]) >= min_goal_dist]
+    cases = []
+    for _ in range(n_cases):
+        board = [[rng.choice(COLORS) for _ in range(BOARD_SIZE)] for _ in range(BOARD_SIZE)]
+        goal = rng.choice(goals)
+        chips = dict(Counter(rng.choice(COLORS) for _ in range(n_chips)))
+        cases.append((board, goal, chips))
+    return cases
+
+
+def _time_per_call(fn, cases, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for case in cases:
+            fn(*case)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(cases)
+
+
+def score_with_game(board, goal, chips) -> Tuple[int, int, int]:
+    game = ColoredTrails(board, {'p1': GameState(goal, chips)})
+    return game.get_max_score_and_path('p1')
+
+
+def check_equivalence(cases) -> int:
+    """Returns the number of cases where the current scorer disagrees with the legacy BFS."""
+    mismatches = 0
+    for board, goal, chips in cases:
+        if score_with_game(board, goal, chips) != legacy_max_score_and_path(board, goal, chips):
+            mismatches += 1
+    return mismatches
+
+
+def benchmark_scorer(n_cases: int = 500, chip_counts=(4, 8)):
+    print("--- get_max_score_and_path vs legacy BFS (score cache disabled) ---")
+    maxsize = SCORE_CACHE.maxsize
+    configure_score_cache(0)
+    for n_chips in chip_counts:
+        cases = random_cases(n_cases, n_chips, seed=n_chips)
+        mismatches = check_equivalence(cases)
+        legacy = _time_per_call(legacy_max_score_and_path, cases)
+        current = _time_per_call(score_with_game, cases)
+        print(f" {n_chips:>2} chips: legacy={legacy * 1e6:8.1f} us  current={current * 1e6:8.1f} us  "
+              f"speedup={legacy / current:5.1f}x  mismatches={mismatches}/{len(cases)}")
+    configure_score_cache(maxsize)
+
+
+def benchmark_dominance_pruning(n_cases: int = 100, chip_counts=(8, 12, 16)):
+    """Expanded states and wall time: legacy BFS vs coded search without and with Pareto pruning."""
+    print("--- Dominance pruning (expanded states / time per search) ---")
+    for n_chips in chip_counts:
+        cases = random_cases(n_cases, n_chips, seed=1000 + n_chips, min_goal_dist=3)
+        coded = [(bytes(COLOR_INDEX[c] for row in board for c in row), goal[0] * BOARD_SIZE + goal[1],
+                  chip_vector(chips)[0]) for board, goal, chips in cases]
+        expanded = {"legacy": 0, "coded": 0, "pareto": 0}
+        worst = {"legacy": 0, "coded": 0, "pareto": 0}
+        mismatches = 0
+        for (board, goal, chips), (board_colors, goal_cell, counts) in zip(cases, coded):
+            stats = {}
+            reference = legacy_max_score_and_path(board, goal, chips, stats=stats)
+            expanded["legacy"] += stats['expanded']
+            worst["legacy"] = max(worst["legacy"], stats['expanded'])
+            for label, prune in (("coded", False), ("pareto", True)):
+                stats = {}
+                result = search_max_score(board_colors, goal_cell, counts, prune_dominated=prune,
+                                          prune_hopeless=prune, stats=stats)
+                expanded[label] += stats['expanded']
+                worst[label] = max(worst[label], stats['expanded'])
+                mismatches += result != reference
+
+        legacy = _time_per_call(legacy_max_score_and_path, cases, repeat=1)
+        plain = _time_per_call(lambda b, g, c: search_max_score(b, g, c, prune_dominated=False,
+                                                                prune_hopeless=False), coded)
+        pareto = _time_per_call(search_max_score, coded)
+        print(f" {n_chips:>2} chips: expanded mean/worst legacy={expanded['legacy'] / n_cases:.0f}/{worst['legacy']}  "
+              f"coded={expanded['coded'] / n_cases:.0f}/{worst['coded']}  "
+              f"pareto={expanded['pareto'] / n_cases:.0f}/{worst['pareto']}  |  "
+              f"legacy={legacy * 1e3:.2f} ms  coded={plain * 1e3:.3f} ms  pareto={pareto * 1e3:.3f} ms  "
+              f"mismatches={mismatches}")
+
+
+def benchmark_utility_table(n_games: int = 50):
+    """Times UtilityTable construction and lookups for generated games and checks every entry."""
+    print("--- UtilityTable (all redistributions of the pooled chips) ---")
+    build_time = 0.0
+    entries = 0
+    mismatches = 0
+    for seed in range(n_games):
+        board_map, states = ColoredTrails.generate_random_game(seed=seed)
+        game = ColoredTrails(board_map, states)
+        t0 = time.perf_counter()
+        table = game.get_utility_table(states['p1'].goal_pos)
+        build_time += time.perf_counter() - t0
+        for code in range(table.n_codes):
+            counts = decode_chips(code, table.radices)
+            chips = {color: count for color, count in zip(COLORS, counts) if count}
+            if table.results[code] != legacy_max_score_and_path(board_map, states['p1'].goal_pos, chips):
+                mismatches += 1
+        entries += table.n_codes
+
+    board_map, states = ColoredTrails.generate_random_game(seed=0)
+    game = ColoredTrails(board_map, states)
+    hand = dict(states['p1'].chips)
+    maxsize = SCORE_CACHE.maxsize
+    configure_score_cache(0)
+    search = _time_per_call(game.score_chips, [(states['p1'].goal_pos, hand)] * 2000)
+    configure_score_cache(maxsize)
+    game.enable_utility_tables()
+    lookup = _time_per_call(game.score_chips, [(states['p1'].goal_pos, hand)] * 2000)
+    print(f" build={build_time / n_games * 1e3:6.2f} ms/table  entries={entries / n_games:6.1f}/table  "
+          f"mismatches={mismatches}/{entries}")
+    print(f" score_chips: search={search * 1e6:6.1f} us  table lookup={lookup * 1e6:6.2f} us")
+
+
+def benchmark_bitboard(n_cases: int = 1000, chip_counts=(2, 4, 6, 8), min_goal_dist: int = 3):
+    """
+    bitboard_max_score vs search_max_score on the same inventories (goals placed as in a
+    generated game). Inventories past
+    BITBOARD_CODE_LIMIT and unreachable goals whose step count needs the search order
+    come back as None (deferred); the timings cover every case.
+    """
+    print("--- Bitboard scorer vs BFS (time per score) ---")
+    for n_chips in chip_counts:
+        cases = []
+        for board, goal, chips in random_cases(n_cases, n_chips, n_chips, min_goal_dist):
+            game = ColoredTrails(board, {'p1': GameState(goal, chips)})
+            counts, extra = chip_vector(chips)
+            cases.append((game.board_colors, game.geometry.cell(goal), list(counts), extra))
+        bitboard = _time_per_call(bitboard_max_score, cases)
+        bfs = _time_per_call(search_max_score, cases)
+        results = [(bitboard_max_score(*case), search_max_score(*case)) for case in cases]
+        deferred = sum(result is None for result, _ in results)
+        mismatches = sum(result is not None and result != reference for result, reference in results)
+        print(f" {n_chips:>2} chips: bitboard={bitboard * 1e6:6.1f} us  bfs={bfs * 1e6:6.1f} us  "
+              f"deferred={deferred}/{len(cases)}  mismatches={mismatches}")
+
+
+def benchmark_score_many(batch_sizes=(20, 40, 200), chip_counts=(4, 8)):
+    """Compares ColoredTrails.score_many against a Python loop of uncached searches."""
+    print("--- score_many vs per-inventory search (score cache disabled) ---")
+    maxsize = SCORE_CACHE.maxsize
+    configure_score_cache(0)
+    rng = random.Random(0)
+    board_map, states = ColoredTrails.generate_random_game(seed=3)
+    game = ColoredTrails(board_map, states)
+    goal = states['p1'].goal_pos
+    for n_chips in chip_counts:
+        for n_rows in batch_sizes:
+            hands = [dict(Counter(rng.choice(COLORS) for _ in range(n_chips))) for _ in range(n_rows)]
+            matrix = chips_to_matrix(hands)
+            batched = _time_per_call(game.score_many, [('p1', matrix)] * 20)
+            looped = _time_per_call(lambda: [game.score_chips(goal, hand) for hand in hands], [()] * 20)
+            scores, _, _ = game.score_many('p1', matrix)
+            mismatches = sum(score != game.score_chips(goal, hand)[0] for score, hand in zip(scores, hands))
+            print(f" {n_chips:>2} chips x {n_rows:>3} hands: score_many={batched * 1e3:6.2f} ms  "
+                  f"loop={looped * 1e3:6.2f} ms  mismatches={mismatches}")
+    configure_score_cache(maxsize)
+
+
+def simulate_tom_negotiation(game: ColoredTrails, order_p1: int, order_p2: int, rounds: int = 5):
+    """Alternating ToM proposals and responses, as in run_game_simulation (without LLM agents)."""
+    agents = {'p1': ToMAgent('p1', game, order=order_p1), 'p2': ToMAgent('p2', game, order=order_p2)}
+    for _ in range(rounds):
+        for proposer_id, responder_id in (('p1', 'p2'), ('p2', 'p1')):
+            give, receive = agents[proposer_id].propose_trade()
+            if give == ["Pass"]:
+                return
+            if agents[responder_id].evaluate_proposal((give, receive)):
+                game.apply_trade(proposer_id, responder_id, give, receive)
+                return
+
+
+def benchmark_tom_games(seeds=range(6), order_p1: int = 2, order_p2: int = 1):
+    """Times full ToM negotiations with the score cache disabled and enabled."""
+    print(f"--- ToM-{order_p1} vs ToM-{order_p2} negotiations ({len(seeds)} games) ---")
+    maxsize = SCORE_CACHE.maxsize
+    for label, size in (("no cache", 0), ("score cache", maxsize)):
+        configure_score_cache(size)
+        SCORE_CACHE.clear()
+        random.seed(0)
+        t0 = time.perf_counter()
+        for seed in seeds:
+            board_map, states = ColoredTrails.generate_random_game(seed=seed)
+            simulate_tom_negotiation(ColoredTrails(board_map, states), order_p1, order_p2)
+        elapsed = time.perf_counter() - t0
+        stats = score_cache_stats()
+        print(f" {label:>11}: {elapsed / len(seeds) * 1e3:8.1f} ms/game  hits={stats['hits']}  "
+              f"misses={stats['misses']}  evictions={stats['evictions']}  hit_rate={stats['hit_rate']:.3f}")
+    configure_score_cache(maxsize)
+
+
+def benchmark_large_boards(configs=((10, 6, 12), (20, 10, 20), (20, 10, 24)),
+                           n_cases: int = 200, min_goal_dist: int = 10):
+    """
+    Time per score on larger boards (size, colors, chips per player): A* vs the pruned BFS.
+    Goals are at least min_goal_dist steps from the center start; results must match.
+    """
+    print("--- Large boards (A* vs BFS, time per score) ---")
+    for size, n_colors, n_chips in configs:
+        geometry = get_geometry(size)
+        rng = random.Random(size * 100 + n_chips)
+        starts = geometry.distances(geometry.start_cell)
+        goals = [cell for cell in range(geometry.n_cells) if starts[cell] >= min_goal_dist]
+        cases = []
+        for _ in range(n_cases):
+            board_colors = bytes(rng.randrange(n_colors) for _ in range(geometry.n_cells))
+            counts = [0] * n_colors
+            for _ in range(n_chips):
+                counts[rng.randrange(n_colors)] += 1
+            cases.append((board_colors, rng.choice(goals), counts))
+
+        timings = {"astar": [], "bfs": []}
+        mismatches = reached = 0
+        for board_colors, goal_cell, counts in cases:
+            start = time.perf_counter()
+            result = astar_max_score(board_colors, goal_cell, counts, geometry=geometry)
+            timings["astar"].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            reference = search_max_score(board_colors, goal_cell, counts, geometry=geometry)
+            timings["bfs"].append(time.perf_counter() - start)
+            mismatches += result != reference
+            reached += result[0] == result[1] * STEP_POINTS + GOAL_BONUS + result[2]
+
+        line = f" {size}x{size}, {n_colors} colors, {n_chips} chips ({reached}/{n_cases} reach goal):"
+        for label, values in timings.items():
+            values.sort()
+            line += (f"  {label} mean={sum(values) / len(values) * 1e3:.1f} ms"
+                     f" p95={values[int(len(values) * 0.95)] * 1e3:.1f} ms max={values[-1] * 1e3:.1f} ms")
+        print(line + f"  mismatches={mismatches}")
+
+
+def benchmark_score_inventories_large_boards(configs=((10, 6, 12, 5), (10, 6, 12, 50), (20, 10, 20, 5),
+                                                       (20, 10, 20, 50)),
+                                              min_goal_dist: int = 10, repeat: int = 3):
+    """
+    score_inventories vs a loop of per-inventory searches on larger boards (size, colors,
+    chips per hand, hands), score cache disabled: wall time, peak traced memory of the
+    batched call, and mismatches. Past BATCH_CODES_PER_INVENTORY the batched call scores
+    hand by hand itself, so it must never be much slower than the loop.
+    """
+    print("--- score_inventories vs per-inventory search on large boards (score cache disabled) ---")
+    maxsize = SCORE_CACHE.maxsize
+    configure_score_cache(0)
+    for size, n_colors, n_chips, n_hands in configs:
+        geometry = get_geometry(size)
+        rng = random.Random(size * 100 + n_hands)
+        starts = geometry.distances(geometry.start_cell)
+        goal_cell = rng.choice([cell for cell in range(geometry.n_cells) if starts[cell] >= min_goal_dist])
+        board_colors = bytes(rng.randrange(n_colors) for _ in range(geometry.n_cells))
+        hands = np.zeros((n_hands, n_colors), dtype=np.int64)
+        for hand in hands:
+            for _ in range(n_chips):
+                hand[rng.randrange(n_colors)] += 1
+
+        batched = _time_per_call(score_inventories, [(board_colors, goal_cell, hands, geometry)], repeat)
+        looped = _time_per_call(lambda: [cached_search_max_score(board_colors, goal_cell, counts, geometry=geometry)
+                                         for counts in hands.tolist()], [()], repeat)
+        tracemalloc.start()
+        scores, steps, unused = score_inventories(board_colors, goal_cell, hands, geometry)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        mismatches = sum(result != cached_search_max_score(board_colors, goal_cell, counts, geometry=geometry)
+                         for result, counts in zip(zip(scores.tolist(), steps.tolist(), unused.tolist()),
+                                                   hands.tolist()))
+        print(f" {size}x{size}, {n_colors} colors, {n_chips} chips x {n_hands:>2} hands: "
+              f"score_inventories={batched * 1e3:7.2f} ms (peak {peak / 1024:.0f} KiB)  "
+              f"loop={looped * 1e3:7.2f} ms  mismatches={mismatches}")
+    configure_score_cache(maxsize)
+
+
+if __name__ == "__main__":
+    benchmark_scorer()
+    benchmark_dominance_pruning()
+    benchmark_large_boards()
+    benchmark_score_inventories_large_boards()
+    benchmark_bitboard()
+    benchmark_utility_table()
+    benchmark_score_many()
+    benchmark_tom_games()
@@ -0,0 +1,219 @@
+"""
+Memory and allocation benchmarks for game/player state objects (development tool)
+
+Reports the memory retained per generated game (board + player states + ColoredTrails),
+the number of live memory blocks and GC-tracked objects per game, and the cost of
+copying player states, evaluating hypothetical trades, reading current scores around
+applied trades, applying / scoring trades in batches, and trying trades on one game with
+snapshot / restore.
+
+Run from the repository root: python -m utils.benchmark_state
+"""
+
+import contextlib
+import copy
+import gc
+import io
+import itertools
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from game.colored_trails import COLORS, ColoredTrails, apply_trades, chip_vector, trades_to_matrices
+
+
+def _build_games(n_games: int):
+    games = []
+    for seed in range(n_games):
+        board_map, states = ColoredTrails.generate_random_game(seed=seed)
+        games.append((board_map, states, ColoredTrails(board_map, states)))
+    return games
+
+
+def benchmark_game_memory(n_games: int = 2000):
+    """Memory, memory blocks and GC-tracked objects retained per game."""
+    print("--- Memory per game (board + states + ColoredTrails) ---")
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    objects_before = len(gc.get_objects())
+    tracemalloc.start()
+    games = _build_games(n_games)
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    blocks = sys.getallocatedblocks() - blocks_before
+    objects = len(gc.get_objects()) - objects_before
+    print(f" {retained / n_games:.0f} bytes/game  {blocks / n_games:.1f} blocks/game  "
+          f"{objects / n_games:.1f} gc objects/game")
+    del games
+
+
+def benchmark_state_copies(n_games: int = 200, repeat: int = 20):
+    """Time and peak memory of deep-copying every game's player states."""
+    print("--- Copying player states ---")
+    games = _build_games(n_games)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, states, _ in games:
+            copy.deepcopy(states)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    copies = [copy.deepcopy(states) for _, states, _ in games]
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f" deepcopy(states): {elapsed / (n_games * repeat) * 1e6:.1f} us  "
+          f"{retained / n_games:.0f} bytes per copy")
+    del copies
+
+
+def benchmark_trade_evaluations(n_games: int = 200, trades=(("RE", "BL"), ("YE", "GR"), ("OR", "RE"))):
+    """Memory blocks allocated and time per hypothetical trade evaluation (warm caches)."""
+    print("--- Hypothetical trade evaluations ---")
+    games = _build_games(n_games)
+    for _, _, game in games:
+        for give, receive in trades:
+            game.evaluate_trade('p1', [give], [receive])
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _, _, game in games:
+        for give, receive in trades:
+            game.evaluate_trade('p1', [give], [receive])
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    n_calls = n_games * len(trades)
+    print(f" evaluate_trade: {elapsed / n_calls * 1e6:.1f} us/call (traced)  peak {peak} bytes")
+
+
+def benchmark_current_scores(n_games: int = 200, reads: int = 20):
+    """Time per current-score read (cached per player) vs re-scoring the chips, around trades."""
+    print("--- Current score reads around apply_trade ---")
+    games = _build_games(n_games)
+    for label, read in (("score_chips", lambda game, pid: game.score_chips(game.states[pid].goal_pos,
+                                                                          dict(game.states[pid].chips))),
+                        ("current_score", lambda game, pid: game.current_score(pid))):
+        elapsed = 0.0
+        for _, _, game in games:
+            state = copy.deepcopy(game.states)
+            trade_game = game.with_states(state)
+            for _ in range(2):
+                start = time.perf_counter()
+                for _ in range(reads):
+                    read(trade_game, 'p1')
+                    read(trade_game, 'p2')
+                elapsed += time.perf_counter() - start
+                give = next(iter(state['p1'].chips))
+                receive = next(iter(state['p2'].chips))
+                trade_game.apply_trade('p1', 'p2', [give], [receive])
+        print(f" {label:>13}: {elapsed / (n_games * 2 * reads * 2) * 1e6:.2f} us/read")
+
+
+def _all_trades(max_give: int = 3, max_receive: int = 2):
+    """Every multiset trade giving up to max_give and receiving up to max_receive chips."""
+    return [(list(give), list(receive))
+            for n_give in range(max_give + 1) for n_receive in range(max_receive + 1) if n_give + n_receive
+            for give in itertools.combinations_with_replacement(COLORS, n_give)
+            for receive in itertools.combinations_with_replacement(COLORS, n_receive)]
+
+
+def benchmark_batch_trades(n_games: int = 40):
+    """apply_trades / evaluate_trades over every candidate trade vs one trade at a time."""
+    print("--- Batch trade validation and scoring ---")
+    trades = _all_trades()
+    give, receive = trades_to_matrices(trades)
+    games = _build_games(n_games)
+    proposers = np.array([chip_vector(game.states['p1'].chips)[0] for _, _, game in games])
+    responders = np.array([chip_vector(game.states['p2'].chips)[0] for _, _, game in games])
+
+    start = time.perf_counter()
+    valid, _, _ = apply_trades(proposers[:, None], responders[:, None], give, receive)
+    batched = time.perf_counter() - start
+    start = time.perf_counter()
+    looped_valid = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _, states, game in games:
+            for give_chips, receive_chips in trades:
+                looped_valid += game.with_states(copy.deepcopy(states)).apply_trade('p1', 'p2', give_chips,
+                                                                                    receive_chips)
+    looped = time.perf_counter() - start
+    n_pairs = n_games * len(trades)
+    print(f" validate+apply {n_pairs} (state, trade) pairs: apply_trades {batched / n_pairs * 1e6:.2f} us/trade  "
+          f"apply_trade on copies {looped / n_pairs * 1e6:.2f} us/trade  (valid {valid.sum()} vs {looped_valid})")
+
+    elapsed = {"evaluate_trades": 0.0, "evaluate_trade": 0.0}
+    for _, _, game in games:
+        start = time.perf_counter()
+        game.evaluate_trades('p1', give, receive)
+        elapsed["evaluate_trades"] += time.perf_counter() - start
+        start = time.perf_counter()
+        for give_chips, receive_chips in trades:
+            game.evaluate_trade('p1', give_chips, receive_chips)
+        elapsed["evaluate_trade"] += time.perf_counter() - start
+    print(f" score {len(trades)} trades per game: " + "  ".join(
+        f"{label} {value / n_games * 1e3:.2f} ms/game" for label, value in elapsed.items()))
+
+
+def benchmark_snapshots(n_games: int = 50, n_trades: int = 1000):
+    """
+    Snapshot + n_trades hypothetical trades (apply, score, roll back) + restore per game,
+    rolling back with restore() vs applying each trade to a deep copy of the states.
+    """
+    print("--- Snapshot / restore around hypothetical trades ---")
+    games = _build_games(n_games)
+    plans = []
+    for _, states, game in games:
+        p1, p2 = states['p1'].chips, states['p2'].chips
+        valid = [(give, receive) for give, receive in _all_trades()
+                 if all(p1[color] >= give.count(color) for color in give)
+                 and all(p2[color] >= receive.count(color) for color in receive)]
+        plans.append((game, [valid[i % len(valid)] for i in range(n_trades)]))
+
+    start = time.perf_counter()
+    for game, trades in plans:
+        for give, receive in trades:
+            trial = game.with_states(copy.deepcopy(game.states))
+            trial.apply_trade('p1', 'p2', give, receive)
+            trial.current_score('p1')
+    copied = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for game, trades in plans:
+        snapshot = game.snapshot()
+        for give, receive in trades:
+            game.apply_trade('p1', 'p2', give, receive)
+            game.current_score('p1')
+            game.restore(snapshot)
+    restored = time.perf_counter() - start
+
+    # Memory retained by a snapshot, and a check that restore() rolls a trade back
+    game, trades = plans[0]
+    before = [dict(state.chips) for state in game.states.values()]
+    tracemalloc.start()
+    snapshot = game.snapshot()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    game.apply_trade('p1', 'p2', *trades[0])
+    game.restore(snapshot)
+    assert [dict(state.chips) for state in game.states.values()] == before
+
+    start = time.perf_counter()
+    for game, _ in plans:
+        game.restore(game.snapshot())
+    snapshot_only = time.perf_counter() - start
+    n_calls = n_games * n_trades
+    print(f" snapshot + restore: {snapshot_only / n_games * 1e6:.2f} us  ({retained} bytes per snapshot)")
+    print(f" {n_trades} trades per game: restore {restored / n_games * 1e3:.2f} ms "
+          f"({restored / n_calls * 1e6:.2f} us/trade)  deepcopy {copied / n_games * 1e3:.2f} ms "
+          f"({copied / n_calls * 1e6:.2f} us/trade)")
+
+
+if __name__ == "__main__":
+    benchmark_game_memory()
+    benchmark_state_copies()
+    benchmark_trade_evaluations()
+    benchmark_current_scores()
+    benchmark_batch_trades()
+    benchmark_snapshots()
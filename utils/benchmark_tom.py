@@ -0,0 +1,168 @@
+"""
+Benchmarks for ToM agent decisions (development tool)
+
+Reports the wall time of order-2 propose_trade decisions, the cost of the belief
+save / restore calls made by their hypothetical reasoning, and how many get_value /
+get_best_value calls the order-0 value memo answers.
+
+Run from the repository root: python -m utils.benchmark_tom
+"""
+
+import random
+import time
+import tracemalloc
+
+from game.colored_trails import ColoredTrails
+from agents import tom_agent
+from agents.tom_agent import ToM0Model, ToMAgent
+
+
+def _build_agent(seed: int, order: int) -> ToMAgent:
+    """An agent for p1 of a generated game, initialized (with ToM0 offer beliefs) for it."""
+    board_map, states = ColoredTrails.generate_random_game(seed=seed)
+    game = ColoredTrails(board_map, states)
+    agent = ToMAgent('p1', game, order=order)
+    agent.init(game, 'p1')
+    return agent
+
+
+def _count_saves():
+    """Wraps ToMAgent / ToM0Model.save_beliefs with call counters; returns (counts, undo)."""
+    counts = {ToMAgent: 0, ToM0Model: 0}
+    originals = {cls: cls.save_beliefs for cls in counts}
+
+    def counting(cls):
+        def save_beliefs(self):
+            counts[cls] += 1
+            return originals[cls](self)
+        return save_beliefs
+
+    for cls in counts:
+        cls.save_beliefs = counting(cls)
+
+    def undo():
+        for cls, original in originals.items():
+            cls.save_beliefs = original
+    return counts, undo
+
+
+def benchmark_propose_trade(seeds=range(10), order: int = 2):
+    """
+    Wall time, save_beliefs calls and peak traced memory per propose_trade of a fresh
+    order-`order` agent, and the memory allocated per ToM0Model.save_beliefs.
+    """
+    print(f"--- Order-{order} propose_trade ({len(seeds)} games) ---")
+    elapsed = 0.0
+    for seed in seeds:
+        agent = _build_agent(seed, order)
+        random.seed(seed)
+        start = time.perf_counter()
+        agent.propose_trade()
+        elapsed += time.perf_counter() - start
+
+    counts, undo = _count_saves()
+    peak = 0
+    try:
+        for seed in seeds:
+            agent = _build_agent(seed, order)
+            random.seed(seed)
+            tracemalloc.start()
+            agent.propose_trade()
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    finally:
+        undo()
+    print(f" {elapsed / len(seeds) * 1e3:.1f} ms/decision  save_beliefs/decision: "
+          f"ToMAgent {counts[ToMAgent] / len(seeds):.0f}  ToM0Model {counts[ToM0Model] / len(seeds):.0f}  "
+          f"peak traced {peak / 1024:.0f} KiB")
+
+    # Memory taken by open saves (nothing is restored, so every allocation is retained)
+    model = _build_agent(seeds[0], 0).opponent_model
+    n_saves = 10000
+    tracemalloc.start()
+    for _ in range(n_saves):
+        model.save_beliefs()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f" ToM0Model.save_beliefs ({len(model.belief_offer)} offer beliefs): "
+          f"{retained / n_saves:.0f} bytes allocated per save")
+
+
+def _count_value_calls():
+    """
+    Wraps the ToMAgent value methods with call counters per (method, order); returns (counts, undo).
+    _get_value / get_best_value are the calls, _compute_value / _compute_best_value the evaluations.
+    """
+    names = ("_get_value", "_compute_value", "get_best_value", "_compute_best_value")
+    counts = {}
+    originals = {name: getattr(ToMAgent, name) for name in names}
+
+    def counting(name):
+        def method(self, *args):
+            counts[name, self.order] = counts.get((name, self.order), 0) + 1
+            return originals[name](self, *args)
+        return method
+
+    for name in names:
+        setattr(ToMAgent, name, counting(name))
+
+    def undo():
+        for name, original in originals.items():
+            setattr(ToMAgent, name, original)
+    return counts, undo
+
+
+def _decide(seed: int, order: int):
+    """Wall time and outcome (proposal, agent state) of one propose_trade."""
+    agent = _build_agent(seed, order)
+    random.seed(seed)
+    start = time.perf_counter()
+    proposal = agent.propose_trade()
+    elapsed = time.perf_counter() - start
+
+    models, states = [agent], []
+    while models:
+        model = models.pop()
+        if isinstance(model, ToMAgent):
+            states.append((model.location_beliefs.tolist(), model.confidence))
+            models.extend(m for m in (model.self_model, model.opponent_model) if m is not None)
+        else:
+            states.append((model.cnt_beliefs.tolist(), model.ttl_beliefs.tolist(), model.belief_offer.tolist(),
+                           model.belief_history))
+    return elapsed, (proposal, states, random.random())
+
+
+def benchmark_value_memo(seeds=range(10), order: int = 2):
+    """
+    get_value / get_best_value calls vs evaluations per order-`order` propose_trade with the
+    order-0 value memo (MEMOIZE_VALUES) on and off; checks that both give the same decisions
+    and leave the same model states behind.
+    """
+    print(f"--- Order-{order} value memo ({len(seeds)} games) ---")
+    results = {}
+    for memoize in (False, True):
+        tom_agent.MEMOIZE_VALUES = memoize
+        counts, undo = _count_value_calls()
+        try:
+            elapsed, outcomes = 0.0, []
+            for seed in seeds:
+                seconds, outcome = _decide(seed, order)
+                elapsed += seconds
+                outcomes.append(outcome)
+        finally:
+            undo()
+            tom_agent.MEMOIZE_VALUES = True
+        results[memoize] = outcomes
+        per_decision = {key: count / len(seeds) for key, count in counts.items()}
+        print(f" memo {'on ' if memoize else 'off'}: {elapsed / len(seeds) * 1e3:.1f} ms/decision")
+        for call, evaluation in (("_get_value", "_compute_value"), ("get_best_value", "_compute_best_value")):
+            print(f"  {call:>14}/decision: " + "  ".join(
+                f"order {level}: {per_decision.get((call, level), 0):.1f} calls, "
+                f"{per_decision.get((evaluation, level), 0):.1f} evaluated"
+                for level in range(order + 1) if per_decision.get((call, level))))
+    print(f" same decisions and model states: {results[False] == results[True]}")
+
+
+if __name__ == "__main__":
+    benchmark_propose_trade()
+    benchmark_value_memo()